@@ -5,10 +5,11 @@ from dotenv import load_dotenv
 from langchain.chains import LLMChain
 from langchain.memory import ConversationBufferMemory
 from langchain_community.vectorstores import Chroma
-from langchain_openai import OpenAI, OpenAIEmbeddings
 from langchain.prompts import PromptTemplate
 from langchain_core.messages import HumanMessage, AIMessage
 
+from utils.configs import criar_embeddings, criar_llm_completacao
+
 # Configuração de logging
 logger = logging.getLogger(__name__)
 load_dotenv()
@@ -16,11 +17,13 @@ load_dotenv()
 from langchain.retrievers import MergerRetriever
 
 class RagQueryEngine:
-    def __init__(self, vector_store_root: str = "db/vector_store", collection_names: list[str] | None = None, embedding_model: str = "text-embedding-3-small"):
+    def __init__(self, vector_store_root: str = "db/vector_store", collection_names: list[str] | None = None, embedding_model: str = "text-embedding-3-small", llm=None):
         self.vector_store_root = vector_store_root
         self.embedding_model = embedding_model
-        self.embeddings = OpenAIEmbeddings(model=self.embedding_model)
-        self.llm = OpenAI(temperature=0.0)
+        self.embeddings = criar_embeddings(self.embedding_model)
+        # Qualquer LLM do LangChain serve (ex: `ChatSimulado` para testes sem rede).
+        # O padrão passa pelo limitador da cota da OpenAI, como os modelos de chat.
+        self.llm = llm if llm is not None else criar_llm_completacao()
         self.memory = ConversationBufferMemory(
             memory_key="chat_history",
             return_messages=True
@@ -178,6 +181,20 @@ Pergunta independente:"""
             logger.error(f"Erro durante a consulta: {str(e)}")
             raise
 
+    async def aquery(self, pergunta: str):
+        """Consultar o sistema RAG de forma assíncrona, sem memória de conversa.
+
+        Cada chamada é independente, então várias perguntas podem ser feitas
+        em paralelo na mesma instância (veja `benchmarks.bench_lote_perguntas`).
+        """
+        retrieved_docs = await self.retriever.ainvoke(pergunta)
+        context = self._combine_documents(retrieved_docs)
+        response_result = await self.qa_chain.ainvoke({
+            "context": context,
+            "question": pergunta
+        })
+        return response_result["text"].strip(), retrieved_docs
+
     def clear_memory(self):
         """Limpar a memória da conversa"""
         self.memory.clear()
@@ -3,6 +3,7 @@ load_dotenv()
 import streamlit as st
 
 from db.db_sqlite import init_database
+from db.manutencao import agendar_manutencao
 from utils.session_utils import init_session_state
 from utils.constants import DEFAULT_PROVIDER, DEFAULT_MODEL
 from services.model_service import carregar_modelo_cache
@@ -31,6 +32,7 @@ def main():
     )
     
     init_database()
+    agendar_manutencao()
     init_session_state()
     apply_custom_css()
     inicializa_jiboia()
@@ -0,0 +1,88 @@
+"""Benchmark de abertura de conversa em uma tabela de mensagens grande.
+
+Gera um banco no esquema da versão 1 (sem índices) com milhões de mensagens
+distribuídas entre muitas conversas, mede a consulta antiga de
+`carregar_mensagens` (filtro sem índice + ORDER BY timestamp), aplica as
+migrações no lugar com `init_database` e mede novamente. Repete para
+tamanhos de banco crescentes para mostrar que, após a migração, o custo
+depende apenas do tamanho da conversa.
+
+Uso:
+    python -m benchmarks.bench_abrir_conversa --linhas 1000000
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+from db import db_sqlite
+from db.migracoes import _v001_tabelas_iniciais
+
+MENSAGENS_POR_CONVERSA = 40
+
+
+def _gerar_banco(caminho, linhas):
+    conn = sqlite3.connect(caminho)
+    _v001_tabelas_iniciais(conn)
+    conn.execute("PRAGMA user_version = 1;")
+    num_conversas = max(1, linhas // MENSAGENS_POR_CONVERSA)
+    conn.executemany(
+        "INSERT INTO conversas (id, titulo, provedor, modelo) VALUES (?, ?, 'Groq', 'bench');",
+        ((n, f'Conversa {n}') for n in range(1, num_conversas + 1)),
+    )
+    # Mensagens intercaladas entre conversas, como acontece com vários usuários.
+    conn.executemany(
+        "INSERT INTO mensagens (conversa_id, role, content) VALUES (?, ?, ?);",
+        ((i % num_conversas + 1, 'user' if i % 2 else 'assistant', 'mensagem de teste')
+         for i in range(linhas)),
+    )
+    conn.commit()
+    conn.close()
+    return num_conversas
+
+
+def _medir(funcao, repeticoes=20):
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        funcao()
+    return (time.perf_counter() - inicio) / repeticoes * 1000
+
+
+def bench(linhas):
+    with tempfile.TemporaryDirectory() as tmp:
+        caminho = os.path.join(tmp, 'veronia.db')
+        num_conversas = _gerar_banco(caminho, linhas)
+        conversa_id = num_conversas // 2 or 1
+
+        conn = sqlite3.connect(caminho)
+        antes = _medir(lambda: conn.execute(
+            "SELECT role, content FROM mensagens WHERE conversa_id = ? ORDER BY timestamp ASC;",
+            (conversa_id,),
+        ).fetchall(), repeticoes=3)
+        conn.close()
+
+        db_sqlite.configurar_banco(caminho)
+        inicio = time.perf_counter()
+        db_sqlite.init_database()
+        migracao = (time.perf_counter() - inicio) * 1000
+        depois = _medir(lambda: db_sqlite.carregar_mensagens(conversa_id))
+        db_sqlite.fechar_pool()
+    return antes, migracao, depois
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--linhas', type=int, default=1_000_000, help='maior tamanho da tabela mensagens')
+    args = parser.parse_args()
+
+    tamanhos = sorted({max(1000, args.linhas // 100), max(1000, args.linhas // 10), args.linhas})
+    print(f"{'mensagens':>12} | {'antes (ms)':>11} | {'migração (ms)':>13} | {'depois (ms)':>11}")
+    for linhas in tamanhos:
+        antes, migracao, depois = bench(linhas)
+        print(f"{linhas:>12} | {antes:>11.2f} | {migracao:>13.1f} | {depois:>11.3f}")
+    print(f"Cada conversa tem {MENSAGENS_POR_CONVERSA} mensagens.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""Benchmark da busca textual nas conversas.
+
+Popula o banco com mensagens sintéticas e compara uma busca por `LIKE`
+(varredura completa da tabela) com `buscar_conversas`, que usa os índices
+FTS5 criados pela migração 3.
+
+Uso:
+    python -m benchmarks.bench_busca --mensagens 500000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from db import db_sqlite
+
+VOCABULARIO = (
+    'permissão portal usuário formulário workflow relatório campo status '
+    'aplicação organização contato email papel configuração sistema tabela '
+    'transação smartfolder assinatura integração importação exportação'
+).split()
+
+
+def _texto(rng, palavras=60):
+    return ' '.join(rng.choice(VOCABULARIO) for _ in range(palavras))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--mensagens', type=int, default=500_000)
+    parser.add_argument('--por-conversa', type=int, default=50)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_sqlite.configurar_banco(os.path.join(tmp, 'veronia.db'))
+        db_sqlite.init_database()
+        num_conversas = max(1, args.mensagens // args.por_conversa)
+        with db_sqlite.get_pool().escrita() as conn:
+            conn.executemany(
+                "INSERT INTO conversas (titulo, provedor, modelo) VALUES (?, 'Groq', 'bench');",
+                ((_texto(rng, 4),) for _ in range(num_conversas)),
+            )
+            conn.executemany(
+                "INSERT INTO mensagens (conversa_id, role, content) VALUES (?, 'user', ?);",
+                ((i % num_conversas + 1, _texto(rng)) for i in range(args.mensagens)),
+            )
+            # Termo raro, presente em poucas mensagens.
+            conn.executemany(
+                "INSERT INTO mensagens (conversa_id, role, content) VALUES (?, 'assistant', ?);",
+                ((rng.randint(1, num_conversas), _texto(rng) + ' reconciliação') for _ in range(10)),
+            )
+            db_sqlite.sincronizar_busca(conn)
+        tamanho_mb = os.path.getsize(db_sqlite.DB_FILE) / 1024 / 1024
+
+        with db_sqlite.get_pool().leitura() as conn:
+            inicio = time.perf_counter()
+            conn.execute(
+                "SELECT DISTINCT conversa_id FROM mensagens WHERE content LIKE ? LIMIT 20;",
+                ('%reconciliação%',),
+            ).fetchall()
+            like_ms = (time.perf_counter() - inicio) * 1000
+
+        inicio = time.perf_counter()
+        resultados = db_sqlite.buscar_conversas('reconciliação')
+        fts_ms = (time.perf_counter() - inicio) * 1000
+        db_sqlite.fechar_pool()
+
+    print(f"Mensagens: {args.mensagens} | banco: {tamanho_mb:.1f} MB")
+    print(f"LIKE  : {like_ms:9.2f} ms")
+    print(f"FTS5  : {fts_ms:9.2f} ms ({len(resultados)} conversas)")
+
+
+if __name__ == '__main__':
+    main()
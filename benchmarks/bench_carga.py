@@ -0,0 +1,142 @@
+"""Teste de carga com várias sessões de chat simultâneas, sem rede.
+
+Cada sessão é uma thread, como os scripts do Streamlit, e conversa com o
+provedor 'Simulado' (veja `services.provedor_simulado`) passando pela mesma
+camada de serviços que `handle_user_input`: memória e resumo do histórico,
+`montar_prompt`, `transmitir_resposta` (cache e roteamento) e a fila de
+escrita. O banco é temporário.
+
+Ao final, mostra os percentis p50/p95/p99 do turno completo, do tempo até o
+primeiro token e da gravação, a vazão, os erros e a espera pelas conexões do
+pool SQLite (a disputa pelo banco).
+
+Uso:
+    python -m benchmarks.bench_carga --sessoes 32 --turnos 10 --modelo rapido
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from db import db_sqlite
+from db.fila_escrita import enfileirar_mensagens, get_fila_escrita
+from services.cache_service import transmitir_resposta
+from services.memory_service import (
+    adicionar_mensagem, obter_memoria, orcamento_historico, montar_historico, demanda_historico
+)
+from services.metricas_service import MedicaoTurno
+from services.model_service import carregar_chat_cache, carregar_modelo_cache, ler_prompt_sistema
+from services.prompt_service import montar_prompt
+from utils.configs import registrar_provedor_simulado
+
+PROVEDOR = 'Simulado'
+
+
+def _percentis(valores):
+    if not valores:
+        return '-'
+    valores = sorted(valores)
+    return ' / '.join(
+        f"{valores[min(len(valores) - 1, int(p * len(valores)))] * 1000:.0f}" for p in (0.50, 0.95, 0.99)
+    )
+
+
+def _sessao(indice, args, chain, chat, barreira, resultados, lock):
+    """Uma sessão de chat: cria a conversa e faz `args.turnos` perguntas."""
+    conversa_id = db_sqlite.criar_conversa(f'Sessão {indice}', PROVEDOR, args.modelo)
+    orcamento = orcamento_historico(PROVEDOR, args.modelo)
+    historico = []
+    barreira.wait()
+    for turno in range(args.turnos):
+        pergunta = f"Sessão {indice}, pergunta {turno}: como configurar o campo {turno % 7} do formulário?"
+        medicao = MedicaoTurno()
+        tamanho = len(historico)
+        try:
+            adicionar_mensagem(historico, 'user', pergunta, conversa_id)
+            with medicao.etapa('condensacao'):
+                memoria = obter_memoria(conversa_id, historico)
+                prompt = montar_prompt(
+                    pergunta, PROVEDOR, args.modelo,
+                    prompt_sistema=ler_prompt_sistema(),
+                    historico=(
+                        demanda_historico(conversa_id, historico, orcamento),
+                        lambda limite: montar_historico(conversa_id, historico, memoria, orcamento, chat, limite)
+                    )
+                )
+            resposta = ''.join(
+                getattr(pedaco, 'content', pedaco) for pedaco in medicao.medir_stream(transmitir_resposta(
+                    chain, prompt['entrada'], prompt['historico'], PROVEDOR, args.modelo, ler_prompt_sistema(),
+                    ignorar_cache=not args.cache
+                ))
+            )
+            adicionar_mensagem(historico, 'assistant', resposta, conversa_id)
+            total = medicao.total()
+            with medicao.etapa('persistencia'):
+                enfileirar_mensagens(conversa_id, historico[-2:]).result()
+        except Exception as e:
+            del historico[tamanho:]
+            with lock:
+                resultados['erros'].append(f"{type(e).__name__}: {e}")
+            continue
+        with lock:
+            resultados['turnos'].append(total)
+            resultados['ttft'].append(medicao.ttft)
+            resultados['persistencia'].append(medicao.etapas['persistencia'])
+        if args.pausa:
+            time.sleep(args.pausa)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessoes', type=int, default=16)
+    parser.add_argument('--turnos', type=int, default=10, help='perguntas por sessão')
+    parser.add_argument('--modelo', default='rapido', help='perfil do modelo simulado (rapido, lento, instavel)')
+    parser.add_argument('--pausa', type=float, default=0.0, help='segundos entre as perguntas de uma sessão')
+    parser.add_argument('--cache', action='store_true', help='usa o cache de respostas')
+    args = parser.parse_args()
+
+    registrar_provedor_simulado()
+    chain = carregar_modelo_cache(PROVEDOR, args.modelo)
+    chat = carregar_chat_cache(PROVEDOR, args.modelo)
+    resultados = {'turnos': [], 'ttft': [], 'persistencia': [], 'erros': []}
+    lock = threading.Lock()
+    barreira = threading.Barrier(args.sessoes + 1)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_sqlite.configurar_banco(os.path.join(tmp, 'veronia.db'))
+        db_sqlite.init_database()
+        threads = [
+            threading.Thread(target=_sessao, args=(n, args, chain, chat, barreira, resultados, lock))
+            for n in range(args.sessoes)
+        ]
+        for thread in threads:
+            thread.start()
+        db_sqlite.get_pool().zerar_estatisticas()
+        barreira.wait()
+        inicio = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        duracao = time.perf_counter() - inicio
+        get_fila_escrita().barreira().result()
+        pool = db_sqlite.get_pool().estatisticas()
+        db_sqlite.fechar_pool()
+
+    print(f"{args.sessoes} sessões x {args.turnos} turnos | modelo simulado '{args.modelo}' | {duracao:.1f}s")
+    print(f"Turnos concluídos: {len(resultados['turnos'])} ({len(resultados['turnos']) / duracao:.1f}/s)"
+          f" | erros: {len(resultados['erros'])}")
+    print(f"{'':<22} p50 / p95 / p99 (ms)")
+    print(f"{'Turno (até a resposta)':<22} {_percentis(resultados['turnos'])}")
+    print(f"{'Primeiro token':<22} {_percentis(resultados['ttft'])}")
+    print(f"{'Gravação':<22} {_percentis(resultados['persistencia'])}")
+    for tipo in ('leitura', 'escrita'):
+        quantidade = pool[f'{tipo}s']
+        media = pool[f'espera_{tipo}_s'] / quantidade * 1000 if quantidade else 0.0
+        print(f"Pool SQLite, {tipo}s: {quantidade} | espera média {media:.2f} ms"
+              f" | máxima {pool[f'espera_maxima_{tipo}_s'] * 1000:.1f} ms")
+    for erro in sorted(set(resultados['erros']))[:5]:
+        print(f"  {erro}")
+
+
+if __name__ == '__main__':
+    main()
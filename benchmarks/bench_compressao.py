@@ -0,0 +1,99 @@
+"""Benchmark da compressão transparente de mensagens.
+
+Monta duas cópias do mesmo histórico, usando como conteúdo as páginas da
+SmartWiki em `db/pages` (respostas longas intercaladas com perguntas curtas):
+uma com a compressão desativada e outra com o limiar padrão. Reporta o
+tamanho do arquivo após VACUUM e a latência para carregar conversas.
+
+Uso:
+    python -m benchmarks.bench_compressao --conversas 200
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+from db import compressao, db_sqlite
+
+PAGINAS_DIR = Path(__file__).parent.parent / 'db' / 'pages'
+
+
+def _carregar_textos():
+    textos = []
+    for arquivo in sorted(PAGINAS_DIR.glob('*/*.json')):
+        with open(arquivo, 'r', encoding='utf-8') as f:
+            conteudo = json.load(f).get('content', '')
+        if conteudo:
+            textos.append(conteudo)
+    return textos
+
+
+def _popular(caminho, textos, num_conversas, turnos, limiar):
+    rng = random.Random(7)
+    compressao_limiar = compressao.LIMIAR_BYTES
+    compressao.LIMIAR_BYTES = limiar
+    try:
+        db_sqlite.configurar_banco(caminho)
+        db_sqlite.init_database()
+        for n in range(num_conversas):
+            conversa_id = db_sqlite.criar_conversa(f'Conversa {n}', 'Groq', 'bench')
+            mensagens = []
+            for _ in range(turnos):
+                mensagens.append({'role': 'user', 'content': rng.choice(textos)[:200]})
+                resposta = '\n\n'.join(rng.choice(textos) for _ in range(rng.randint(1, 4)))
+                mensagens.append({'role': 'assistant', 'content': resposta})
+            db_sqlite.salvar_mensagens(conversa_id, mensagens)
+        db_sqlite.fechar_pool()
+    finally:
+        compressao.LIMIAR_BYTES = compressao_limiar
+
+    # Ao fechar o pool o WAL já foi incorporado; VACUUM remove o espaço livre.
+    conn = sqlite3.connect(caminho)
+    conn.execute("VACUUM;")
+    conn.close()
+    return os.path.getsize(caminho)
+
+
+def _medir_carga(caminho, num_conversas):
+    db_sqlite.configurar_banco(caminho)
+    inicio = time.perf_counter()
+    total = 0
+    for conversa_id in range(1, num_conversas + 1):
+        total += sum(len(m['content']) for m in db_sqlite.carregar_mensagens(conversa_id))
+    duracao = (time.perf_counter() - inicio) * 1000 / num_conversas
+    db_sqlite.fechar_pool()
+    return duracao, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--conversas', type=int, default=200)
+    parser.add_argument('--turnos', type=int, default=10)
+    args = parser.parse_args()
+
+    textos = _carregar_textos()
+    if not textos:
+        print(f"Nenhuma página encontrada em {PAGINAS_DIR}.")
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        resultados = {}
+        for nome, limiar in (('sem compressão', float('inf')), ('zlib', compressao.LIMIAR_BYTES)):
+            caminho = os.path.join(tmp, f'{nome}.db')
+            tamanho = _popular(caminho, textos, args.conversas, args.turnos, limiar)
+            latencia, caracteres = _medir_carga(caminho, args.conversas)
+            resultados[nome] = (tamanho, latencia, caracteres)
+
+    print(f"Conversas: {args.conversas} | turnos por conversa: {args.turnos}")
+    for nome, (tamanho, latencia, caracteres) in resultados.items():
+        print(f"{nome:>15}: {tamanho / 1024 / 1024:8.2f} MB | {latencia:7.3f} ms por conversa | {caracteres} caracteres")
+    antes, depois = resultados['sem compressão'][0], resultados['zlib'][0]
+    print(f"{'redução':>15}: {100 * (1 - depois / antes):7.1f} %")
+
+
+if __name__ == '__main__':
+    main()
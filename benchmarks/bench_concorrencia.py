@@ -0,0 +1,125 @@
+"""Benchmark de concorrência da camada SQLite.
+
+Simula várias sessões do Streamlit conversando ao mesmo tempo: cada thread
+alterna leituras de histórico (`carregar_mensagens`) com gravações de
+mensagens (`salvar_mensagem`). Compara o comportamento antigo (uma única
+conexão compartilhada, journal padrão) com o pool de conexões em modo WAL.
+
+Uso:
+    python -m benchmarks.bench_concorrencia --threads 8 --operacoes 200
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from db import db_sqlite
+from db.compressao import registrar_funcoes
+
+
+def _rodar_threads(num_threads, operacoes, leitura, escrita):
+    """Executa as operações em paralelo e retorna (ops/s, erros)."""
+    erros = []
+    barreira = threading.Barrier(num_threads)
+
+    def trabalhador(indice):
+        conversa_id = indice + 1
+        barreira.wait()
+        for i in range(operacoes):
+            try:
+                if i % 4 == 0:
+                    escrita(conversa_id, 'user', f'mensagem {i} da sessão {indice}')
+                else:
+                    leitura(conversa_id)
+            except sqlite3.Error as e:
+                erros.append(e)
+
+    threads = [threading.Thread(target=trabalhador, args=(n,)) for n in range(num_threads)]
+    inicio = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    duracao = time.perf_counter() - inicio
+    return (num_threads * operacoes) / duracao, len(erros)
+
+
+def _preparar_banco(caminho, num_conversas, mensagens_por_conversa):
+    db_sqlite.configurar_banco(caminho)
+    db_sqlite.init_database()
+    for n in range(num_conversas):
+        conversa_id = db_sqlite.criar_conversa(f'Conversa {n}', 'Groq', 'bench')
+        for i in range(mensagens_por_conversa):
+            db_sqlite.salvar_mensagem(conversa_id, 'user' if i % 2 == 0 else 'assistant', 'x' * 200)
+    db_sqlite.fechar_pool()
+
+
+def bench_conexao_unica(caminho, num_threads, operacoes):
+    """Reproduz o padrão antigo: uma conexão compartilhada por todo o processo."""
+    conn = sqlite3.connect(caminho, check_same_thread=False)
+    registrar_funcoes(conn)
+    conn.execute("PRAGMA journal_mode = DELETE;")
+    conn.row_factory = sqlite3.Row
+    lock = threading.Lock()
+
+    def escrita(conversa_id, role, content):
+        with lock, conn:
+            conn.execute(
+                "INSERT INTO mensagens (conversa_id, role, content) VALUES (?, ?, ?);",
+                (conversa_id, role, content),
+            )
+
+    def leitura(conversa_id):
+        with lock, conn:
+            conn.execute(
+                "SELECT role, content FROM mensagens WHERE conversa_id = ? ORDER BY timestamp ASC;",
+                (conversa_id,),
+            ).fetchall()
+
+    try:
+        return _rodar_threads(num_threads, operacoes, leitura, escrita)
+    finally:
+        conn.close()
+
+
+def bench_pool(caminho, num_threads, operacoes):
+    """Mede o mesmo cenário passando pelas funções de `db_sqlite`."""
+    db_sqlite.configurar_banco(caminho)
+    try:
+        return _rodar_threads(
+            num_threads, operacoes, db_sqlite.carregar_mensagens, db_sqlite.salvar_mensagem
+        )
+    finally:
+        db_sqlite.fechar_pool()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--operacoes', type=int, default=200, help='operações por thread')
+    parser.add_argument('--conversas', type=int, default=8)
+    parser.add_argument('--mensagens', type=int, default=50, help='mensagens iniciais por conversa')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        base = os.path.join(tmp, 'base.db')
+        _preparar_banco(base, args.conversas, args.mensagens)
+
+        caminho_antigo = os.path.join(tmp, 'antigo.db')
+        origem, destino = sqlite3.connect(base), sqlite3.connect(caminho_antigo)
+        origem.backup(destino)
+        origem.close()
+        destino.close()
+        ops_antigo, erros_antigo = bench_conexao_unica(caminho_antigo, args.threads, args.operacoes)
+        ops_pool, erros_pool = bench_pool(base, args.threads, args.operacoes)
+
+    print(f"Threads: {args.threads} | operações por thread: {args.operacoes}")
+    print(f"Conexão única : {ops_antigo:10.1f} ops/s  ({erros_antigo} erros)")
+    print(f"Pool WAL      : {ops_pool:10.1f} ops/s  ({erros_pool} erros)")
+    print(f"Ganho         : {ops_pool / ops_antigo:10.2f}x")
+
+
+if __name__ == '__main__':
+    main()
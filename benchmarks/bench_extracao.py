@@ -0,0 +1,83 @@
+"""Benchmark da extração paralela de PDFs em um corpus sintético.
+
+Gera `--pdfs` PDFs de `--paginas` páginas de texto e extrai todos de uma vez:
+primeiro em série, com `file_processor.extrair_texto_pdf`, e depois com o
+`MotorExtracao` para cada número de processos pedido. O pool é aquecido antes
+da medição (os processos 'spawn' levam um tempo para subir). Reporta o tempo
+de cada configuração, o ganho sobre a série e confere que o texto extraído é
+o mesmo.
+
+Uso:
+    python -m benchmarks.bench_extracao --pdfs 5 --paginas 200 --processos 1 2 4 8
+"""
+import argparse
+import os
+import random
+import time
+
+import fitz
+
+from services import file_processor
+from services.extracao_paralela import ArquivoEmMemoria, MotorExtracao
+
+PALAVRAS = (
+    'sistema usuário permissão portal formulário relatório campo status configuração '
+    'processo dados resposta exemplo etapa consulta registro cadastro servidor acesso'
+).split()
+
+
+def _gerar_pdf(semente, paginas, linhas):
+    rng = random.Random(semente)
+    doc = fitz.open()
+    for _ in range(paginas):
+        pagina = doc.new_page()
+        texto = '\n'.join(' '.join(rng.choice(PALAVRAS) for _ in range(12)) for _ in range(linhas))
+        pagina.insert_text((36, 36), texto, fontsize=7)
+    dados = doc.tobytes()
+    doc.close()
+    return dados
+
+
+def _serial(corpus):
+    return [file_processor.extrair_texto_pdf(ArquivoEmMemoria(dados, nome, 'application/pdf'))
+            for dados, nome, _ in corpus]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pdfs', type=int, default=5)
+    parser.add_argument('--paginas', type=int, default=200, help='páginas por PDF')
+    parser.add_argument('--linhas', type=int, default=80, help='linhas de texto por página')
+    parser.add_argument('--processos', type=int, nargs='+', default=[1, 2, 4, os.cpu_count() or 1])
+    args = parser.parse_args()
+
+    corpus = [
+        (_gerar_pdf(n, args.paginas, args.linhas), f'documento_{n}.pdf', 'application/pdf')
+        for n in range(args.pdfs)
+    ]
+    tamanho = sum(len(dados) for dados, _, _ in corpus)
+    print(f"{args.pdfs} PDF(s) x {args.paginas} páginas | {tamanho / 1024 / 1024:.1f} MiB"
+          f" | {os.cpu_count()} núcleo(s)")
+
+    inicio = time.perf_counter()
+    referencia = _serial(corpus)
+    serial = time.perf_counter() - inicio
+    print(f"{'processos':>9} | {'tempo (s)':>9} | {'ganho':>6} | texto igual")
+    print(f"{'série':>9} | {serial:9.2f} | {1.0:5.2f}x | -")
+
+    aquecimento = [(_gerar_pdf(0, 1, 1), 'aquecimento.pdf', 'application/pdf')]
+    for processos in sorted(set(args.processos)):
+        motor = MotorExtracao(processos)
+        try:
+            # Sobe todos os processos antes de medir.
+            motor.extrair(aquecimento * processos)
+            inicio = time.perf_counter()
+            textos = motor.extrair(corpus, timeout=3600)
+            duracao = time.perf_counter() - inicio
+        finally:
+            motor.fechar()
+        print(f"{processos:>9} | {duracao:9.2f} | {serial / duracao:5.2f}x | {'sim' if textos == referencia else 'NÃO'}")
+
+
+if __name__ == '__main__':
+    main()
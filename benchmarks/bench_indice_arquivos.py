@@ -0,0 +1,72 @@
+"""Benchmark do índice de arquivos por conversa contra o texto inteiro.
+
+Junta as páginas da SmartWiki em `db/pages` em um único "arquivo carregado"
+de `--paginas` páginas e faz `--perguntas` perguntas sobre ele, como turnos
+de uma mesma conversa. Para cada turno compara os tokens de arquivo que iriam
+para o prompt (texto inteiro contra os trechos de `trechos_relevantes`) e
+reporta o tempo do primeiro turno, que monta o índice, e dos seguintes.
+Usa os embeddings simulados por padrão, sem chamadas de rede.
+
+Uso:
+    python -m benchmarks.bench_indice_arquivos --paginas 100 --perguntas 20
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+from pathlib import Path
+
+from services.indice_arquivos_service import descartar_indice, trechos_relevantes
+from utils.configs import EMBEDDING_SIMULADO
+from utils.tokens import contar_tokens
+
+PAGINAS_DIR = Path(__file__).parent.parent / 'db' / 'pages'
+
+
+def _carregar_paginas():
+    paginas = []
+    for arquivo in sorted(PAGINAS_DIR.glob('*/*.json')):
+        with open(arquivo, 'r', encoding='utf-8') as f:
+            pagina = json.load(f)
+        if pagina.get('content'):
+            paginas.append((pagina.get('title') or arquivo.stem, pagina['content']))
+    return paginas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--paginas', type=int, default=100, help='páginas da wiki no arquivo')
+    parser.add_argument('--perguntas', type=int, default=20)
+    parser.add_argument('--modelo', default=EMBEDDING_SIMULADO, help='modelo de embedding')
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    paginas = _carregar_paginas()[:args.paginas]
+    texto = '\n\n'.join(f"# {titulo}\n{conteudo}" for titulo, conteudo in paginas)
+    arquivos = [('bench', 'wiki.txt', texto)]
+    sorteadas = rng.sample(paginas, min(args.perguntas, len(paginas)))
+    perguntas = [f"O que a documentação diz sobre {titulo}?" for titulo, _ in sorteadas]
+
+    tokens_inteiro = contar_tokens(texto)
+    print(f"{len(paginas)} página(s) | {len(texto) / 1024:.0f} KiB | {tokens_inteiro} tokens no texto inteiro")
+
+    conversa_id = -1
+    descartar_indice(conversa_id)
+    tempos, tokens = [], []
+    for pergunta in perguntas:
+        inicio = time.perf_counter()
+        contexto = trechos_relevantes(conversa_id, arquivos, pergunta, args.modelo)
+        tempos.append(time.perf_counter() - inicio)
+        tokens.append(sum(contar_tokens(conteudo) for _, conteudo in contexto))
+    descartar_indice(conversa_id)
+
+    print(f"primeiro turno (monta o índice): {tempos[0] * 1000:.1f} ms")
+    if len(tempos) > 1:
+        print(f"turnos seguintes: mediana {statistics.median(tempos[1:]) * 1000:.1f} ms")
+    media = statistics.mean(tokens)
+    print(f"tokens de arquivo por turno: {media:.0f} (contra {tokens_inteiro}, {tokens_inteiro / max(media, 1):.1f}x menos)")
+
+
+if __name__ == '__main__':
+    main()
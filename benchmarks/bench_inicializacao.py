@@ -0,0 +1,127 @@
+"""Benchmark do tempo de inicialização (cold start) da aplicação.
+
+Mede, cada um em um processo Python novo:
+
+- o tempo de importação de cada módulo, via `python -X importtime`, e os
+  pacotes mais pesados que ele arrasta;
+- o tempo até a primeira renderização: uma execução completa de `app.py` com
+  o `streamlit.testing.v1.AppTest`, sem nenhuma interação.
+
+Para comparar antes e depois de uma mudança, rode o benchmark em cada commit.
+
+Uso:
+    python -m benchmarks.bench_inicializacao --repeticoes 3
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+RAIZ = Path(__file__).parent.parent
+
+MODULOS = [
+    'utils.configs',
+    'services.model_service',
+    'services.rag_service',
+    'services.file_processor',
+    'components.sidebar',
+    'components.chat_interface',
+    'app',
+]
+
+_SCRIPT_RENDER = """
+import time
+inicio = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file('app.py', default_timeout=120)
+app.run()
+print(time.perf_counter() - inicio)
+for erro in app.exception:
+    print('EXCECAO', erro.message)
+"""
+
+
+def _importtime(modulo):
+    """Importa `modulo` em um processo novo.
+
+    Returns:
+
+        tuple[float | None, list[tuple[float, str]]]: O tempo cumulativo, em ms,
+
+            do módulo (None se a importação falhou) e os pacotes fora da
+
+            biblioteca padrão que ele importou, com seus tempos cumulativos.
+
+    """
+    processo = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {modulo}'],
+        cwd=RAIZ, capture_output=True, text=True,
+    )
+    total = None
+    pacotes = {}
+    for linha in processo.stderr.splitlines():
+        if not linha.startswith('import time:') or linha.count('|') != 2:
+            continue
+        _, cumulativo, nome = (parte.strip() for parte in linha[len('import time:'):].split('|'))
+        if not cumulativo.isdigit():
+            continue
+        ms = int(cumulativo) / 1000
+        if nome == modulo:
+            total = ms
+        elif '.' not in nome and nome not in sys.stdlib_module_names:
+            # Pacotes de terceiros (e do projeto) no nível mais alto.
+            pacotes[nome] = max(ms, pacotes.get(nome, 0))
+    if processo.returncode != 0:
+        total = None
+    return total, sorted(((ms, nome) for nome, ms in pacotes.items()), reverse=True)
+
+
+def _primeira_renderizacao():
+    processo = subprocess.run(
+        [sys.executable, '-c', _SCRIPT_RENDER], cwd=RAIZ, capture_output=True, text=True,
+    )
+    if processo.returncode != 0:
+        return None, processo.stderr.strip().splitlines()[-1:] or ['erro desconhecido']
+    linhas = processo.stdout.strip().splitlines()
+    return float(linhas[0]) * 1000, [l for l in linhas[1:] if l.startswith('EXCECAO')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeticoes', type=int, default=3)
+    parser.add_argument('--pacotes', type=int, default=5, help='pacotes mais pesados listados por módulo')
+    parser.add_argument('--sem-render', action='store_true', help='não mede a primeira renderização')
+    args = parser.parse_args()
+
+    print(f"{'módulo':<28} | {'import (ms)':>11} | pacotes mais pesados")
+    for modulo in MODULOS:
+        tempos = []
+        pacotes = []
+        for _ in range(args.repeticoes):
+            total, pacotes = _importtime(modulo)
+            if total is None:
+                break
+            tempos.append(total)
+        if not tempos:
+            print(f"{modulo:<28} | {'falhou':>11} |")
+            continue
+        pesados = ', '.join(f"{nome} {ms:.0f}" for ms, nome in pacotes[:args.pacotes] if ms >= 1)
+        print(f"{modulo:<28} | {statistics.median(tempos):11.1f} | {pesados}")
+
+    if args.sem_render:
+        return
+    tempos = []
+    for _ in range(args.repeticoes):
+        ms, avisos = _primeira_renderizacao()
+        if ms is None:
+            print(f"Primeira renderização: falhou ({' '.join(avisos)})")
+            return
+        tempos.append(ms)
+        for aviso in avisos:
+            print(aviso)
+    print(f"Primeira renderização (AppTest): {statistics.median(tempos):.0f} ms (mediana de {len(tempos)})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+"""Execução em lote de perguntas, sem a interface, com concorrência limitada.
+
+Lê um JSONL de perguntas e envia cada uma à mesma chain que a aplicação usa
+(`carregar_modelo_cache`): prompt de sistema do arquivo, entrada montada por
+`montar_prompt` e, com `--base`, o contexto da base de conhecimento
+consultada pelo `RagQueryEngine`. As perguntas rodam em paralelo com
+`astream`/`ainvoke`, no máximo `--concorrencia` por vez.
+
+Cada linha da entrada é um objeto com 'pergunta' e, opcionalmente, 'id'.
+Cada linha da saída traz a resposta (ou o erro), os tempos e os tokens da
+pergunta para um nível de concorrência. Passando vários níveis, o mesmo lote
+roda uma vez por nível e o resumo compara a vazão de cada um.
+
+Uso:
+    python -m benchmarks.bench_lote_perguntas perguntas.jsonl respostas.jsonl \\
+        --provedor Groq --modelo llama-3.3-70b-versatile --concorrencia 1 4 16
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from dotenv import load_dotenv
+
+from services.model_service import carregar_modelo_cache, ler_prompt_sistema
+from services.prompt_service import montar_prompt
+from utils.constants import DEFAULT_PROVIDER, DEFAULT_MODEL
+from utils.tokens import contar_tokens
+
+
+def _ler_perguntas(caminho):
+    perguntas = []
+    with open(caminho, encoding='utf-8') as arquivo:
+        for numero, linha in enumerate(arquivo, 1):
+            if linha.strip():
+                registro = json.loads(linha)
+                perguntas.append((registro.get('id', numero), registro['pergunta']))
+    return perguntas
+
+
+def _percentil(valores, p):
+    if not valores:
+        return 0.0
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(p * len(valores)))]
+
+
+async def _responder(identificador, pergunta, chain, motor_rag, args, prompt_sistema, limite):
+    """Responde uma pergunta e retorna o registro da saída."""
+    registro = {'id': identificador, 'pergunta': pergunta}
+    async with limite:
+        inicio = time.perf_counter()
+        try:
+            contexto_rag = ''
+            if motor_rag is not None:
+                contexto_rag, _ = await motor_rag.aquery(pergunta)
+                registro['recuperacao_s'] = time.perf_counter() - inicio
+            prompt = montar_prompt(
+                pergunta, args.provedor, args.modelo,
+                prompt_sistema=prompt_sistema, contexto_rag=contexto_rag
+            )
+
+            inicio_geracao = time.perf_counter()
+            partes = []
+            async for pedaco in chain.astream({'input': prompt['entrada'], 'chat_history': []}):
+                if not partes:
+                    registro['ttft_s'] = time.perf_counter() - inicio_geracao
+                partes.append(pedaco if isinstance(pedaco, str) else getattr(pedaco, 'content', '') or '')
+            geracao = time.perf_counter() - inicio_geracao
+
+            registro['resposta'] = ''.join(partes)
+            registro['tokens_entrada'] = prompt['total']
+            registro['tokens_saida'] = contar_tokens(registro['resposta'])
+            decodificacao = geracao - registro.get('ttft_s', 0.0)
+            if registro['tokens_saida'] and decodificacao > 0:
+                registro['tokens_por_s'] = registro['tokens_saida'] / decodificacao
+        except Exception as e:
+            registro['erro'] = f"{type(e).__name__}: {e}"
+        registro['total_s'] = time.perf_counter() - inicio
+    return registro
+
+
+async def rodar_lote(perguntas, chain, motor_rag, args, concorrencia):
+    """Roda todas as perguntas com no máximo `concorrencia` simultâneas.
+
+    Returns:
+
+        tuple[list[dict], float]: Os registros, na ordem da entrada, e o tempo
+
+            total do lote em segundos.
+
+    """
+    limite = asyncio.Semaphore(concorrencia)
+    prompt_sistema = ler_prompt_sistema()
+    inicio = time.perf_counter()
+    registros = await asyncio.gather(*(
+        _responder(identificador, pergunta, chain, motor_rag, args, prompt_sistema, limite)
+        for identificador, pergunta in perguntas
+    ))
+    return registros, time.perf_counter() - inicio
+
+
+async def _rodar_niveis(perguntas, chain, motor_rag, args, saida):
+    # Um único event loop para todos os níveis: os clientes HTTP assíncronos
+    # dos provedores ficam presos ao loop em que foram usados pela primeira vez.
+    for concorrencia in args.concorrencia:
+        registros, duracao = await rodar_lote(perguntas, chain, motor_rag, args, concorrencia)
+        for registro in registros:
+            registro['concorrencia'] = concorrencia
+            saida.write(json.dumps(registro, ensure_ascii=False) + '\n')
+        print(_resumo(concorrencia, registros, duracao))
+
+
+def _resumo(concorrencia, registros, duracao):
+    ok = [r for r in registros if 'erro' not in r]
+    latencias = [r['total_s'] for r in ok]
+    ttfts = [r['ttft_s'] for r in ok if 'ttft_s' in r]
+    tokens = sum(r.get('tokens_saida', 0) for r in ok)
+    return (
+        f"{concorrencia:>12} | {len(ok):>3}/{len(registros):<3} | {duracao:9.1f} | "
+        f"{len(ok) / duracao:10.2f} | {tokens / duracao:9.0f} | "
+        f"{statistics.median(latencias) if latencias else 0:7.2f} | {_percentil(latencias, 0.95):7.2f} | "
+        f"{statistics.median(ttfts) if ttfts else 0:8.2f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('entrada', help='JSONL com uma pergunta por linha')
+    parser.add_argument('saida', help='JSONL onde as respostas são gravadas')
+    parser.add_argument('--provedor', default=DEFAULT_PROVIDER)
+    parser.add_argument('--modelo', default=DEFAULT_MODEL)
+    parser.add_argument('--base', help="base de conhecimento consultada antes de cada pergunta ('Todos' para todas)")
+    parser.add_argument('--embedding', default='text-embedding-3-small', help='modelo de embedding da base')
+    parser.add_argument('--concorrencia', type=int, nargs='+', default=[4], help='um ou mais níveis de concorrência')
+    args = parser.parse_args()
+
+    load_dotenv()
+    perguntas = _ler_perguntas(args.entrada)
+    chain = carregar_modelo_cache(args.provedor, args.modelo)
+    if chain is None:
+        raise SystemExit(f"Não foi possível carregar {args.provedor}/{args.modelo}.")
+
+    motor_rag = None
+    if args.base:
+        from agents.rag_agent import RagQueryEngine
+        motor_rag = RagQueryEngine(
+            collection_names=None if args.base == 'Todos' else [args.base],
+            embedding_model=args.embedding,
+        )
+
+    print(f"{len(perguntas)} pergunta(s) | {args.provedor}/{args.modelo}" + (f" | RAG: {args.base}" if args.base else ''))
+    print(f"{'concorrência':>12} | {'ok':>7} | {'total (s)':>9} | {'perguntas/s':>10} | {'tokens/s':>9} | "
+          f"{'p50 (s)':>7} | {'p95 (s)':>7} | {'TTFT p50':>8}")
+    with open(args.saida, 'w', encoding='utf-8') as saida:
+        asyncio.run(_rodar_niveis(perguntas, chain, motor_rag, args, saida))
+
+
+if __name__ == '__main__':
+    main()
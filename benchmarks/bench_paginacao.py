@@ -0,0 +1,57 @@
+"""Benchmark de abertura de conversas longas com paginação por keyset.
+
+Compara `carregar_mensagens` (conversa inteira) com a primeira página de
+`carregar_mensagens_pagina` para conversas de tamanhos crescentes,
+reportando latência e quantidade de mensagens materializadas na sessão.
+
+Uso:
+    python -m benchmarks.bench_paginacao --maximo 100000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from db import db_sqlite
+from utils.constants import CHAT_MESSAGE_LIMIT
+
+
+def _medir(funcao, repeticoes=10):
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        resultado = funcao()
+    return (time.perf_counter() - inicio) / repeticoes * 1000, resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--maximo', type=int, default=100_000, help='tamanho da maior conversa')
+    args = parser.parse_args()
+
+    tamanhos = []
+    tamanho = 100
+    while tamanho <= args.maximo:
+        tamanhos.append(tamanho)
+        tamanho *= 10
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_sqlite.configurar_banco(os.path.join(tmp, 'veronia.db'))
+        db_sqlite.init_database()
+        print(f"{'mensagens':>10} | {'completa (ms)':>13} | {'itens':>7} | {'página (ms)':>11} | {'itens':>5}")
+        for tamanho in tamanhos:
+            conversa_id = db_sqlite.criar_conversa(f'Conversa {tamanho}', 'Groq', 'bench')
+            with db_sqlite.get_pool().escrita() as conn:
+                conn.executemany(
+                    "INSERT INTO mensagens (conversa_id, role, content) VALUES (?, ?, ?);",
+                    ((conversa_id, 'user', 'x' * 500) for _ in range(tamanho)),
+                )
+            completa, todas = _medir(lambda: db_sqlite.carregar_mensagens(conversa_id))
+            pagina, janela = _medir(
+                lambda: db_sqlite.carregar_mensagens_pagina(conversa_id, limite=CHAT_MESSAGE_LIMIT + 1)
+            )
+            print(f"{tamanho:>10} | {completa:>13.2f} | {len(todas):>7} | {pagina:>11.3f} | {len(janela):>5}")
+        db_sqlite.fechar_pool()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,45 +1,68 @@
 import streamlit as st
 import time
 
-from db.db_sqlite import salvar_mensagem, atualizar_titulo_conversa
-from services.memory_service import get_historico, reconstruir_memoria, adicionar_mensagem
-from services.conversation_service import inicia_nova_conversa_service
-from services import file_processor  # Importa o novo módulo
+from db.fila_escrita import enfileirar_mensagens
+from services.memory_service import (
+    get_historico, obter_memoria, adicionar_mensagem, montar_historico, orcamento_historico,
+    demanda_historico
+)
+from services.model_service import carregar_chat_cache, ler_prompt_sistema
+from services.prompt_service import montar_prompt
+from services.cache_service import transmitir_resposta
+from services.metricas_service import MedicaoTurno, registrar_turno
+from services.limites_service import CotaEsgotada
+from services.extracao_service import arquivos_do_turno
+from services.indice_arquivos_service import trechos_relevantes
+from services.conversation_service import inicia_nova_conversa_service, carregar_mensagens_anteriores_service
 from services.rag_service import consultar_base_de_conhecimento # Importa o serviço RAG
 from utils.constants import (
     HEADER_TITLE, INITIALIZING_MESSAGE, WELCOME_MESSAGE,
-    USAGE_INSTRUCTIONS, CHAT_INPUT_PLACEHOLDER, TITLE_TRUNCATE_LENGTH,
-    CHAT_MESSAGE_LIMIT
+    USAGE_INSTRUCTIONS, CHAT_INPUT_PLACEHOLDER, TITLE_TRUNCATE_LENGTH, ROTULOS_CONTEXTO
 )
 
 
-def process_uploaded_files():
+def process_uploaded_files(conversa_id=None):
     """
-    Processa os arquivos carregados e retorna o contexto extraído.
+    Processa os arquivos carregados e retorna os trios (chave, nome, conteúdo
+    extraído) da conversa e os nomes dos arquivos anexados neste turno.
+
+    Os arquivos são anexados à conversa, e os anexados em turnos anteriores
+    também entram no resultado, sem novo upload nem nova extração.
     """
     uploaded_files = st.session_state.get('uploaded_files', [])
-    if not uploaded_files:
-        return ""
-    
-    contexto_arquivos = []
-    
+    if not uploaded_files and not conversa_id:
+        return [], []
+
+    # A extração roda em outros processos; os erros dela voltam por aqui.
+    avisos = {}
+    contexto_arquivos, adicionados = arquivos_do_turno(conversa_id, uploaded_files, avisos)
+
+    extraidos = {nome for _, nome, _ in contexto_arquivos}
     for arquivo in uploaded_files:
-        # Reset do ponteiro do arquivo para o início
-        arquivo.seek(0)
-        
-        # Processa o arquivo usando o módulo file_processor
-        conteudo = file_processor.processar_automatico(arquivo)
-        
-        if conteudo:
-            contexto_arquivos.append(f"=== CONTEÚDO DO ARQUIVO: {arquivo.name} ===\n{conteudo}\n")
-    
-    return "\n".join(contexto_arquivos)
+        if arquivo.name in avisos:
+            st.warning(avisos[arquivo.name])
+        elif arquivo.name not in extraidos:
+            st.warning(f"Não foi possível extrair o texto de '{arquivo.name}'.")
+
+    return contexto_arquivos, adicionados
+
+
+def renderiza_mensagens(historico):
+    """Renderiza a janela de mensagens carregada na sessão.
 
+    O histórico contém apenas as páginas já buscadas no banco; mensagens mais
 
-def renderiza_mensagens(historico, limite=CHAT_MESSAGE_LIMIT):
-    """Renderiza as mensagens do histórico de chat."""
+    antigas são carregadas sob demanda pelo botão no topo da conversa.
 
-    for msg in historico[-limite:]:
+    """
+    if st.session_state.get('historico_tem_mais'):
+        st.button(
+            'Carregar mensagens anteriores',
+            on_click=carregar_mensagens_anteriores_service,
+            use_container_width=True
+        )
+
+    for msg in historico:
         role = msg['role']
         content = msg['content']
         if role == 'user':
@@ -73,51 +96,97 @@ def render_chat_ui():
             st.markdown(USAGE_INSTRUCTIONS)
 
 
-def process_ai_response(input_usuario, memoria, contexto_arquivos=""):
-    """Processa a resposta da IA com contexto de arquivos."""
-    tempo_inicial = time.time()
-    
-    # Constrói o prompt com contexto dos arquivos
-    if contexto_arquivos:
-        prompt_completo = f"""CONTEXTO DOS ARQUIVOS CARREGADOS:
-{contexto_arquivos}
+def process_ai_response(input_usuario, historico_modelo, ignorar_cache=False, medicao=None):
+    """Processa a resposta da IA para o prompt já montado por `montar_prompt`.
 
-PERGUNTA DO USUÁRIO:
-{input_usuario}
+    Respostas já dadas para a mesma entrada e histórico vêm do cache de
 
-Por favor, responda considerando o contexto dos arquivos fornecidos acima."""
-    else:
-        prompt_completo = input_usuario
-    
+    respostas, a menos que `ignorar_cache` seja True. Se o modelo não começar a
+
+    responder dentro do prazo, o provedor reserva é acionado. Com uma `medicao`,
+
+    registra nela o tempo até o primeiro token, a geração e os tokens gerados.
+
+    """
+    tempo_inicial = time.time()
+
+    relatorio = {}
+    prazo = st.session_state.get('prazo_ttft') or None
+    medicao = medicao or MedicaoTurno()
     with st.chat_message('ai'):
         try:
-            resposta = st.write_stream(st.session_state['chain'].stream({
-                'input': prompt_completo,
-                'chat_history': memoria.buffer_as_messages
-            }))
+            resposta = st.write_stream(medicao.medir_stream(transmitir_resposta(
+                st.session_state['chain'],
+                input_usuario,
+                historico_modelo,
+                st.session_state.get('provedor'),
+                st.session_state.get('modelo'),
+                ler_prompt_sistema(),
+                ignorar_cache=ignorar_cache,
+                prazo=prazo,
+                relatorio=relatorio
+            )))
+        except CotaEsgotada as e:
+            st.warning(f"Limite de uso do provedor atingido. Tente novamente em instantes. ({e})")
+            return None
         except Exception as e:
             st.error(f"Erro ao processar resposta: {str(e)}")
             return None
+    medicao.contar_resposta(resposta if isinstance(resposta, str) else ''.join(map(str, resposta)))
     
     tempo_final = time.time()
     with st.sidebar:
         st.session_state['tempo_resposta'] = tempo_final - tempo_inicial
+        st.session_state['provedor_resposta'] = relatorio
     
     return resposta
 
 
-def save_conversation(conversa_atual, input_usuario, resposta):
-    """Salva a conversa no banco de dados."""
+def save_conversation(conversa_atual, turno):
+    """Enfileira o turno (pergunta, resposta e título inicial) para gravação.
+
+    A gravação acontece em segundo plano, em uma única transação, para que a
+
+    interface seja redesenhada sem esperar o disco. Quando ela termina, as
+
+    mensagens do histórico da sessão recebem seus IDs no banco.
+
+    Returns:
+
+        Future: A gravação do turno (veja `db.fila_escrita`).
+
+    """
+    titulo = None
     if 'titulo_atualizado' not in st.session_state:
-        atualizar_titulo_conversa(conversa_atual, input_usuario[:TITLE_TRUNCATE_LENGTH])
+        titulo = turno[0]['content'][:TITLE_TRUNCATE_LENGTH]
         st.session_state['titulo_atualizado'] = True
-        st.cache_data.clear()
-    
-    try:
-        salvar_mensagem(conversa_atual, 'user', input_usuario)
-        salvar_mensagem(conversa_atual, 'assistant', resposta)
-    except Exception as e:
-        st.error(f"Erro ao salvar mensagens: {str(e)}")
+
+    futuro = enfileirar_mensagens(conversa_atual, turno, titulo=titulo)
+
+    def atribuir_ids(futuro):
+        if futuro.exception() is None:
+            for mensagem, mensagem_id in zip(turno, futuro.result()):
+                mensagem['id'] = mensagem_id
+
+    futuro.add_done_callback(atribuir_ids)
+    return futuro
+
+
+def registrar_metricas_turno(conversa_atual, medicao, futuro_gravacao, inicio_gravacao):
+    """Guarda as medidas do turno na sessão e as enfileira quando a gravação do turno termina."""
+    relatorio = st.session_state.get('provedor_resposta') or {}
+    provedor = relatorio.get('provedor', st.session_state.get('provedor'))
+    modelo = relatorio.get('modelo', st.session_state.get('modelo'))
+    medidas = medicao.medidas(relatorio)
+    st.session_state['metricas_turno'] = medidas
+
+    def gravar(_futuro):
+        # Roda na thread da fila de escrita, logo após o COMMIT do turno: só
+        # enfileira a linha, que entra no próximo lote sem segurar este.
+        medidas['persistencia_s'] = time.perf_counter() - inicio_gravacao
+        registrar_turno(conversa_atual, provedor, modelo, medidas)
+
+    futuro_gravacao.add_done_callback(gravar)
 
 
 def handle_user_input(input_usuario):
@@ -130,14 +199,22 @@ def handle_user_input(input_usuario):
         conversa_atual = st.session_state.get('conversa_atual')
         historico = get_historico()
 
+    medicao = MedicaoTurno()
+
     # Processa arquivos carregados
-    contexto_arquivos = process_uploaded_files()
+    with medicao.etapa('extracao'):
+        contexto_arquivos, adicionados = process_uploaded_files(conversa_atual)
 
-    # Mostra feedback visual se há arquivos sendo processados
+    # Avisa só quando o turno trouxe arquivos novos; os já anexados seguem em silêncio
+    if adicionados:
+        st.success(f"{len(adicionados)} arquivo(s) anexado(s); {len(contexto_arquivos)} arquivo(s) da conversa no contexto")
     if contexto_arquivos:
-        with st.spinner("Processando arquivos carregados..."):
-            time.sleep(0.5)  # Feedback visual
-        st.success(f"{len(st.session_state.get('uploaded_files', []))} arquivo(s) processado(s)")
+        # Arquivos grandes entram só com os trechos relevantes para a pergunta
+        with medicao.etapa('recuperacao'):
+            contexto_arquivos = trechos_relevantes(
+                conversa_atual, contexto_arquivos, input_usuario,
+                st.session_state.get('modelo_embedding', 'text-embedding-3-small')
+            )
 
     # Processa contexto RAG (abordagem híbrida)
     rag_context = ""
@@ -145,7 +222,8 @@ def handle_user_input(input_usuario):
         base_selecionada = st.session_state.get('rag_base_selecionada')
         if base_selecionada:
             with st.spinner(f"Consultando base de conhecimento RAG: {base_selecionada}..."):
-                rag_context = consultar_base_de_conhecimento(input_usuario, base_selecionada)
+                with medicao.etapa('recuperacao'):
+                    rag_context = consultar_base_de_conhecimento(input_usuario, base_selecionada)
             if rag_context:
                 st.info("Contexto RAG adicionado.")
             # Reseta o flag de uso único após a consulta
@@ -153,27 +231,51 @@ def handle_user_input(input_usuario):
         else:
             st.warning("Por favor, selecione uma base de conhecimento na aba RAG para usar o RAG.")
 
-    # Constrói o input final para o modelo
-    input_para_modelo = input_usuario
-    if contexto_arquivos:
-        input_para_modelo = f"CONTEXTO DOS ARQUIVOS CARREGADOS:\n{contexto_arquivos}\n\n{input_para_modelo}"
-    if rag_context:
-        input_para_modelo = f"CONTEXTO DA BASE DE CONHECIMENTO:\n{rag_context}\n\n{input_para_modelo}"
+    adicionar_mensagem(historico, 'user', input_usuario, conversa_atual) # Salva o input original do usuário no histórico
 
-    adicionar_mensagem(historico, 'user', input_usuario) # Salva o input original do usuário no histórico
-    memoria = reconstruir_memoria(historico)
+    # Divide o orçamento do modelo entre histórico, arquivos e RAG
+    with medicao.etapa('condensacao'):
+        memoria = obter_memoria(conversa_atual, historico)
+        provedor = st.session_state.get('provedor')
+        modelo = st.session_state.get('modelo')
+        orcamento = orcamento_historico(provedor, modelo)
+        chat_resumo = carregar_chat_cache(provedor, modelo)
+        prompt = montar_prompt(
+            input_usuario, provedor, modelo,
+            prompt_sistema=ler_prompt_sistema(),
+            arquivos=contexto_arquivos,
+            contexto_rag=rag_context,
+            historico=(
+                demanda_historico(conversa_atual, historico, orcamento),
+                lambda limite: montar_historico(conversa_atual, historico, memoria, orcamento, chat_resumo, limite)
+            )
+        )
+    st.session_state['tokens_prompt'] = {
+        chave: prompt[chave] for chave in ('tokens', 'total', 'orcamento', 'cortes')
+    }
+    if prompt['aviso']:
+        st.warning(f"{prompt['aviso']} Arquivos e RAG ficam de fora e o histórico é reduzido ao mínimo.")
+    cortes = [ROTULOS_CONTEXTO[fonte] for fonte in prompt['cortes'] if fonte != 'historico']
+    if cortes:
+        st.info(f"Contexto reduzido aos trechos mais relevantes para caber no modelo: {', '.join(cortes)}.")
 
     # Passa o input final (com arquivos e/ou RAG) para a IA
-    resposta = process_ai_response(input_para_modelo, memoria)
+    ignorar_cache = st.session_state.get('ignorar_cache_onetime', False)
+    st.session_state['ignorar_cache_onetime'] = False
+    resposta = process_ai_response(
+        prompt['entrada'], prompt['historico'], ignorar_cache=ignorar_cache, medicao=medicao
+    )
     if resposta is None:
         return
 
-    adicionar_mensagem(historico, 'assistant', resposta)
+    adicionar_mensagem(historico, 'assistant', resposta, conversa_atual)
     st.session_state['historico'] = historico
 
-    save_conversation(conversa_atual, input_usuario, resposta)
+    inicio_gravacao = time.perf_counter()
+    futuro = save_conversation(conversa_atual, historico[-2:])
+    registrar_metricas_turno(conversa_atual, medicao, futuro, inicio_gravacao)
 
-    # IMPORTANTE: Limpa os arquivos após processar para evitar reprocessamento
+    # Os arquivos ficam anexados à conversa; os próximos turnos os usam sem novo upload
     st.session_state['uploaded_files'] = []
 
     st.rerun()
@@ -7,12 +7,19 @@ from services.conversation_service import (
     seleciona_conversa_service,
     inicia_nova_conversa_service,
     renomear_conversa_service,
-    excluir_conversa_service
+    excluir_conversa_service,
+    buscar_conversas_service
 )
-from utils.configs import config_modelos
+from utils.configs import config_modelos, EMBEDDING_SIMULADO
+from utils.constants import CONVERSAS_POR_PAGINA, ROTULOS_CONTEXTO, ROTULOS_ETAPAS
 from services.scraping_service import raspar_links_e_salvar_paginas, indexar_base_de_conhecimento
 from services.rag_service import check_chroma_collection_count, get_scraped_document_count, list_all_knowledge_bases
 from services.model_service import carregar_modelo_cache
+from services.cache_service import contadores_cache
+from services.extracao_service import contadores_extracao
+from services.metricas_service import medias_turnos
+from services.limites_service import estatisticas_limites
+from db.cache_extracoes import arquivos_da_conversa, desanexar_arquivos
 
 # Caminho para o arquivo JSON de links
 LINKS_FILE = Path("db/smartwiki_links.json")
@@ -29,14 +36,45 @@ def salvar_links(links):
     with open(LINKS_FILE, "w", encoding="utf-8") as f:
         json.dump(links, f, indent=2)
 
+def render_resultados_busca(tab, texto):
+    """Renderiza os resultados da busca textual nas conversas."""
+    resultados = buscar_conversas_service(texto)
+    if not resultados:
+        tab.caption('Nenhuma conversa encontrada.')
+        return
+
+    for resultado in resultados:
+        conversa_id = resultado['conversa_id']
+        tab.button(
+            resultado['titulo'],
+            key=f"busca_{conversa_id}",
+            on_click=seleciona_conversa_service,
+            args=(conversa_id,),
+            disabled=conversa_id == st.session_state.get('conversa_atual'),
+            use_container_width=True
+        )
+        if resultado['mensagem_id'] is not None:
+            tab.caption(resultado['trecho'])
+
 def render_tabs_conversas(tab):
     """Renderiza a aba de gerenciamento de conversas na barra lateral."""
     
     tab.markdown('')
     tab.button('Nova conversa', on_click=inicia_nova_conversa_service, use_container_width=True)
+    texto_busca = tab.text_input(
+        'Buscar nas conversas',
+        key='busca_conversas',
+        placeholder='Palavras do título ou das mensagens',
+        label_visibility='collapsed'
+    )
     tab.markdown('')
 
-    conversas = listar_conversas_cached()
+    if texto_busca.strip():
+        render_resultados_busca(tab, texto_busca)
+        return
+
+    limite = st.session_state.get('conversas_limite', CONVERSAS_POR_PAGINA)
+    conversas = listar_conversas_cached(limite)
     for id, titulo in conversas:
         if len(titulo) == 30:
             titulo += '...'
@@ -71,6 +109,27 @@ def render_tabs_conversas(tab):
                     renomear_conversa_service(id, novo)
                     st.session_state[f"renomear_{id}"] = False
 
+    if len(conversas) == limite:
+        if tab.button('Mostrar mais conversas', use_container_width=True):
+            st.session_state['conversas_limite'] = limite + CONVERSAS_POR_PAGINA
+            st.rerun()
+
+def render_arquivos_conversa():
+    """Mostra os arquivos anexados à conversa atual, usados em todas as perguntas dela."""
+    conversa_atual = st.session_state.get('conversa_atual')
+    if not conversa_atual:
+        return
+    anexos = arquivos_da_conversa(conversa_atual)
+    if not anexos:
+        return
+    st.markdown("**Anexados a esta conversa**")
+    for _, nome in anexos:
+        st.caption(f"📎 {nome}")
+    if st.button('Remover anexos', use_container_width=True,
+                 help='As próximas perguntas desta conversa deixam de usar estes arquivos.'):
+        desanexar_arquivos(conversa_atual)
+        st.rerun()
+
 def render_tabs_configuracoes(tab):
     """Renderiza a aba de configurações do modelo na barra lateral."""
     with tab.expander('Upload de arquivos', expanded=True):
@@ -86,6 +145,7 @@ def render_tabs_configuracoes(tab):
             st.success(f"✅ {len(st.session_state['uploaded_files'])} arquivo(s) pronto(s) para uso.")
             for file in st.session_state['uploaded_files']:
                 st.caption(f"📄 {file.name}")
+        render_arquivos_conversa()
 
     with tab.expander('Seleção de modelo'):
         provedor = st.selectbox('Selecione o provedor', list(config_modelos.keys()))
@@ -100,9 +160,24 @@ def render_tabs_configuracoes(tab):
             else:
                 st.error("Falha ao carregar o modelo.")
 
+    with tab.expander('Cache de respostas'):
+        if st.button(
+            'Ignorar cache na próxima pergunta',
+            use_container_width=True,
+            help='Consulta o modelo mesmo que a pergunta já tenha uma resposta guardada.'
+        ):
+            st.session_state['ignorar_cache_onetime'] = True
+        if st.session_state.get('ignorar_cache_onetime', False):
+            st.info("A próxima resposta virá do modelo, sem usar o cache.")
+
     with tab.expander('Configurações avançadas'):
         st.session_state['temperatura'] = st.slider('Temperatura', 0.0, 1.0, 0.7, 0.1)
         st.session_state['max_tokens'] = st.slider('Máximo de tokens', 100, 4000, 1000, 100)
+        st.session_state['prazo_ttft'] = st.number_input(
+            'Prazo para o primeiro token (s)', 0.0, 120.0, 0.0, 0.5,
+            help='Acima deste tempo sem resposta, a pergunta também é enviada ao provedor reserva. '
+                 '0 usa o prazo automático, calculado pelas latências registradas do modelo.'
+        )
 
 def render_tabs_rag(tab):
     """Renderiza a aba de configurações RAG na barra lateral."""
@@ -169,7 +244,10 @@ def render_tabs_rag(tab):
                 st.metric("Chunks", num_chunks_ingested)
 
     with tab.expander('Configurações de embedding', expanded=False):
-        st.session_state['modelo_embedding'] = st.selectbox('Modelo de embedding', ['text-embedding-3-small', 'text-embedding-3-large', 'text-embedding-ada-002'], disabled=not rag_ativo)
+        modelos_embedding = ['text-embedding-3-small', 'text-embedding-3-large', 'text-embedding-ada-002']
+        if 'Simulado' in config_modelos:
+            modelos_embedding.append(EMBEDDING_SIMULADO)
+        st.session_state['modelo_embedding'] = st.selectbox('Modelo de embedding', modelos_embedding, disabled=not rag_ativo)
         st.session_state['chunk_size'] = st.slider('Tamanho do chunk', 200, 2000, 1000, 100, disabled=not rag_ativo)
         st.session_state['chunk_overlap'] = st.slider('Sobreposição', 0, 500, 200, 50, disabled=not rag_ativo)
 
@@ -235,6 +313,75 @@ def render_tempo_resposta():
     """Renderiza o tempo de resposta da última consulta."""
     if 'tempo_resposta' in st.session_state:
         st.caption(f'Tempo da resposta: {st.session_state["tempo_resposta"]:.2f}s')
+    respondeu = st.session_state.get('provedor_resposta')
+    if respondeu and respondeu.get('reserva'):
+        st.caption(f"Respondido pelo provedor reserva: {respondeu['provedor']} ({respondeu['modelo']})")
+
+def _descrever_metricas(medidas):
+    """Formata TTFT, vazão e tempo por etapa de um conjunto de medidas."""
+    partes = []
+    if medidas.get('ttft_s') is not None:
+        partes.append(f"1º token {medidas['ttft_s']:.2f}s")
+    if medidas.get('tokens_por_s'):
+        partes.append(f"{medidas['tokens_por_s']:.0f} tokens/s")
+    if medidas.get('tokens_saida'):
+        partes.append(f"{medidas['tokens_saida']:.0f} tokens")
+    partes += [
+        f"{rotulo} {medidas[f'{etapa}_s']:.2f}s"
+        for etapa, rotulo in ROTULOS_ETAPAS.items() if medidas.get(f'{etapa}_s') is not None
+    ]
+    return ' · '.join(partes)
+
+def render_metricas_turno():
+    """Renderiza onde o tempo do último turno foi gasto e as médias dos turnos recentes."""
+    medidas = st.session_state.get('metricas_turno')
+    if not medidas:
+        return
+    st.caption(f"Último turno: {_descrever_metricas(medidas)}")
+    with st.expander('Latência por etapa'):
+        medias = medias_turnos()
+        if not medias:
+            st.caption('Nenhum turno registrado ainda.')
+            return
+        st.caption(
+            f"Média dos últimos {medias['turnos']} turno(s), total {medias['total_s']:.2f}s "
+            f"({medias['cache'] or 0} do cache, {medias['reserva'] or 0} do provedor reserva)"
+        )
+        st.caption(_descrever_metricas(medias))
+
+def render_tokens_prompt():
+    """Renderiza o tamanho, em tokens, do último prompt enviado ao modelo."""
+    contagem = st.session_state.get('tokens_prompt')
+    if not contagem:
+        return
+    partes = ' · '.join(
+        f"{rotulo} {contagem['tokens'].get(fonte, 0)}" for fonte, rotulo in ROTULOS_CONTEXTO.items()
+    )
+    st.caption(f"Tokens do prompt: {contagem['total']} de {contagem['orcamento']} ({partes})")
+
+def render_cache_respostas():
+    """Renderiza os acertos e falhas do cache de respostas neste processo."""
+    contadores = contadores_cache()
+    if contadores['acertos'] or contadores['falhas']:
+        st.caption(f"Cache de respostas: {contadores['acertos']} acerto(s) · {contadores['falhas']} falha(s)")
+    contadores = contadores_extracao()
+    if contadores['acertos'] or contadores['falhas']:
+        st.caption(f"Cache de extrações: {contadores['acertos']} acerto(s) · {contadores['falhas']} falha(s)")
+
+def render_limites_provedores():
+    """Renderiza a saturação das cotas de requisições e tokens por minuto de cada modelo."""
+    estatisticas = estatisticas_limites()
+    if not estatisticas:
+        return
+    with st.expander('Cotas dos provedores'):
+        for (provedor, modelo), e in sorted(estatisticas.items()):
+            espera_media = e['espera_total_s'] / e['esperas'] if e['esperas'] else 0.0
+            st.caption(
+                f"{provedor}/{modelo}: {e['chamadas']} chamada(s) · uso RPM {e['uso_requisicoes']:.0%} · "
+                f"TPM {e['uso_tokens']:.0%} · {e['esperas']} espera(s) (média {espera_media:.1f}s, "
+                f"máx. {e['espera_maxima_s']:.1f}s) · {e['na_fila']} na fila · "
+                f"{e['recusas_429']} recusa(s) 429 · {e['desistencias']} desistência(s)"
+            )
 
 def render_sidebar():
     """Renderiza toda a barra lateral com abas e tempo de resposta."""
@@ -265,3 +412,7 @@ def render_sidebar():
         render_tabs_rag(tabs[2])
         render_tabs_scraping(tabs[2])
         render_tempo_resposta()
+        render_metricas_turno()
+        render_tokens_prompt()
+        render_cache_respostas()
+        render_limites_provedores()
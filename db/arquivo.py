@@ -0,0 +1,257 @@
+# db/arquivo.py
+"""Arquivamento de conversas antigas em bancos frios.
+
+Conversas sem atividade há mais de `ARQUIVAR_APOS_DIAS` têm suas mensagens
+movidas para um banco de arquivo mensal (`db/arquivo/veronia-AAAA-MM.db`),
+onde todo o conteúdo é gravado comprimido. A linha em `conversas` continua no
+banco principal como um "stub", com a coluna `arquivo` indicando onde estão
+as mensagens: a barra lateral continua listando a conversa, e ela é
+restaurada automaticamente quando o usuário a abre.
+
+Mensagens arquivadas saem do índice de busca textual; o título continua
+pesquisável. Para rodar manualmente:
+
+    python -m db.arquivo --dias 180
+"""
+import argparse
+import logging
+import os
+import sqlite3
+
+from db import db_sqlite
+from db.compressao import comprimir, descomprimir
+from utils.tokens import contar_tokens
+
+ARQUIVAR_APOS_DIAS = 180
+ARQUIVO_SUBDIR = 'arquivo'
+
+
+def diretorio_arquivo():
+    """Diretório dos bancos de arquivo, ao lado do banco principal."""
+    return os.path.join(os.path.dirname(db_sqlite.DB_FILE) or '.', ARQUIVO_SUBDIR)
+
+
+def _abrir_arquivo(nome):
+    """Abre (criando se preciso) um banco de arquivo mensal."""
+    os.makedirs(diretorio_arquivo(), exist_ok=True)
+    conn = sqlite3.connect(os.path.join(diretorio_arquivo(), nome))
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS mensagens (
+            id INTEGER PRIMARY KEY,
+            conversa_id INTEGER NOT NULL,
+            role TEXT NOT NULL,
+            content BLOB NOT NULL,
+            codec INTEGER NOT NULL,
+            timestamp DATETIME
+        );
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_mensagens_conversa_id
+        ON mensagens (conversa_id, id);
+    """)
+    return conn
+
+
+def listar_candidatas(dias=ARQUIVAR_APOS_DIAS):
+    """Lista as conversas quentes sem atividade há mais de `dias` dias.
+
+    Returns:
+
+        list[tuple]: Tuplas (id, ultima_atividade) das conversas a arquivar.
+
+    """
+    with db_sqlite.get_pool().leitura() as conn:
+        cursor = conn.execute("""
+            SELECT id, ultima
+            FROM (
+                SELECT c.id,
+                       COALESCE(
+                           (SELECT m.timestamp FROM mensagens m
+                            WHERE m.conversa_id = c.id
+                            ORDER BY m.id DESC LIMIT 1),
+                           c.data_criacao
+                       ) AS ultima
+                FROM conversas c
+                WHERE c.arquivo IS NULL
+            )
+            WHERE ultima < datetime('now', ?)
+            ORDER BY ultima;
+        """, (f'-{int(dias)} days',))
+        return [(row['id'], row['ultima']) for row in cursor.fetchall()]
+
+
+def arquivar_conversa(conversa_id, ultima_atividade):
+    """Move as mensagens de uma conversa para o banco de arquivo do seu mês.
+
+    Tudo acontece com o lock de escrita do banco principal, para que nenhuma
+
+    mensagem nova seja perdida entre a cópia e a remoção. O arquivo é gravado
+
+    e confirmado antes de as mensagens saírem do banco principal.
+
+    Returns:
+
+        int: Quantas mensagens foram arquivadas.
+
+    """
+    nome = f"veronia-{ultima_atividade[:7]}.db"
+    with db_sqlite.get_pool().escrita() as conn:
+        linhas = conn.execute("""
+            SELECT id, conversa_id, role, content, codec, timestamp
+            FROM mensagens
+            WHERE conversa_id = ?
+            ORDER BY id;
+        """, (conversa_id,)).fetchall()
+
+        arquivo = _abrir_arquivo(nome)
+        try:
+            with arquivo:
+                arquivo.executemany("""
+                    INSERT OR REPLACE INTO mensagens (id, conversa_id, role, content, codec, timestamp)
+                    VALUES (?, ?, ?, ?, ?, ?);
+                """, (
+                    (row['id'], row['conversa_id'], row['role'],
+                     *comprimir(descomprimir(row['content'], row['codec']), limiar=0),
+                     row['timestamp'])
+                    for row in linhas
+                ))
+        finally:
+            arquivo.close()
+
+        conn.execute("UPDATE conversas SET arquivo = ? WHERE id = ?;", (nome, conversa_id))
+        conn.execute("DELETE FROM mensagens WHERE conversa_id = ?;", (conversa_id,))
+        db_sqlite.sincronizar_busca(conn)
+    db_sqlite.notificar_alteracao_conversa(conversa_id)
+    return len(linhas)
+
+
+def arquivar_conversas_antigas(dias=ARQUIVAR_APOS_DIAS):
+    """Arquiva todas as conversas sem atividade há mais de `dias` dias.
+
+    Returns:
+
+        tuple[int, int]: Conversas e mensagens arquivadas.
+
+    """
+    conversas = mensagens = 0
+    for conversa_id, ultima in listar_candidatas(dias):
+        try:
+            mensagens += arquivar_conversa(conversa_id, ultima)
+            conversas += 1
+        except sqlite3.Error as e:
+            logging.error(f"Erro ao arquivar conversa {conversa_id}: {e}")
+    logging.info(f"{conversas} conversa(s) e {mensagens} mensagem(ns) arquivadas")
+    return conversas, mensagens
+
+
+def _linha_restaurada(mensagem_id, conversa_id, role, content, codec, timestamp):
+    """Prepara uma mensagem arquivada para voltar ao banco principal."""
+    texto = descomprimir(content, codec)
+    return (mensagem_id, conversa_id, role, *comprimir(texto), timestamp, contar_tokens(texto))
+
+
+def restaurar_conversa(conversa_id):
+    """Traz de volta ao banco principal as mensagens de uma conversa arquivada.
+
+    Não faz nada se a conversa não estiver arquivada, então pode ser chamada
+
+    sempre que uma conversa é aberta.
+
+    Returns:
+
+        bool: True se a conversa estava arquivada e foi restaurada.
+
+    """
+    with db_sqlite.get_pool().leitura() as conn:
+        row = conn.execute("SELECT arquivo FROM conversas WHERE id = ?;", (conversa_id,)).fetchone()
+    if row is None or row['arquivo'] is None:
+        return False
+
+    nome = row['arquivo']
+    caminho = os.path.join(diretorio_arquivo(), nome)
+    if not os.path.exists(caminho):
+        logging.error(f"Banco de arquivo '{caminho}' da conversa {conversa_id} não encontrado")
+        return False
+
+    arquivo = sqlite3.connect(caminho)
+    try:
+        linhas = arquivo.execute("""
+            SELECT id, conversa_id, role, content, codec, timestamp
+            FROM mensagens
+            WHERE conversa_id = ?
+            ORDER BY id;
+        """, (conversa_id,)).fetchall()
+
+        with db_sqlite.get_pool().escrita() as conn:
+            conn.executemany("""
+                INSERT OR IGNORE INTO mensagens (id, conversa_id, role, content, codec, timestamp, tokens)
+                VALUES (?, ?, ?, ?, ?, ?, ?);
+            """, (_linha_restaurada(*linha) for linha in linhas))
+            conn.execute("UPDATE conversas SET arquivo = NULL WHERE id = ?;", (conversa_id,))
+            db_sqlite.sincronizar_busca(conn)
+
+        with arquivo:
+            arquivo.execute("DELETE FROM mensagens WHERE conversa_id = ?;", (conversa_id,))
+    finally:
+        arquivo.close()
+
+    db_sqlite.notificar_alteracao_conversa(conversa_id)
+    logging.info(f"Conversa {conversa_id} restaurada de '{nome}' ({len(linhas)} mensagens)")
+    return True
+
+
+def limpar_arquivos_orfaos():
+    """Remove dos bancos de arquivo as mensagens de conversas que já foram excluídas.
+
+    Returns:
+
+        int: Quantas mensagens órfãs foram removidas.
+
+    """
+    diretorio = diretorio_arquivo()
+    if not os.path.isdir(diretorio):
+        return 0
+
+    with db_sqlite.get_pool().leitura() as conn:
+        existentes = {row['id'] for row in conn.execute("SELECT id FROM conversas WHERE arquivo IS NOT NULL;")}
+
+    removidas = 0
+    for nome in sorted(os.listdir(diretorio)):
+        if not nome.endswith('.db'):
+            continue
+        arquivo = sqlite3.connect(os.path.join(diretorio, nome))
+        try:
+            ids = [row[0] for row in arquivo.execute("SELECT DISTINCT conversa_id FROM mensagens;")]
+            orfas = [(conversa_id,) for conversa_id in ids if conversa_id not in existentes]
+            with arquivo:
+                cursor = arquivo.executemany("DELETE FROM mensagens WHERE conversa_id = ?;", orfas)
+                removidas += max(cursor.rowcount, 0)
+        finally:
+            arquivo.close()
+    return removidas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Arquiva conversas antigas do banco da VeronIA.")
+    parser.add_argument('--dias', type=int, default=ARQUIVAR_APOS_DIAS,
+                        help='idade mínima, em dias desde a última mensagem')
+    parser.add_argument('--banco', default=db_sqlite.DB_FILE, help='caminho do banco principal')
+    parser.add_argument('--restaurar', type=int, metavar='CONVERSA_ID',
+                        help='restaura uma conversa arquivada em vez de arquivar')
+    args = parser.parse_args()
+
+    db_sqlite.configurar_banco(args.banco)
+    db_sqlite.init_database()
+    if args.restaurar is not None:
+        restaurada = restaurar_conversa(args.restaurar)
+        print("Conversa restaurada." if restaurada else "A conversa não estava arquivada.")
+        return
+
+    conversas, mensagens = arquivar_conversas_antigas(args.dias)
+    orfas = limpar_arquivos_orfaos()
+    print(f"{conversas} conversa(s) arquivada(s), {mensagens} mensagem(ns) movida(s), "
+          f"{orfas} mensagem(ns) órfã(s) removida(s) dos arquivos.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,257 @@
+# db/cache_extracoes.py
+"""Cache persistente do texto extraído dos arquivos carregados.
+
+O mesmo arquivo carregado de novo, nesta ou em outra conversa, reaproveita o
+texto já extraído em vez de passar outra vez pelo `file_processor`. A chave
+é o sha256 de (sha256 do conteúdo, tipo MIME, nome, `VERSAO_EXTRACAO`): o
+processador é escolhido pelo tipo e pela extensão e o nome aparece no texto
+extraído. Mudar a extração invalida as entradas antigas, que saem pela poda.
+
+O texto fica em disco, comprimido com zlib, em `extracoes/` ao lado do banco;
+a tabela `extracoes_arquivo` é o índice. Acima de `TAMANHO_MAXIMO_BYTES` em
+disco, as extrações menos usadas recentemente e que não estão anexadas a
+nenhuma conversa são descartadas.
+
+`arquivos_conversa` lembra quais arquivos foram anexados a cada conversa, para
+que as perguntas seguintes usem o texto sem um novo upload.
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+import zlib
+
+from db import db_sqlite
+from db.compressao import NIVEL_ZLIB
+from db.fila_escrita import enfileirar_escrita
+from utils.constants import VERSAO_EXTRACAO
+
+TAMANHO_MAXIMO_BYTES = 256 * 1024 * 1024
+# A poda roda a cada tantas gravações, não em todas.
+PODAR_A_CADA = 20
+
+_gravacoes = 0
+
+
+def chave_extracao(sha256, tipo, nome):
+    """Calcula a chave de uma extração.
+
+    Args:
+
+        sha256 (str): O sha256 hexadecimal do conteúdo do arquivo.
+
+        tipo (str): O tipo MIME informado no upload.
+
+        nome (str): O nome do arquivo.
+
+    Returns:
+
+        str: O sha256 hexadecimal da extração.
+
+    """
+    partes = [sha256, tipo or '', nome, VERSAO_EXTRACAO]
+    return hashlib.sha256(json.dumps(partes, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def diretorio_extracoes():
+    """Diretório dos textos extraídos, ao lado do arquivo do banco."""
+    return os.path.join(os.path.dirname(os.path.abspath(db_sqlite.DB_FILE)), 'extracoes')
+
+
+def _caminho(chave):
+    return os.path.join(diretorio_extracoes(), chave[:2], f'{chave}.z')
+
+
+def _remover_arquivos(chaves):
+    for chave in chaves:
+        try:
+            os.remove(_caminho(chave))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logging.error(f"Erro ao remover extração {chave}: {e}")
+
+
+def _registrar_acessos(conn, chaves, agora):
+    conn.executemany("""
+        UPDATE extracoes_arquivo
+        SET ultimo_acesso = ?, acessos = acessos + 1
+        WHERE chave = ?;
+    """, [(agora, chave) for chave in chaves])
+
+
+def buscar_extracoes(chaves):
+    """Retorna os textos extraídos das chaves que estão no cache.
+
+    O acesso, usado pela poda, é registrado de uma vez para todas as chaves
+
+    pela fila de escrita: a consulta não espera o escritor do banco.
+
+    Args:
+
+        chaves (list[str]): As chaves das extrações.
+
+    Returns:
+
+        dict[str, str]: O texto de cada chave encontrada.
+
+    """
+    chaves = list(dict.fromkeys(chaves))
+    if not chaves:
+        return {}
+    try:
+        with db_sqlite.get_pool().leitura() as conn:
+            existentes = {row[0] for row in conn.execute(
+                f"SELECT chave FROM extracoes_arquivo WHERE chave IN ({', '.join('?' * len(chaves))});",
+                chaves,
+            )}
+    except sqlite3.Error as e:
+        logging.error(f"Erro ao consultar cache de extrações: {e}")
+        return {}
+
+    textos = {}
+    for chave in chaves:
+        if chave not in existentes:
+            continue
+        try:
+            with open(_caminho(chave), 'rb') as arquivo:
+                textos[chave] = zlib.decompress(arquivo.read()).decode('utf-8')
+        except FileNotFoundError:
+            # O arquivo sumiu do disco; a entrada do índice não vale mais.
+            remover_extracao(chave)
+        except (OSError, zlib.error) as e:
+            logging.error(f"Erro ao ler extração {chave}: {e}")
+    if textos:
+        enfileirar_escrita(_registrar_acessos, list(textos), time.time())
+    return textos
+
+
+def buscar_extracao(chave):
+    """Retorna o texto extraído para a chave, ou None se ele não estiver no cache."""
+    return buscar_extracoes([chave]).get(chave)
+
+
+def gravar_extracao(chave, sha256, nome, tamanho_arquivo, texto):
+    """Grava (ou substitui) o texto extraído de um arquivo."""
+    global _gravacoes
+    dados = zlib.compress(texto.encode('utf-8'), NIVEL_ZLIB)
+    caminho = _caminho(chave)
+    temporario = f'{caminho}.{os.getpid()}.tmp'
+    agora = time.time()
+    try:
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        with open(temporario, 'wb') as arquivo:
+            arquivo.write(dados)
+        os.replace(temporario, caminho)
+        with db_sqlite.get_pool().escrita() as conn:
+            conn.execute("""
+                INSERT OR REPLACE INTO extracoes_arquivo
+                    (chave, sha256, nome, tamanho_arquivo, tamanho, criado_em, ultimo_acesso)
+                VALUES (?, ?, ?, ?, ?, ?, ?);
+            """, (chave, sha256, nome, tamanho_arquivo, len(dados), agora, agora))
+    except (sqlite3.Error, OSError) as e:
+        logging.error(f"Erro ao gravar cache de extrações: {e}")
+        return
+    _gravacoes += 1
+    if _gravacoes % PODAR_A_CADA == 0:
+        podar_extracoes()
+
+
+def remover_extracao(chave):
+    """Remove uma extração do índice e do disco."""
+    try:
+        with db_sqlite.get_pool().escrita() as conn:
+            conn.execute("DELETE FROM extracoes_arquivo WHERE chave = ?;", (chave,))
+    except sqlite3.Error as e:
+        logging.error(f"Erro ao remover extração: {e}")
+    _remover_arquivos([chave])
+
+
+def podar_extracoes(tamanho_maximo=TAMANHO_MAXIMO_BYTES):
+    """Remove as extrações menos usadas além do tamanho máximo em disco.
+
+    Extrações anexadas a alguma conversa não são podadas nem contam no limite:
+
+    elas saem do cache quando a conversa é excluída ou os anexos são removidos.
+
+    Returns:
+
+        int: Quantas extrações foram removidas.
+
+    """
+    try:
+        with db_sqlite.get_pool().escrita() as conn:
+            chaves = [row[0] for row in conn.execute("""
+                SELECT chave FROM (
+                    SELECT chave,
+                           SUM(tamanho) OVER (ORDER BY ultimo_acesso DESC, chave) AS acumulado
+                    FROM extracoes_arquivo
+                    WHERE chave NOT IN (SELECT chave FROM arquivos_conversa)
+                )
+                WHERE acumulado > ?;
+            """, (tamanho_maximo,)).fetchall()]
+            conn.executemany("DELETE FROM extracoes_arquivo WHERE chave = ?;", [(c,) for c in chaves])
+    except sqlite3.Error as e:
+        logging.error(f"Erro ao podar cache de extrações: {e}")
+        return 0
+    # Os arquivos só saem do disco depois do commit que os tirou do índice.
+    _remover_arquivos(chaves)
+    return len(chaves)
+
+
+def estatisticas_extracoes():
+    """Retorna o número de extrações e o tamanho total, em bytes, em disco."""
+    try:
+        with db_sqlite.get_pool().leitura() as conn:
+            row = conn.execute("SELECT COUNT(*), COALESCE(SUM(tamanho), 0) FROM extracoes_arquivo;").fetchone()
+    except sqlite3.Error as e:
+        logging.error(f"Erro ao consultar cache de extrações: {e}")
+        return 0, 0
+    return row[0], row[1]
+
+
+def anexar_arquivos(conversa_id, arquivos):
+    """Anexa extrações à conversa em uma única transação; anexar de novo não as duplica.
+
+    Args:
+
+        conversa_id (int): A conversa.
+
+        arquivos (list[tuple[str, str]]): Pares (chave, nome), na ordem do upload.
+
+    """
+    agora = time.time()
+    try:
+        with db_sqlite.get_pool().escrita() as conn:
+            conn.executemany("""
+                INSERT OR IGNORE INTO arquivos_conversa (conversa_id, chave, nome, anexado_em)
+                VALUES (?, ?, ?, ?);
+            """, [(conversa_id, chave, nome, agora) for chave, nome in arquivos])
+    except sqlite3.Error as e:
+        logging.error(f"Erro ao anexar arquivos à conversa: {e}")
+
+
+def arquivos_da_conversa(conversa_id):
+    """Retorna os pares (chave, nome) anexados à conversa, na ordem em que foram anexados."""
+    try:
+        with db_sqlite.get_pool().leitura() as conn:
+            rows = conn.execute("""
+                SELECT chave, nome FROM arquivos_conversa
+                WHERE conversa_id = ?
+                ORDER BY anexado_em, rowid;
+            """, (conversa_id,)).fetchall()
+    except sqlite3.Error as e:
+        logging.error(f"Erro ao listar arquivos da conversa: {e}")
+        return []
+    return [(row['chave'], row['nome']) for row in rows]
+
+
+def desanexar_arquivos(conversa_id):
+    """Remove os arquivos anexados à conversa (as extrações continuam no cache)."""
+    try:
+        with db_sqlite.get_pool().escrita() as conn:
+            conn.execute("DELETE FROM arquivos_conversa WHERE conversa_id = ?;", (conversa_id,))
+    except sqlite3.Error as e:
+        logging.error(f"Erro ao desanexar arquivos da conversa: {e}")
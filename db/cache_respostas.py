@@ -0,0 +1,178 @@
+# db/cache_respostas.py
+"""Cache persistente de respostas dos modelos de linguagem.
+
+Perguntas idênticas, feitas ao mesmo modelo, com o mesmo prompt de sistema e o
+mesmo histórico, reaproveitam a resposta gravada em vez de chamar o provedor
+de novo. A chave é o sha256 de (provedor, modelo, hash do prompt de sistema,
+hash do histórico, entrada). As respostas são comprimidas como as mensagens
+(veja `db.compressao`).
+
+Entradas expiram após `TTL_S` e, acima de `TAMANHO_MAXIMO_BYTES`, as menos
+usadas recentemente são descartadas.
+
+A consulta só lê o banco. O registro do acesso, a gravação de uma resposta nova
+e a poda periódica vão para a fila de escrita (veja `db.fila_escrita`), então
+o caminho da resposta nunca espera o escritor do banco.
+"""
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+from db import db_sqlite
+from db.compressao import comprimir, descomprimir
+from db.fila_escrita import enfileirar_escrita
+
+TTL_S = 7 * 24 * 3600
+TAMANHO_MAXIMO_BYTES = 64 * 1024 * 1024
+# A poda roda a cada tantas gravações, não em todas.
+PODAR_A_CADA = 50
+
+_gravacoes = 0
+_gravacoes_lock = threading.Lock()
+
+
+def _sha256(texto):
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+
+
+def chave_cache(provedor, modelo, prompt_sistema, historico, entrada):
+    """Calcula a chave de uma requisição.
+
+    Args:
+
+        provedor (str): O provedor do modelo.
+
+        modelo (str): O modelo.
+
+        prompt_sistema (str): O prompt de sistema da chain.
+
+        historico (list[tuple[str, str]]): Pares (papel, conteúdo) do histórico
+
+            enviado ao modelo, resumo incluído.
+
+        entrada (str): A entrada final do usuário, com arquivos e RAG.
+
+    Returns:
+
+        str: O sha256 hexadecimal da requisição.
+
+    """
+    partes = [
+        provedor,
+        modelo,
+        _sha256(prompt_sistema),
+        _sha256(json.dumps(historico, ensure_ascii=False)),
+        entrada,
+    ]
+    return _sha256(json.dumps(partes, ensure_ascii=False))
+
+
+def _registrar_acesso(conn, chave, agora):
+    conn.execute("""
+        UPDATE cache_respostas
+        SET ultimo_acesso = ?, acessos = acessos + 1
+        WHERE chave = ?;
+    """, (agora, chave))
+
+
+def _inserir_resposta(conn, chave, provedor, modelo, valor, codec, tamanho, agora):
+    conn.execute("""
+        INSERT OR REPLACE INTO cache_respostas
+            (chave, provedor, modelo, resposta, codec, tamanho, criado_em, ultimo_acesso)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?);
+    """, (chave, provedor, modelo, valor, codec, tamanho, agora, agora))
+
+
+def _podar(conn, ttl, tamanho_maximo):
+    removidas = conn.execute(
+        "DELETE FROM cache_respostas WHERE criado_em < ?;", (time.time() - ttl,)
+    ).rowcount
+    removidas += conn.execute("""
+        DELETE FROM cache_respostas
+        WHERE chave IN (
+            SELECT chave FROM (
+                SELECT chave,
+                       SUM(tamanho) OVER (ORDER BY ultimo_acesso DESC, chave) AS acumulado
+                FROM cache_respostas
+            )
+            WHERE acumulado > ?
+        );
+    """, (tamanho_maximo,)).rowcount
+    return removidas
+
+
+def buscar_resposta(chave, ttl=TTL_S):
+    """Retorna a resposta em cache para a chave, ou None se não houver ou tiver expirado.
+
+    O acesso, usado pela poda, é registrado pela fila de escrita.
+
+    """
+    agora = time.time()
+    try:
+        with db_sqlite.get_pool().leitura() as conn:
+            row = conn.execute("""
+                SELECT resposta, codec
+                FROM cache_respostas
+                WHERE chave = ? AND criado_em >= ?;
+            """, (chave, agora - ttl)).fetchone()
+    except sqlite3.Error as e:
+        logging.error(f"Erro ao consultar cache de respostas: {e}")
+        return None
+    if row is None:
+        return None
+    enfileirar_escrita(_registrar_acesso, chave, agora)
+    return descomprimir(row['resposta'], row['codec'])
+
+
+def gravar_resposta(chave, provedor, modelo, resposta):
+    """Enfileira a gravação (ou substituição) da resposta de uma requisição.
+
+    A cada `PODAR_A_CADA` gravações do processo, a poda também é enfileirada.
+
+    Returns:
+
+        Future: A gravação da resposta (veja `db.fila_escrita`).
+
+    """
+    global _gravacoes
+    agora = time.time()
+    valor, codec = comprimir(resposta)
+    tamanho = len(valor) if isinstance(valor, bytes) else len(valor.encode('utf-8'))
+    futuro = enfileirar_escrita(_inserir_resposta, chave, provedor, modelo, valor, codec, tamanho, agora)
+    # Sessões diferentes gravam ao mesmo tempo.
+    with _gravacoes_lock:
+        _gravacoes += 1
+        podar = _gravacoes % PODAR_A_CADA == 0
+    if podar:
+        enfileirar_escrita(_podar, TTL_S, TAMANHO_MAXIMO_BYTES)
+    return futuro
+
+
+def podar_cache(ttl=TTL_S, tamanho_maximo=TAMANHO_MAXIMO_BYTES):
+    """Remove as entradas expiradas e as menos usadas além do tamanho máximo.
+
+    Returns:
+
+        int: Quantas entradas foram removidas.
+
+    """
+    try:
+        with db_sqlite.get_pool().escrita() as conn:
+            return _podar(conn, ttl, tamanho_maximo)
+    except sqlite3.Error as e:
+        logging.error(f"Erro ao podar cache de respostas: {e}")
+        return 0
+
+
+def estatisticas_cache():
+    """Retorna o número de entradas e o tamanho total, em bytes, do cache."""
+    try:
+        with db_sqlite.get_pool().leitura() as conn:
+            row = conn.execute("SELECT COUNT(*), COALESCE(SUM(tamanho), 0) FROM cache_respostas;").fetchone()
+    except sqlite3.Error as e:
+        logging.error(f"Erro ao consultar cache de respostas: {e}")
+        return 0, 0
+    return row[0], row[1]
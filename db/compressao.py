@@ -0,0 +1,63 @@
+# db/compressao.py
+"""Compressão transparente do conteúdo das mensagens.
+
+Mensagens maiores que `LIMIAR_BYTES` são gravadas comprimidas em
+`mensagens.content` e a coluna `mensagens.codec` indica como decodificá-las.
+Mensagens curtas, ou que não diminuem ao comprimir, continuam como texto.
+
+A função SQL `descomprimir(content, codec)` é registrada em toda conexão do
+pool: os trechos da busca FTS5 leem o texto através dela. Os triggers de
+`mensagens` não a usam, para que outras ferramentas possam gravar no banco
+(veja `db_sqlite.sincronizar_busca`).
+"""
+import zlib
+
+# Valores gravados em mensagens.codec. Nunca reaproveite um número.
+CODEC_TEXTO = 0
+CODEC_ZLIB = 1
+
+# Mensagens menores que isso não compensam o custo de comprimir.
+LIMIAR_BYTES = 1024
+NIVEL_ZLIB = 6
+
+
+def comprimir(texto, limiar=None):
+    """Prepara um texto para gravação.
+
+    Args:
+
+        texto (str): O conteúdo da mensagem.
+
+        limiar (int | None): Tamanho mínimo, em bytes, para comprimir.
+
+            Usa `LIMIAR_BYTES` quando None.
+
+    Returns:
+
+        tuple: O valor a gravar em `content` (str ou bytes) e o codec usado.
+
+    """
+    if not isinstance(texto, str):
+        return texto, CODEC_TEXTO
+    limiar = LIMIAR_BYTES if limiar is None else limiar
+    dados = texto.encode('utf-8')
+    if len(dados) < limiar:
+        return texto, CODEC_TEXTO
+    comprimido = zlib.compress(dados, NIVEL_ZLIB)
+    if len(comprimido) >= len(dados):
+        return texto, CODEC_TEXTO
+    return comprimido, CODEC_ZLIB
+
+
+def descomprimir(valor, codec):
+    """Retorna o texto original de um valor gravado em `mensagens.content`."""
+    if valor is None or not codec:
+        return valor
+    if codec == CODEC_ZLIB:
+        return zlib.decompress(valor).decode('utf-8')
+    raise ValueError(f"Codec de mensagem desconhecido: {codec}")
+
+
+def registrar_funcoes(conn):
+    """Registra as funções SQL de compressão em uma conexão SQLite."""
+    conn.create_function('descomprimir', 2, descomprimir, deterministic=True)
@@ -2,70 +2,268 @@
 
 import sqlite3
 import os
+import re
+import queue
 import logging
-import streamlit as st
+import threading
+import time
+from contextlib import contextmanager
+
+from db.compressao import comprimir, descomprimir, registrar_funcoes
+from db.migracoes import aplicar_migracoes
+from utils.tokens import contar_tokens
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 DB_FILE = 'db/veronia.db'
 
-@st.cache_resource
-def get_cached_conn():
-    """Estabelece e retorna uma conexão com o banco de dados SQLite em cache."""
-    try:
-        os.makedirs(os.path.dirname(DB_FILE), exist_ok=True)
-        conn = sqlite3.connect(DB_FILE, check_same_thread=False)
+# Pragmas aplicados a toda conexão aberta pelo pool.
+BUSY_TIMEOUT_MS = 5000
+CACHE_SIZE_KIB = 16000
+MAX_LEITORES = 8
+
+
+class PoolConexoes:
+    """Pool de conexões SQLite seguro para múltiplas threads.
+
+    O banco opera em modo WAL, o que permite leitores simultâneos a um único
+
+    escritor. Por isso o pool mantém uma conexão de escrita, serializada por um
+
+    lock, e até `max_leitores` conexões somente leitura reaproveitadas entre as
+
+    sessões do Streamlit.
+
+    O tempo que cada bloco espera pela conexão de escrita ou por um leitor
+
+    livre é acumulado em `estatisticas()`, para medir a disputa pelo banco.
+
+    """
+
+    def __init__(self, caminho, max_leitores=MAX_LEITORES):
+        self.caminho = caminho
+        self.max_leitores = max_leitores
+        self._lock_escrita = threading.Lock()
+        self._lock_criacao = threading.Lock()
+        self._escritor = None
+        self._leitores = queue.LifoQueue()
+        self._total_leitores = 0
+        self._todas = []
+        self._lock_estatisticas = threading.Lock()
+        self._estatisticas = {}
+        self.zerar_estatisticas()
+        # Marcado por `init_database` depois da primeira verificação do esquema.
+        self.esquema_verificado = False
+
+        diretorio = os.path.dirname(caminho)
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+
+    def _abrir(self, somente_leitura=False):
+        """Abre uma conexão já configurada com os pragmas do projeto."""
+        conn = sqlite3.connect(
+            self.caminho,
+            timeout=BUSY_TIMEOUT_MS / 1000,
+            check_same_thread=False,
+            isolation_level=None,
+        )
         conn.row_factory = sqlite3.Row
+        registrar_funcoes(conn)
+        # Só tem efeito em bancos novos; os antigos são convertidos por db.manutencao.
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL;")
+        conn.execute("PRAGMA journal_mode = WAL;")
+        conn.execute("PRAGMA synchronous = NORMAL;")
+        conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS};")
+        conn.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KIB};")
+        conn.execute("PRAGMA temp_store = MEMORY;")
+        conn.execute("PRAGMA foreign_keys = ON;")
+        if somente_leitura:
+            conn.execute("PRAGMA query_only = ON;")
+        self._todas.append(conn)
         return conn
-    except sqlite3.Error as e:
-        logging.error(f"Erro ao conectar com o banco SQLite: {e}")
-        raise
 
-def get_conn():
-    """Função legada para obter conexão. Substituída por get_cached_conn."""
-    return get_cached_conn()
+    def _contar_espera(self, tipo, segundos):
+        with self._lock_estatisticas:
+            self._estatisticas[f'{tipo}s'] += 1
+            self._estatisticas[f'espera_{tipo}_s'] += segundos
+            maxima = f'espera_maxima_{tipo}_s'
+            self._estatisticas[maxima] = max(self._estatisticas[maxima], segundos)
+
+    def estatisticas(self):
+        """Retorna quantas leituras e escritas o pool atendeu e quanto elas esperaram."""
+        with self._lock_estatisticas:
+            return dict(self._estatisticas)
+
+    def zerar_estatisticas(self):
+        """Zera os contadores de `estatisticas()`."""
+        with self._lock_estatisticas:
+            for tipo in ('leitura', 'escrita'):
+                self._estatisticas.update({
+                    f'{tipo}s': 0, f'espera_{tipo}_s': 0.0, f'espera_maxima_{tipo}_s': 0.0,
+                })
+
+    def _obter_leitor(self):
+        try:
+            return self._leitores.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock_criacao:
+            if self._total_leitores < self.max_leitores:
+                self._total_leitores += 1
+                return self._abrir(somente_leitura=True)
+        try:
+            return self._leitores.get(timeout=BUSY_TIMEOUT_MS / 1000)
+        except queue.Empty:
+            raise sqlite3.OperationalError("Nenhuma conexão de leitura disponível no pool")
+
+    @contextmanager
+    def leitura(self):
+        """Empresta uma conexão somente leitura do pool."""
+        inicio = time.perf_counter()
+        conn = self._obter_leitor()
+        self._contar_espera('leitura', time.perf_counter() - inicio)
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._leitores.put(conn)
+
+    @contextmanager
+    def escrita(self):
+        """Executa um bloco dentro de uma transação `BEGIN IMMEDIATE`.
+
+        Faz commit ao final do bloco ou rollback se uma exceção for lançada.
+
+        """
+        inicio = time.perf_counter()
+        with self._lock_escrita:
+            if self._escritor is None:
+                self._escritor = self._abrir()
+            conn = self._escritor
+            conn.execute("BEGIN IMMEDIATE;")
+            self._contar_espera('escrita', time.perf_counter() - inicio)
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK;")
+                raise
+            try:
+                conn.execute("COMMIT;")
+            except BaseException:
+                # Sem o ROLLBACK a conexão compartilhada ficaria presa na transação
+                # e todo `BEGIN IMMEDIATE` seguinte falharia.
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK;")
+                raise
+
+    @contextmanager
+    def manutencao(self):
+        """Empresta a conexão de escrita fora de transação.
+
+        Para comandos que não podem rodar dentro de uma transação, como
+
+        `VACUUM` e `PRAGMA wal_checkpoint`. Outros escritores esperam o fim do bloco.
+
+        """
+        with self._lock_escrita:
+            if self._escritor is None:
+                self._escritor = self._abrir()
+            yield self._escritor
+
+    def fechar(self):
+        """Fecha todas as conexões abertas pelo pool."""
+        with self._lock_escrita, self._lock_criacao:
+            for conn in self._todas:
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+            self._todas.clear()
+            self._escritor = None
+            self._leitores = queue.LifoQueue()
+            self._total_leitores = 0
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """Retorna o pool de conexões do processo, criando-o na primeira chamada."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                try:
+                    _pool = PoolConexoes(DB_FILE)
+                except (sqlite3.Error, OSError) as e:
+                    logging.error(f"Erro ao conectar com o banco SQLite: {e}")
+                    raise
+    return _pool
+
+def fechar_pool():
+    """Fecha o pool atual. A próxima chamada a `get_pool` cria um novo."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.fechar()
+            _pool = None
+
+def configurar_banco(caminho):
+    """Aponta a camada de dados para outro arquivo SQLite (benchmarks, CLI)."""
+    global DB_FILE
+    fechar_pool()
+    DB_FILE = caminho
+
+# Funções chamadas após cada commit que altera a lista de conversas.
+_observadores_conversas = []
+
+def registrar_observador_conversas(funcao):
+    """Registra uma função chamada sempre que a lista de conversas muda.
+
+    A função recebe o ID da conversa afetada e é chamada depois do commit, o
+
+    que permite invalidar caches sem limpar dados não relacionados.
+
+    """
+    if funcao not in _observadores_conversas:
+        _observadores_conversas.append(funcao)
+
+def notificar_alteracao_conversa(conversa_id):
+    """Avisa os observadores registrados de que uma conversa foi alterada."""
+    for funcao in list(_observadores_conversas):
+        try:
+            funcao(conversa_id)
+        except Exception as e:
+            logging.error(f"Erro ao notificar alteração da conversa {conversa_id}: {e}")
 
 def init_database():
-    """Garante que as tabelas do banco de dados existam.
+    """Garante que o esquema do banco de dados esteja na versão atual.
+
+    Aplica as migrações pendentes de `db.migracoes`, que criam as tabelas
+
+    `conversas` e `mensagens` e seus índices, e leva para a busca o que outras
 
-    Executa comandos SQL `CREATE TABLE IF NOT EXISTS` para as tabelas `conversas`
+    ferramentas gravaram com a aplicação parada. Bancos criados por versões
 
-    e `mensagens`. Esta abordagem idempotente garante que a aplicação possa ser
+    anteriores são atualizados no lugar. O Streamlit chama esta função a cada
 
-    iniciada a qualquer momento sem erros, seja na primeira vez ou em execuções
+    rerun, então só a primeira chamada de cada pool faz o trabalho; as
 
-    subsequentes.
+    seguintes retornam sem tocar no banco.
 
     """
-    conn = get_conn()
+    pool = get_pool()
+    if pool.esquema_verificado:
+        return
     try:
-        with conn: # Usa 'with' para garantir que a conexão seja fechada
-            cursor = conn.cursor()
-            # Tabela de conversas
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS conversas (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    titulo TEXT NOT NULL,
-                    provedor TEXT,
-                    modelo TEXT,
-                    data_criacao DATETIME DEFAULT CURRENT_TIMESTAMP
-                );
-            """)
-            
-            # Tabela de mensagens
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS mensagens (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    conversa_id INTEGER,
-                    role TEXT NOT NULL,
-                    content TEXT NOT NULL,
-                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (conversa_id) REFERENCES conversas(id) ON DELETE CASCADE
-                );
-            """)
-        logging.info("Tabelas do banco SQLite verificadas/criadas com sucesso")
+        versao = aplicar_migracoes(pool)
+        with pool.escrita() as conn:
+            sincronizar_busca(conn)
+        pool.esquema_verificado = True
+        logging.info(f"Esquema do banco SQLite verificado (versão {versao})")
     except sqlite3.Error as e:
-        logging.error(f"Erro ao criar tabelas SQLite: {e}")
+        logging.error(f"Erro ao migrar esquema SQLite: {e}")
 
 def criar_conversa(titulo, provedor, modelo):
     """Insere uma nova conversa no banco de dados.
@@ -83,10 +281,9 @@ def criar_conversa(titulo, provedor, modelo):
         int: O ID da conversa recém-criada.
 
     """
-    conn = get_conn()
     conversa_id = None
     try:
-        with conn:
+        with get_pool().escrita() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 INSERT INTO conversas (titulo, provedor, modelo)
@@ -95,11 +292,147 @@ def criar_conversa(titulo, provedor, modelo):
             conversa_id = cursor.lastrowid
     except sqlite3.Error as e:
         logging.error(f"Erro ao criar conversa SQLite: {e}")
+        return None
+    notificar_alteracao_conversa(conversa_id)
     return conversa_id
 
+# Colunas de `conversas` que podem ser atualizadas junto com um turno.
+METADADOS_CONVERSA = ('provedor', 'modelo')
+
+def salvar_mensagens(conversa_id, mensagens, titulo=None, metadados=None):
+    """Persiste um lote de mensagens de uma conversa em uma única transação.
+
+    Um turno do chat (pergunta, resposta e, na primeira mensagem, o novo
+
+    título) é gravado de forma atômica: ou tudo é salvo, ou nada é. Isso
+
+    também reduz a um único commit (e um único fsync) por turno.
+
+    Args:
+
+        conversa_id (int): O ID da conversa à qual as mensagens pertencem.
+
+        mensagens (list[dict]): Mensagens com as chaves 'role' e 'content',
+
+            em ordem cronológica. A chave opcional 'tokens' evita recontar o
+
+            conteúdo.
+
+        titulo (str | None): Novo título da conversa, se deve ser alterado.
+
+        metadados (dict | None): Outras colunas da conversa a atualizar
+
+            (veja `METADADOS_CONVERSA`).
+
+    Returns:
+
+        list[int] | None: Os IDs das mensagens inseridas, ou None se a
+
+            transação falhou e nada foi gravado.
+
+    """
+    try:
+        with get_pool().escrita() as conn:
+            ids = inserir_mensagens(conn, conversa_id, mensagens, titulo, metadados)
+    except sqlite3.Error as e:
+        logging.error(f"Erro ao salvar mensagens SQLite: {e}")
+        return None
+    notificar_alteracao_conversa(conversa_id)
+    return ids
+
+def inserir_mensagens(conn, conversa_id, mensagens, titulo=None, metadados=None):
+    """Grava um lote de mensagens usando uma conexão com transação já aberta.
+
+    Usada por `salvar_mensagens` e pela fila de escrita em segundo plano, que
+
+    agrupa vários lotes em um mesmo commit. Os argumentos e o retorno seguem
+
+    `salvar_mensagens`; erros de SQLite são propagados ao chamador.
+
+    """
+    metadados = {k: v for k, v in (metadados or {}).items() if k in METADADOS_CONVERSA}
+    cursor = conn.cursor()
+    if titulo is not None:
+        metadados['titulo'] = titulo
+    if metadados:
+        colunas = ', '.join(f"{coluna} = ?" for coluna in metadados)
+        cursor.execute(
+            f"UPDATE conversas SET {colunas} WHERE id = ?;",
+            (*metadados.values(), conversa_id),
+        )
+    ids = []
+    for mensagem in mensagens:
+        content, codec = comprimir(mensagem['content'])
+        tokens = mensagem.get('tokens')
+        if tokens is None:
+            tokens = contar_tokens(mensagem['content'])
+        cursor.execute("""
+            INSERT INTO mensagens (conversa_id, role, content, codec, tokens)
+            VALUES (?, ?, ?, ?, ?);
+        """, (conversa_id, mensagem['role'], content, codec, tokens))
+        ids.append(cursor.lastrowid)
+    sincronizar_busca(conn)
+    return ids
+
+# Quantas alterações pendentes da busca são lidas por vez.
+LOTE_BUSCA_PENDENTE = 1000
+
+def sincronizar_busca(conn):
+    """Aplica ao índice `busca_mensagens` as alterações enfileiradas pelos triggers.
+
+    Os triggers de `mensagens` são SQL puro: só copiam cada inserção, remoção
+
+    ou edição para `busca_pendente`, porque o texto comprimido precisa da
+
+    função `descomprimir`, que só as conexões deste pool registram. Assim
+
+    qualquer ferramenta (o CLI do sqlite3, scripts de backup ou reparo) pode
+
+    gravar em `mensagens`; o que ela alterar entra na busca na próxima
+
+    sincronização. Todas as funções de escrita deste módulo, `db.arquivo`,
+
+    `db.manutencao` e `init_database` (uma vez por processo) chamam esta função.
+
+    Args:
+
+        conn (sqlite3.Connection): A conexão de escrita, com transação aberta.
+
+    Returns:
+
+        int: Quantas alterações foram aplicadas.
+
+    """
+    aplicadas = 0
+    while True:
+        linhas = conn.execute("""
+            SELECT seq, operacao, mensagem_id, content, codec
+            FROM busca_pendente
+            ORDER BY seq
+            LIMIT ?;
+        """, (LOTE_BUSCA_PENDENTE,)).fetchall()
+        if not linhas:
+            return aplicadas
+        for row in linhas:
+            texto = descomprimir(row['content'], row['codec'])
+            if row['operacao'] == 'indexar':
+                conn.execute(
+                    "INSERT INTO busca_mensagens (rowid, content) VALUES (?, ?);",
+                    (row['mensagem_id'], texto),
+                )
+            else:
+                conn.execute(
+                    "INSERT INTO busca_mensagens (busca_mensagens, rowid, content) VALUES ('delete', ?, ?);",
+                    (row['mensagem_id'], texto),
+                )
+        conn.execute("DELETE FROM busca_pendente WHERE seq <= ?;", (linhas[-1]['seq'],))
+        aplicadas += len(linhas)
+
 def salvar_mensagem(conversa_id, role, content):
     """Salva uma única mensagem (do usuário ou do assistente) no banco.
 
+    Atalho para `salvar_mensagens` com um lote de uma mensagem.
+
     Args:
 
         conversa_id (int): O ID da conversa à qual a mensagem pertence.
@@ -109,16 +442,7 @@ def salvar_mensagem(conversa_id, role, content):
         content (str): O conteúdo textual da mensagem.
 
     """
-    conn = get_conn()
-    try:
-        with conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO mensagens (conversa_id, role, content)
-                VALUES (?, ?, ?);
-            """, (conversa_id, role, content))
-    except sqlite3.Error as e:
-        logging.error(f"Erro ao salvar mensagem SQLite: {e}")
+    salvar_mensagens(conversa_id, [{'role': role, 'content': content}])
 
 def carregar_mensagens(conversa_id):
     """Recupera todas as mensagens de uma conversa específica do banco.
@@ -138,28 +462,178 @@ def carregar_mensagens(conversa_id):
             uma mensagem com as chaves 'role' e 'content'.
 
     """
-    conn = get_conn()
     resultados = []
     try:
-        with conn:
+        with get_pool().leitura() as conn:
             cursor = conn.cursor()
             cursor.execute("""
-                SELECT role, content
+                SELECT role, content, codec
                 FROM mensagens
                 WHERE conversa_id = ?
-                ORDER BY timestamp ASC;
+                ORDER BY id ASC;
             """, (conversa_id,))
-            resultados = [{'role': row['role'], 'content': row['content']} for row in cursor.fetchall()]
+            resultados = [
+                {'role': row['role'], 'content': descomprimir(row['content'], row['codec'])}
+                for row in cursor.fetchall()
+            ]
     except sqlite3.Error as e:
         logging.error(f"Erro ao carregar mensagens SQLite: {e}")
     return resultados
 
-def listar_conversas():
-    """Busca no banco uma lista de todas as conversas existentes.
+def _mensagem_da_linha(row):
+    """Converte uma linha de `mensagens` no dicionário usado pela aplicação."""
+    content = descomprimir(row['content'], row['codec'])
+    tokens = row['tokens']
+    if tokens is None:
+        # Linhas inseridas sem passar por `inserir_mensagens`.
+        tokens = contar_tokens(content)
+    return {'id': row['id'], 'role': row['role'], 'content': content, 'tokens': tokens}
+
+def carregar_mensagens_pagina(conversa_id, antes_de_id=None, limite=50):
+    """Recupera uma página de mensagens usando paginação por keyset.
+
+    Busca as `limite` mensagens mais recentes com `id` menor que `antes_de_id`
+
+    (ou as últimas da conversa, se `antes_de_id` for None). A consulta percorre
+
+    apenas o índice `mensagens(conversa_id, id)`, então o custo depende do
+
+    tamanho da página e não do tamanho da conversa.
+
+    Args:
+
+        conversa_id (int): O ID da conversa a ser carregada.
+
+        antes_de_id (int | None): O `id` da mensagem mais antiga já carregada.
+
+        limite (int): O número máximo de mensagens a retornar.
+
+    Returns:
+
+        list[dict]: As mensagens da página em ordem cronológica, com as chaves
+
+            'id', 'role', 'content' e 'tokens'.
+
+    """
+    resultados = []
+    try:
+        with get_pool().leitura() as conn:
+            cursor = conn.cursor()
+            if antes_de_id is None:
+                cursor.execute("""
+                    SELECT id, role, content, codec, tokens
+                    FROM mensagens
+                    WHERE conversa_id = ?
+                    ORDER BY id DESC
+                    LIMIT ?;
+                """, (conversa_id, limite))
+            else:
+                cursor.execute("""
+                    SELECT id, role, content, codec, tokens
+                    FROM mensagens
+                    WHERE conversa_id = ? AND id < ?
+                    ORDER BY id DESC
+                    LIMIT ?;
+                """, (conversa_id, antes_de_id, limite))
+            resultados = [_mensagem_da_linha(row) for row in cursor.fetchall()]
+            resultados.reverse()
+    except sqlite3.Error as e:
+        logging.error(f"Erro ao carregar página de mensagens SQLite: {e}")
+    return resultados
+
+def carregar_mensagens_intervalo(conversa_id, apos_id, ate_id, limite_tokens=None):
+    """Recupera as mensagens de uma conversa com `apos_id < id <= ate_id`.
+
+    Percorre o intervalo da mais recente para a mais antiga e para ao
+
+    ultrapassar `limite_tokens`, então intervalos longos custam apenas o que
+
+    cabe no limite.
+
+    Returns:
+
+        list[dict]: As mensagens em ordem cronológica, no formato de
+
+            `carregar_mensagens_pagina`.
+
+    """
+    resultados = []
+    total = 0
+    try:
+        with get_pool().leitura() as conn:
+            cursor = conn.execute("""
+                SELECT id, role, content, codec, tokens
+                FROM mensagens
+                WHERE conversa_id = ? AND id > ? AND id <= ?
+                ORDER BY id DESC;
+            """, (conversa_id, apos_id, ate_id))
+            for row in cursor:
+                mensagem = _mensagem_da_linha(row)
+                total += mensagem['tokens']
+                if limite_tokens is not None and resultados and total > limite_tokens:
+                    break
+                resultados.append(mensagem)
+    except sqlite3.Error as e:
+        logging.error(f"Erro ao carregar intervalo de mensagens SQLite: {e}")
+    resultados.reverse()
+    return resultados
+
+def carregar_resumo(conversa_id):
+    """Retorna o resumo em cache de uma conversa, ou None se ainda não houver.
+
+    Returns:
+
+        dict | None: Com as chaves 'ate_mensagem_id' (a última mensagem coberta
+
+            pelo resumo), 'resumo' e 'tokens'.
+
+    """
+    try:
+        with get_pool().leitura() as conn:
+            row = conn.execute("""
+                SELECT ate_mensagem_id, resumo, tokens
+                FROM resumos_conversa
+                WHERE conversa_id = ?;
+            """, (conversa_id,)).fetchone()
+    except sqlite3.Error as e:
+        logging.error(f"Erro ao carregar resumo SQLite: {e}")
+        return None
+    return dict(row) if row else None
+
+def salvar_resumo(conversa_id, ate_mensagem_id, resumo, tokens):
+    """Grava (ou substitui) o resumo de uma conversa."""
+    try:
+        with get_pool().escrita() as conn:
+            conn.execute("""
+                INSERT INTO resumos_conversa (conversa_id, ate_mensagem_id, resumo, tokens)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (conversa_id) DO UPDATE SET
+                    ate_mensagem_id = excluded.ate_mensagem_id,
+                    resumo = excluded.resumo,
+                    tokens = excluded.tokens,
+                    data_atualizacao = CURRENT_TIMESTAMP;
+            """, (conversa_id, ate_mensagem_id, resumo, tokens))
+    except sqlite3.Error as e:
+        logging.error(f"Erro ao salvar resumo SQLite: {e}")
+
+def listar_conversas(limite=None, deslocamento=0):
+    """Busca no banco a lista das conversas existentes.
 
     Retorna os dados essenciais (ID e título) para exibir na interface,
 
-    ordenados pela data de criação para que as mais recentes apareçam primeiro.
+    ordenados pela última atividade (criação ou nova mensagem) para que as
+
+    conversas em uso apareçam primeiro. A consulta percorre o índice
+
+    `conversas(ordem_atividade)`, então buscar as N mais recentes não
+
+    depende do total de conversas.
+
+    Args:
+
+        limite (int | None): Quantas conversas retornar. None retorna todas.
+
+        deslocamento (int): Quantas conversas mais recentes pular.
 
     Returns:
 
@@ -168,16 +642,16 @@ def listar_conversas():
             de uma conversa.
 
     """
-    conn = get_conn()
     conversas = []
     try:
-        with conn:
+        with get_pool().leitura() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 SELECT id, titulo
                 FROM conversas
-                ORDER BY data_criacao DESC;
-            """)
+                ORDER BY ordem_atividade DESC
+                LIMIT ? OFFSET ?;
+            """, (-1 if limite is None else limite, deslocamento))
             conversas = [(row['id'], row['titulo']) for row in cursor.fetchall()]
     except sqlite3.Error as e:
         logging.error(f"Erro ao listar conversas SQLite: {e}")
@@ -193,15 +667,16 @@ def atualizar_titulo_conversa(conversa_id, novo_titulo):
         novo_titulo (str): O novo título para a conversa.
 
     """
-    conn = get_conn()
     try:
-        with conn:
+        with get_pool().escrita() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 UPDATE conversas SET titulo = ? WHERE id = ?;
             """, (novo_titulo, conversa_id))
     except sqlite3.Error as e:
         logging.error(f"Erro ao atualizar título SQLite: {e}")
+        return
+    notificar_alteracao_conversa(conversa_id)
 
 def get_titulo_conversa(conversa_id):
     """Obtém o título de uma única conversa a partir de seu ID.
@@ -215,10 +690,9 @@ def get_titulo_conversa(conversa_id):
         str: O título da conversa, ou uma string vazia se não for encontrada.
 
     """
-    conn = get_conn()
     titulo = ''
     try:
-        with conn:
+        with get_pool().leitura() as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT titulo FROM conversas WHERE id = ?", (conversa_id,))
             row = cursor.fetchone()
@@ -230,10 +704,113 @@ def get_titulo_conversa(conversa_id):
 
 def excluir_conversa(conversa_id):
     """Remove uma conversa e suas mensagens do banco de dados."""
-    conn = get_conn()
     try:
-        with conn:
+        with get_pool().escrita() as conn:
             cursor = conn.cursor()
             cursor.execute("DELETE FROM conversas WHERE id = ?", (conversa_id,))
+            sincronizar_busca(conn)
     except sqlite3.Error as e:
         logging.error(f"Erro ao excluir conversa: {e}")
+        return
+    notificar_alteracao_conversa(conversa_id)
+
+def _montar_consulta_fts(texto):
+    """Converte o texto digitado pelo usuário em uma consulta FTS5 segura.
+
+    Cada palavra vira um termo entre aspas (evitando erros de sintaxe com
+
+    operadores e pontuação) e a última aceita prefixo, para buscar enquanto
+
+    o usuário digita.
+
+    """
+    termos = re.findall(r'\w+', texto)
+    if not termos:
+        return ''
+    consulta = ' '.join(f'"{termo}"' for termo in termos)
+    return consulta + '*'
+
+def buscar_conversas(texto, limite=20):
+    """Busca conversas por palavras no título ou no conteúdo das mensagens.
+
+    Usa os índices FTS5 `busca_conversas` e `busca_mensagens`, ordenando por
+
+    relevância (bm25). Cada conversa aparece uma única vez, com o trecho de
+
+    melhor pontuação; ocorrências no título têm prioridade.
+
+    Args:
+
+        texto (str): As palavras a buscar.
+
+        limite (int): O número máximo de conversas retornadas.
+
+    Returns:
+
+        list[dict]: Resultados com as chaves 'conversa_id', 'titulo',
+
+            'mensagem_id' (None para ocorrências no título), 'trecho' (com os
+
+            termos destacados em negrito Markdown) e 'rank'.
+
+    """
+    consulta = _montar_consulta_fts(texto)
+    if not consulta:
+        return []
+
+    resultados = {}
+    try:
+        with get_pool().leitura() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT c.id AS conversa_id,
+                       c.titulo,
+                       snippet(busca_conversas, 0, '**', '**', '…', 12) AS trecho,
+                       bm25(busca_conversas) AS rank
+                FROM busca_conversas
+                JOIN conversas c ON c.id = busca_conversas.rowid
+                WHERE busca_conversas MATCH ?
+                ORDER BY rank
+                LIMIT ?;
+            """, (consulta, limite))
+            for row in cursor.fetchall():
+                resultados[row['conversa_id']] = {
+                    'conversa_id': row['conversa_id'],
+                    'titulo': row['titulo'],
+                    'mensagem_id': None,
+                    'trecho': row['trecho'],
+                    # Títulos curtos pesam mais que uma mensagem qualquer.
+                    'rank': row['rank'] * 2,
+                }
+
+            # Busca mais linhas que o limite porque várias mensagens podem
+            # pertencer à mesma conversa.
+            cursor.execute("""
+                SELECT m.conversa_id,
+                       c.titulo,
+                       m.id AS mensagem_id,
+                       snippet(busca_mensagens, 0, '**', '**', '…', 16) AS trecho,
+                       bm25(busca_mensagens) AS rank
+                FROM busca_mensagens
+                JOIN mensagens m ON m.id = busca_mensagens.rowid
+                JOIN conversas c ON c.id = m.conversa_id
+                WHERE busca_mensagens MATCH ?
+                ORDER BY rank
+                LIMIT ?;
+            """, (consulta, limite * 5))
+            for row in cursor.fetchall():
+                if row['conversa_id'] in resultados:
+                    continue
+                resultados[row['conversa_id']] = {
+                    'conversa_id': row['conversa_id'],
+                    'titulo': row['titulo'],
+                    'mensagem_id': row['mensagem_id'],
+                    'trecho': row['trecho'],
+                    'rank': row['rank'],
+                }
+    except sqlite3.Error as e:
+        logging.error(f"Erro ao buscar conversas SQLite: {e}")
+        return []
+
+    # bm25 retorna valores negativos: quanto menor, mais relevante.
+    return sorted(resultados.values(), key=lambda r: r['rank'])[:limite]
@@ -0,0 +1,190 @@
+# db/fila_escrita.py
+"""Fila de escrita em segundo plano (write-behind) para mensagens e contadores.
+
+O script do Streamlit não precisa esperar o disco para redesenhar a tela após
+uma resposta: os turnos são enfileirados e uma thread dedicada os grava. Os
+pedidos que chegam em sequência são agrupados em uma única transação, com um
+SAVEPOINT por pedido para que uma falha isolada não descarte os demais.
+
+Cada pedido retorna um `concurrent.futures.Future` com os IDs gravados. Quem
+precisa ler o que acabou de escrever usa `aguardar_escritas()` como barreira.
+Escritas pequenas do caminho de resposta, como os histogramas de latência,
+entram na mesma fila com `enfileirar_escrita`.
+A fila é esvaziada automaticamente ao encerrar o processo.
+"""
+import atexit
+import logging
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Future
+
+from db import db_sqlite
+
+# Quantos pedidos no máximo entram em um mesmo commit.
+LOTE_MAXIMO = 64
+# Quanto tempo a thread espera por mais pedidos antes de gravar o lote.
+JANELA_AGRUPAMENTO_S = 0.02
+
+_ENCERRAR = object()
+
+
+class FilaEscrita:
+    """Thread única que consome pedidos de escrita e os grava em lotes."""
+
+    def __init__(self, lote_maximo=LOTE_MAXIMO, janela=JANELA_AGRUPAMENTO_S):
+        self.lote_maximo = lote_maximo
+        self.janela = janela
+        self._fila = queue.Queue()
+        self._thread = threading.Thread(target=self._executar, name='veronia-fila-escrita', daemon=True)
+        self._thread.start()
+
+    def enfileirar(self, conversa_id, mensagens, titulo=None, metadados=None):
+        """Agenda a gravação de um lote de mensagens e/ou metadados da conversa.
+
+        Args:
+
+            conversa_id (int): O ID da conversa.
+
+            mensagens (list[dict]): Mensagens com as chaves 'role' e 'content'.
+
+            titulo (str | None): Novo título da conversa, se houver.
+
+            metadados (dict | None): Outras colunas da conversa a atualizar.
+
+        Returns:
+
+            Future: Resolvido com a lista de IDs inseridos, ou com a exceção
+
+                que impediu a gravação do pedido.
+
+        """
+        return self._colocar(db_sqlite.inserir_mensagens, (conversa_id, list(mensagens), titulo, metadados), conversa_id)
+
+    def enfileirar_tarefa(self, funcao, *argumentos):
+        """Agenda `funcao(conn, *argumentos)` dentro da transação de um lote.
+
+        Returns:
+
+            Future: Resolvido com o retorno da função, ou com a sua exceção.
+
+        """
+        return self._colocar(funcao, argumentos)
+
+    def _colocar(self, funcao, argumentos, conversa_id=None):
+        futuro = Future()
+        self._fila.put((futuro, (funcao, argumentos, conversa_id)))
+        return futuro
+
+    def barreira(self):
+        """Retorna um Future resolvido quando tudo que foi enfileirado antes estiver gravado."""
+        futuro = Future()
+        self._fila.put((futuro, None))
+        return futuro
+
+    def encerrar(self, timeout=None):
+        """Grava os pedidos pendentes e finaliza a thread."""
+        if self._thread.is_alive():
+            self._fila.put((None, _ENCERRAR))
+            self._thread.join(timeout)
+
+    def _proximo_lote(self):
+        lote = [self._fila.get()]
+        while len(lote) < self.lote_maximo and lote[-1][1] is not _ENCERRAR:
+            try:
+                lote.append(self._fila.get(timeout=self.janela))
+            except queue.Empty:
+                break
+        return lote
+
+    def _executar(self):
+        while True:
+            lote = self._proximo_lote()
+            pedidos = [(futuro, dados) for futuro, dados in lote if dados is not None and dados is not _ENCERRAR]
+            try:
+                if pedidos:
+                    self._gravar(pedidos)
+            except Exception as e:
+                # Um erro inesperado não pode parar a thread: os Futures e as
+                # barreiras que esperam por ela nunca seriam resolvidos.
+                logging.error(f"Erro inesperado na fila de escrita: {e}")
+                for futuro, _ in pedidos:
+                    if not futuro.done():
+                        futuro.set_exception(e)
+            for futuro, dados in lote:
+                if dados is None:
+                    futuro.set_result(None)
+            if lote[-1][1] is _ENCERRAR:
+                return
+
+    def _gravar(self, pedidos):
+        resultados = []
+        try:
+            with db_sqlite.get_pool().escrita() as conn:
+                for futuro, (funcao, argumentos, conversa_id) in pedidos:
+                    conn.execute("SAVEPOINT pedido;")
+                    try:
+                        retorno = funcao(conn, *argumentos)
+                    except Exception as e:
+                        conn.execute("ROLLBACK TO pedido;")
+                        resultados.append((futuro, None, e))
+                        if conversa_id is not None:
+                            logging.error(f"Erro ao gravar mensagens da conversa {conversa_id}: {e}")
+                        else:
+                            logging.error(f"Erro na escrita '{funcao.__name__}' da fila: {e}")
+                    else:
+                        resultados.append((futuro, retorno, None))
+                    conn.execute("RELEASE pedido;")
+        except sqlite3.Error as e:
+            logging.error(f"Erro ao gravar lote da fila de escrita: {e}")
+            for futuro, _ in pedidos:
+                futuro.set_exception(e)
+            return
+
+        for conversa_id in {dados[2] for _, dados in pedidos if dados[2] is not None}:
+            db_sqlite.notificar_alteracao_conversa(conversa_id)
+
+        # Só resolve os Futures depois do COMMIT, garantindo read-your-writes.
+        for futuro, retorno, erro in resultados:
+            if erro is not None:
+                futuro.set_exception(erro)
+            else:
+                futuro.set_result(retorno)
+
+
+_fila = None
+_fila_lock = threading.Lock()
+
+def get_fila_escrita():
+    """Retorna a fila de escrita do processo, iniciando a thread na primeira chamada."""
+    global _fila
+    if _fila is None:
+        with _fila_lock:
+            if _fila is None:
+                _fila = FilaEscrita()
+                atexit.register(_fila.encerrar)
+    return _fila
+
+def enfileirar_mensagens(conversa_id, mensagens, titulo=None, metadados=None):
+    """Atalho para `FilaEscrita.enfileirar` na fila do processo."""
+    return get_fila_escrita().enfileirar(conversa_id, mensagens, titulo, metadados)
+
+def enfileirar_escrita(funcao, *argumentos):
+    """Atalho para `FilaEscrita.enfileirar_tarefa` na fila do processo."""
+    return get_fila_escrita().enfileirar_tarefa(funcao, *argumentos)
+
+def aguardar_escritas(timeout=None):
+    """Barreira de durabilidade: bloqueia até que as escritas enfileiradas sejam gravadas.
+
+    Returns:
+
+        bool: True se a fila foi esvaziada dentro do `timeout`.
+
+    """
+    if _fila is None:
+        return True
+    try:
+        _fila.barreira().result(timeout)
+        return True
+    except TimeoutError:
+        return False
@@ -0,0 +1,84 @@
+# db/latencias.py
+"""Histogramas persistentes do tempo até o primeiro token (TTFT).
+
+Cada resposta iniciada por um provedor/modelo incrementa um balde de
+`latencias_ttft`. Os baldes crescem em escala aproximadamente logarítmica, o
+que mantém a tabela pequena (um punhado de linhas por modelo) e ainda permite
+estimar quantis com boa precisão para definir prazos.
+"""
+import logging
+import sqlite3
+
+from db import db_sqlite
+from db.fila_escrita import enfileirar_escrita
+
+# Limite superior, em segundos, de cada balde. O último acumula o restante.
+BALDES_S = (0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 4.0, 6.0, 8.0, 12.0, 16.0, 24.0, 32.0, 60.0, float('inf'))
+
+
+def _balde(segundos):
+    for limite in BALDES_S:
+        if segundos <= limite:
+            return limite
+    return BALDES_S[-1]
+
+
+def _incrementar_balde(conn, provedor, modelo, limite_s):
+    conn.execute("""
+        INSERT INTO latencias_ttft (provedor, modelo, limite_s, contagem)
+        VALUES (?, ?, ?, 1)
+        ON CONFLICT (provedor, modelo, limite_s) DO UPDATE SET contagem = contagem + 1;
+    """, (provedor, modelo, limite_s))
+
+
+def registrar_latencia(provedor, modelo, segundos):
+    """Conta uma amostra de TTFT no histograma do provedor/modelo.
+
+    A gravação vai para a fila de escrita: quem transmite a resposta não
+
+    espera o SQLite. Retorna o Future da gravação.
+
+    """
+    return enfileirar_escrita(_incrementar_balde, provedor, modelo, _balde(segundos))
+
+
+def histograma(provedor, modelo):
+    """Retorna o histograma de TTFT como uma lista de (limite_s, contagem), em ordem."""
+    try:
+        with db_sqlite.get_pool().leitura() as conn:
+            linhas = conn.execute("""
+                SELECT limite_s, contagem
+                FROM latencias_ttft
+                WHERE provedor = ? AND modelo = ?
+                ORDER BY limite_s;
+            """, (provedor, modelo)).fetchall()
+    except sqlite3.Error as e:
+        logging.error(f"Erro ao consultar latências de {provedor}/{modelo}: {e}")
+        return []
+    return [(row['limite_s'], row['contagem']) for row in linhas]
+
+
+def quantil(baldes, q):
+    """Estima o quantil `q` (0 a 1) de um histograma, interpolando dentro do balde.
+
+    Returns:
+
+        tuple[float | None, int]: O quantil em segundos (None sem amostras) e o
+
+            número de amostras.
+
+    """
+    total = sum(contagem for _, contagem in baldes)
+    if not total:
+        return None, 0
+    alvo = q * total
+    acumulado = 0
+    for limite, contagem in baldes:
+        if contagem and acumulado + contagem >= alvo:
+            posicao = BALDES_S.index(limite) if limite in BALDES_S else 0
+            inferior = BALDES_S[posicao - 1] if posicao > 0 else 0.0
+            if limite == float('inf'):
+                return inferior, total
+            return inferior + (limite - inferior) * (alvo - acumulado) / contagem, total
+        acumulado += contagem
+    return baldes[-1][0], total
@@ -0,0 +1,256 @@
+# db/manutencao.py
+"""Manutenção do banco SQLite: órfãs, estatísticas, vacuum e saúde das consultas.
+
+Cada execução:
+
+1. remove mensagens órfãs (de conversas já excluídas antes de as chaves
+   estrangeiras serem ativadas no pool), aplica à busca as alterações feitas
+   por outras ferramentas e poda os caches;
+2. atualiza as estatísticas do planejador com `ANALYZE`/`PRAGMA optimize`;
+3. devolve ao sistema as páginas livres com `PRAGMA incremental_vacuum`;
+4. confere se as consultas principais continuam usando índices.
+
+O relatório é gravado em `manutencao_execucoes`. A aplicação mantém uma
+thread de fundo que confere a cada `VERIFICACAO_S` se a manutenção está
+pendente e a executa (no máximo uma a cada `INTERVALO_HORAS`); para rodar
+manualmente:
+
+    python -m db.manutencao
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+
+from db import db_sqlite
+from db.cache_respostas import podar_cache
+from db.cache_extracoes import podar_extracoes
+
+INTERVALO_HORAS = 24
+# Com que frequência a thread de fundo confere se a manutenção está pendente.
+VERIFICACAO_S = 3600
+# Páginas liberadas por chamada de incremental_vacuum; 0 libera todas.
+PAGINAS_POR_VACUUM = 0
+
+# Consultas críticas e seus parâmetros de exemplo, verificadas a cada execução.
+CONSULTAS_MONITORADAS = {
+    'abrir conversa': (
+        "SELECT id, role, content, codec FROM mensagens WHERE conversa_id = ? ORDER BY id DESC LIMIT ?;",
+        (1, 20),
+    ),
+    'listar conversas': (
+        "SELECT id, titulo FROM conversas ORDER BY ordem_atividade DESC LIMIT ? OFFSET ?;",
+        (30, 0),
+    ),
+    'buscar mensagens': (
+        "SELECT rowid FROM busca_mensagens WHERE busca_mensagens MATCH ? ORDER BY rank LIMIT ?;",
+        ('"teste"', 20),
+    ),
+}
+
+_SCAN_SEM_INDICE = re.compile(r'^SCAN (\w+)$')
+
+
+def purgar_orfas(conn):
+    """Remove mensagens cuja conversa não existe mais. Retorna quantas foram removidas."""
+    cursor = conn.execute("""
+        DELETE FROM mensagens
+        WHERE conversa_id IS NULL
+           OR NOT EXISTS (SELECT 1 FROM conversas c WHERE c.id = mensagens.conversa_id);
+    """)
+    return cursor.rowcount
+
+
+def verificar_planos(conn):
+    """Executa EXPLAIN QUERY PLAN nas consultas monitoradas.
+
+    Returns:
+
+        list[dict]: Para cada consulta, o 'nome', o 'plano' e 'ok', que é False
+
+            quando alguma tabela é varrida sem índice ou a ordenação exige uma
+
+            B-tree temporária.
+
+    """
+    resultados = []
+    for nome, (sql, parametros) in CONSULTAS_MONITORADAS.items():
+        detalhes = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", parametros)]
+        ok = not any(_SCAN_SEM_INDICE.match(d) or 'TEMP B-TREE' in d for d in detalhes)
+        resultados.append({'nome': nome, 'plano': detalhes, 'ok': ok})
+    return resultados
+
+
+def _paginas(conn):
+    tamanho = conn.execute("PRAGMA page_size;").fetchone()[0]
+    total = conn.execute("PRAGMA page_count;").fetchone()[0]
+    livres = conn.execute("PRAGMA freelist_count;").fetchone()[0]
+    return tamanho, total, livres
+
+
+def executar_manutencao(converter_vacuum=True):
+    """Executa uma rodada completa de manutenção no banco configurado.
+
+    Args:
+
+        converter_vacuum (bool): Se o banco ainda não usa `auto_vacuum =
+
+            INCREMENTAL`, converte-o com um `VACUUM` completo. A conversão
+
+            reescreve o arquivo inteiro e bloqueia as escritas enquanto dura,
+
+            por isso a execução agendada não a faz.
+
+    Returns:
+
+        dict: O relatório da execução.
+
+    """
+    pool = db_sqlite.get_pool()
+    relatorio = {}
+
+    with pool.escrita() as conn:
+        relatorio['orfas_removidas'] = purgar_orfas(conn)
+        relatorio['busca_sincronizada'] = db_sqlite.sincronizar_busca(conn)
+    relatorio['cache_respostas_removidas'] = podar_cache()
+    relatorio['extracoes_removidas'] = podar_extracoes()
+
+    with pool.manutencao() as conn:
+        tamanho_pagina, paginas_antes, livres_antes = _paginas(conn)
+        relatorio['tamanho_antes'] = tamanho_pagina * paginas_antes
+        relatorio['paginas_livres_antes'] = livres_antes
+
+        modo_vacuum = conn.execute("PRAGMA auto_vacuum;").fetchone()[0]
+        if modo_vacuum != 2:
+            if converter_vacuum:
+                conn.execute("PRAGMA auto_vacuum = INCREMENTAL;")
+                conn.execute("VACUUM;")
+                modo_vacuum = 2
+                relatorio['vacuum_completo'] = True
+            else:
+                logging.warning(
+                    "Banco sem auto_vacuum incremental; rode 'python -m db.manutencao' para convertê-lo."
+                )
+        if modo_vacuum == 2:
+            conn.execute(f"PRAGMA incremental_vacuum({PAGINAS_POR_VACUUM});")
+
+        conn.execute("ANALYZE;")
+        conn.execute("PRAGMA optimize;")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE);")
+
+        _, paginas_depois, livres_depois = _paginas(conn)
+        relatorio['tamanho_depois'] = tamanho_pagina * paginas_depois
+        relatorio['bytes_recuperados'] = relatorio['tamanho_antes'] - relatorio['tamanho_depois']
+        relatorio['integridade'] = conn.execute("PRAGMA quick_check;").fetchone()[0]
+        relatorio['chaves_estrangeiras_violadas'] = len(conn.execute("PRAGMA foreign_key_check;").fetchall())
+
+    with pool.leitura() as conn:
+        relatorio['planos'] = verificar_planos(conn)
+
+    with pool.escrita() as conn:
+        conn.execute(
+            "INSERT INTO manutencao_execucoes (relatorio) VALUES (?);",
+            (json.dumps(relatorio, ensure_ascii=False),),
+        )
+
+    planos_ruins = [p['nome'] for p in relatorio['planos'] if not p['ok']]
+    if planos_ruins:
+        logging.warning(f"Consultas sem uso de índice: {', '.join(planos_ruins)}")
+    logging.info(
+        f"Manutenção concluída: {relatorio['orfas_removidas']} órfã(s), "
+        f"{relatorio['bytes_recuperados']} bytes recuperados"
+    )
+    return relatorio
+
+
+def manutencao_pendente(intervalo_horas=INTERVALO_HORAS):
+    """Indica se já passou o intervalo desde a última manutenção."""
+    with db_sqlite.get_pool().leitura() as conn:
+        row = conn.execute("""
+            SELECT MAX(data_execucao) >= datetime('now', ?) AS recente
+            FROM manutencao_execucoes;
+        """, (f'-{int(intervalo_horas)} hours',)).fetchone()
+    return not row['recente']
+
+
+_agendador = None
+_agendador_lock = threading.Lock()
+
+def _ciclo_manutencao(intervalo_horas, verificacao_s, parar):
+    while True:
+        try:
+            pendente = manutencao_pendente(intervalo_horas)
+        except sqlite3.Error as e:
+            logging.error(f"Erro ao verificar manutenção pendente: {e}")
+            pendente = False
+        if pendente:
+            try:
+                executar_manutencao(converter_vacuum=False)
+            except Exception as e:
+                # Sem isso, um erro fora do SQLite encerraria a thread em silêncio.
+                logging.error(f"Erro durante a manutenção do banco: {e}")
+        if parar.wait(verificacao_s):
+            return
+
+def agendar_manutencao(intervalo_horas=INTERVALO_HORAS, verificacao_s=VERIFICACAO_S):
+    """Inicia a thread de fundo que executa a manutenção sempre que ela fica pendente.
+
+    Chamada a cada execução do script; só a primeira chamada do processo
+
+    inicia a thread, que confere `manutencao_pendente` logo ao iniciar e
+
+    depois a cada `verificacao_s` segundos, enquanto o processo viver.
+
+    Returns:
+
+        threading.Event: Encerra a thread quando sinalizado.
+
+    """
+    global _agendador
+    with _agendador_lock:
+        if _agendador is None:
+            _agendador = threading.Event()
+            threading.Thread(
+                target=_ciclo_manutencao, args=(intervalo_horas, verificacao_s, _agendador),
+                name='veronia-manutencao', daemon=True
+            ).start()
+        return _agendador
+
+
+def _formatar_bytes(valor):
+    return f"{valor / 1024 / 1024:.2f} MB"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manutenção do banco SQLite da VeronIA.")
+    parser.add_argument('--banco', default=db_sqlite.DB_FILE, help='caminho do banco principal')
+    parser.add_argument('--sem-conversao', action='store_true',
+                        help='não converte o banco para auto_vacuum incremental')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.banco):
+        parser.error(f"banco '{args.banco}' não encontrado")
+
+    db_sqlite.configurar_banco(args.banco)
+    db_sqlite.init_database()
+    relatorio = executar_manutencao(converter_vacuum=not args.sem_conversao)
+
+    print(f"Mensagens órfãs removidas : {relatorio['orfas_removidas']}")
+    print(f"Respostas podadas do cache: {relatorio['cache_respostas_removidas']}")
+    print(f"Extrações podadas do cache: {relatorio['extracoes_removidas']}")
+    print(f"Tamanho antes / depois    : {_formatar_bytes(relatorio['tamanho_antes'])}"
+          f" / {_formatar_bytes(relatorio['tamanho_depois'])}")
+    print(f"Espaço recuperado         : {_formatar_bytes(relatorio['bytes_recuperados'])}")
+    print(f"Integridade               : {relatorio['integridade']}")
+    print(f"Violações de FK           : {relatorio['chaves_estrangeiras_violadas']}")
+    print("Planos de consulta:")
+    for plano in relatorio['planos']:
+        status = 'ok' if plano['ok'] else 'SEM ÍNDICE'
+        print(f"  [{status}] {plano['nome']}: {' | '.join(plano['plano'])}")
+
+
+if __name__ == '__main__':
+    main()
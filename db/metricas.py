@@ -0,0 +1,81 @@
+# db/metricas.py
+"""Métricas de latência de cada turno de chat.
+
+Um turno gera uma linha em `metricas_turno` com o tempo de cada etapa
+(extração de arquivos, recuperação RAG, montagem do histórico, geração e
+gravação), o tempo até o primeiro token e a vazão em tokens/s. As médias dos
+turnos recentes mostram onde o tempo de resposta realmente é gasto.
+"""
+import logging
+import sqlite3
+import time
+
+from db import db_sqlite
+from db.fila_escrita import enfileirar_escrita
+from utils.constants import ROTULOS_ETAPAS
+
+_COLUNAS = (
+    'total_s', *(f'{etapa}_s' for etapa in ROTULOS_ETAPAS),
+    'ttft_s', 'tokens_saida', 'tokens_por_s', 'cache', 'reserva',
+)
+
+
+def _inserir_metricas(conn, conversa_id, provedor, modelo, criado_em, valores):
+    conn.execute(f"""
+        INSERT INTO metricas_turno (conversa_id, provedor, modelo, criado_em, {', '.join(_COLUNAS)})
+        VALUES (?, ?, ?, ?, {', '.join('?' * len(_COLUNAS))});
+    """, (conversa_id, provedor, modelo, criado_em, *valores))
+
+
+def registrar_metricas(conversa_id, provedor, modelo, medidas):
+    """Enfileira a gravação das métricas de um turno na fila de escrita.
+
+    Args:
+
+        conversa_id (int | None): A conversa do turno.
+
+        provedor (str): O provedor que respondeu.
+
+        modelo (str): O modelo que respondeu.
+
+        medidas (dict): Valores indexados pelos nomes das colunas de
+
+            `metricas_turno` ('ttft_s', 'extracao_s', ...). Ausentes ficam NULL;
+
+            'cache' e 'reserva' são marcas e valem 0 quando ausentes.
+
+    Returns:
+
+        Future: A gravação (veja `db.fila_escrita`); um erro nela é registrado
+
+            no log pela própria fila.
+
+    """
+    valores = [
+        int(bool(medidas.get(coluna))) if coluna in ('cache', 'reserva') else medidas.get(coluna)
+        for coluna in _COLUNAS
+    ]
+    return enfileirar_escrita(_inserir_metricas, conversa_id, provedor, modelo, time.time(), valores)
+
+
+def medias_recentes(limite):
+    """Retorna as médias das métricas dos últimos `limite` turnos.
+
+    Returns:
+
+        dict: As médias por coluna, mais 'turnos' (quantos turnos entraram),
+
+            ou um dicionário vazio se não houver turnos.
+
+    """
+    medias = ', '.join(f'AVG({coluna}) AS {coluna}' for coluna in _COLUNAS if coluna not in ('cache', 'reserva'))
+    try:
+        with db_sqlite.get_pool().leitura() as conn:
+            row = conn.execute(f"""
+                SELECT COUNT(*) AS turnos, SUM(cache) AS cache, SUM(reserva) AS reserva, {medias}
+                FROM (SELECT * FROM metricas_turno ORDER BY id DESC LIMIT ?);
+            """, (limite,)).fetchone()
+    except sqlite3.Error as e:
+        logging.error(f"Erro ao consultar métricas dos turnos: {e}")
+        return {}
+    return dict(row) if row['turnos'] else {}
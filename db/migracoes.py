@@ -0,0 +1,476 @@
+# db/migracoes.py
+"""Migrações versionadas do esquema SQLite.
+
+A versão do esquema fica gravada em `PRAGMA user_version`. Cada migração é
+uma função que recebe a conexão de escrita e é aplicada uma única vez, dentro
+de sua própria transação, junto com a atualização da versão. Assim um
+`db/veronia.db` antigo é atualizado no lugar na próxima inicialização.
+
+Para evoluir o esquema, escreva uma nova função `_vNNN_*` e registre-a no fim
+de `MIGRACOES`. Nunca altere migrações já publicadas.
+"""
+import logging
+
+from db.compressao import comprimir, descomprimir, CODEC_TEXTO
+from utils.tokens import contar_tokens
+
+
+def _v001_tabelas_iniciais(conn):
+    """Cria as tabelas originais. Idempotente para bancos anteriores ao versionamento."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS conversas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            titulo TEXT NOT NULL,
+            provedor TEXT,
+            modelo TEXT,
+            data_criacao DATETIME DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS mensagens (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            conversa_id INTEGER,
+            role TEXT NOT NULL,
+            content TEXT NOT NULL,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (conversa_id) REFERENCES conversas(id) ON DELETE CASCADE
+        );
+    """)
+
+
+def _v002_indices(conn):
+    """Índices para abrir uma conversa e listar conversas sem varrer as tabelas."""
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_mensagens_conversa_id
+        ON mensagens (conversa_id, id);
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_conversas_data_criacao
+        ON conversas (data_criacao, id);
+    """)
+
+
+def _v003_busca_textual(conn):
+    """Índices FTS5 sobre o conteúdo das mensagens e os títulos das conversas.
+
+    As tabelas FTS usam "external content": guardam apenas o índice invertido e
+
+    leem o texto das tabelas originais, mantidas em sincronia por triggers.
+
+    """
+    conn.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS busca_mensagens USING fts5(
+            content,
+            content='mensagens',
+            content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        );
+    """)
+    conn.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS busca_conversas USING fts5(
+            titulo,
+            content='conversas',
+            content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        );
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS mensagens_fts_ai AFTER INSERT ON mensagens BEGIN
+            INSERT INTO busca_mensagens (rowid, content) VALUES (new.id, new.content);
+        END;
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS mensagens_fts_ad AFTER DELETE ON mensagens BEGIN
+            INSERT INTO busca_mensagens (busca_mensagens, rowid, content)
+            VALUES ('delete', old.id, old.content);
+        END;
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS mensagens_fts_au AFTER UPDATE OF content ON mensagens BEGIN
+            INSERT INTO busca_mensagens (busca_mensagens, rowid, content)
+            VALUES ('delete', old.id, old.content);
+            INSERT INTO busca_mensagens (rowid, content) VALUES (new.id, new.content);
+        END;
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS conversas_fts_ai AFTER INSERT ON conversas BEGIN
+            INSERT INTO busca_conversas (rowid, titulo) VALUES (new.id, new.titulo);
+        END;
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS conversas_fts_ad AFTER DELETE ON conversas BEGIN
+            INSERT INTO busca_conversas (busca_conversas, rowid, titulo)
+            VALUES ('delete', old.id, old.titulo);
+        END;
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS conversas_fts_au AFTER UPDATE OF titulo ON conversas BEGIN
+            INSERT INTO busca_conversas (busca_conversas, rowid, titulo)
+            VALUES ('delete', old.id, old.titulo);
+            INSERT INTO busca_conversas (rowid, titulo) VALUES (new.id, new.titulo);
+        END;
+    """)
+    # Indexa as linhas que já existiam antes da migração.
+    conn.execute("INSERT INTO busca_mensagens (busca_mensagens) VALUES ('rebuild');")
+    conn.execute("INSERT INTO busca_conversas (busca_conversas) VALUES ('rebuild');")
+
+
+def _v004_ordem_atividade(conn):
+    """Coluna `ordem_atividade` para ordenar conversas pelo uso mais recente.
+
+    É um contador crescente, mantido por triggers na criação da conversa e a
+
+    cada nova mensagem, e por isso não sofre empates como os timestamps de
+
+    um segundo. Conversas existentes são numeradas pela última mensagem.
+
+    """
+    conn.execute("ALTER TABLE conversas ADD COLUMN ordem_atividade INTEGER NOT NULL DEFAULT 0;")
+    ids = conn.execute("""
+        SELECT c.id
+        FROM conversas c
+        LEFT JOIN mensagens m ON m.conversa_id = c.id
+        GROUP BY c.id
+        ORDER BY COALESCE(MAX(m.id), 0), c.data_criacao, c.id;
+    """).fetchall()
+    conn.executemany(
+        "UPDATE conversas SET ordem_atividade = ? WHERE id = ?;",
+        ((ordem, row[0]) for ordem, row in enumerate(ids, 1)),
+    )
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_conversas_ordem_atividade
+        ON conversas (ordem_atividade);
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS conversas_atividade_ai AFTER INSERT ON conversas BEGIN
+            UPDATE conversas
+            SET ordem_atividade = (SELECT MAX(ordem_atividade) FROM conversas) + 1
+            WHERE id = new.id;
+        END;
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS mensagens_atividade_ai AFTER INSERT ON mensagens BEGIN
+            UPDATE conversas
+            SET ordem_atividade = (SELECT MAX(ordem_atividade) FROM conversas) + 1
+            WHERE id = new.conversa_id;
+        END;
+    """)
+
+
+def _v005_compressao(conn):
+    """Coluna `mensagens.codec` e compressão das mensagens grandes existentes.
+
+    Como `mensagens.content` pode passar a conter bytes comprimidos, a busca
+
+    FTS5 é recriada lendo o texto pela view `mensagens_texto`, que aplica a
+
+    função SQL `descomprimir` (veja `db.compressao`).
+
+    """
+    for trigger in ('mensagens_fts_ai', 'mensagens_fts_ad', 'mensagens_fts_au'):
+        conn.execute(f"DROP TRIGGER IF EXISTS {trigger};")
+    conn.execute("DROP TABLE IF EXISTS busca_mensagens;")
+
+    conn.execute(f"ALTER TABLE mensagens ADD COLUMN codec INTEGER NOT NULL DEFAULT {CODEC_TEXTO};")
+    cursor = conn.execute("SELECT id, content FROM mensagens WHERE codec = ?;", (CODEC_TEXTO,))
+    while True:
+        linhas = cursor.fetchmany(1000)
+        if not linhas:
+            break
+        atualizacoes = []
+        for mensagem_id, content in linhas:
+            valor, codec = comprimir(content)
+            if codec != CODEC_TEXTO:
+                atualizacoes.append((valor, codec, mensagem_id))
+        conn.executemany("UPDATE mensagens SET content = ?, codec = ? WHERE id = ?;", atualizacoes)
+
+    conn.execute("""
+        CREATE VIEW IF NOT EXISTS mensagens_texto AS
+        SELECT id, conversa_id, role, descomprimir(content, codec) AS content, timestamp
+        FROM mensagens;
+    """)
+    conn.execute("""
+        CREATE VIRTUAL TABLE busca_mensagens USING fts5(
+            content,
+            content='mensagens_texto',
+            content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        );
+    """)
+    conn.execute("""
+        CREATE TRIGGER mensagens_fts_ai AFTER INSERT ON mensagens BEGIN
+            INSERT INTO busca_mensagens (rowid, content)
+            VALUES (new.id, descomprimir(new.content, new.codec));
+        END;
+    """)
+    conn.execute("""
+        CREATE TRIGGER mensagens_fts_ad AFTER DELETE ON mensagens BEGIN
+            INSERT INTO busca_mensagens (busca_mensagens, rowid, content)
+            VALUES ('delete', old.id, descomprimir(old.content, old.codec));
+        END;
+    """)
+    conn.execute("""
+        CREATE TRIGGER mensagens_fts_au AFTER UPDATE OF content, codec ON mensagens BEGIN
+            INSERT INTO busca_mensagens (busca_mensagens, rowid, content)
+            VALUES ('delete', old.id, descomprimir(old.content, old.codec));
+            INSERT INTO busca_mensagens (rowid, content)
+            VALUES (new.id, descomprimir(new.content, new.codec));
+        END;
+    """)
+    conn.execute("INSERT INTO busca_mensagens (busca_mensagens) VALUES ('rebuild');")
+
+
+def _v006_arquivo(conn):
+    """Coluna `conversas.arquivo`: banco de arquivo onde estão as mensagens da conversa.
+
+    NULL para conversas "quentes", cujas mensagens estão em `mensagens`.
+
+    """
+    conn.execute("ALTER TABLE conversas ADD COLUMN arquivo TEXT;")
+
+
+def _v007_manutencao(conn):
+    """Tabela com o histórico das execuções de manutenção (veja `db.manutencao`)."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS manutencao_execucoes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            data_execucao DATETIME DEFAULT CURRENT_TIMESTAMP,
+            relatorio TEXT NOT NULL
+        );
+    """)
+
+
+def _v008_tokens_e_resumos(conn):
+    """Contagem de tokens por mensagem e resumo incremental das conversas.
+
+    `mensagens.tokens` é calculado uma vez, na gravação, e usado para montar o
+
+    histórico dentro do orçamento do modelo. `resumos_conversa` guarda o resumo
+
+    das mensagens que já saíram da janela (veja `services.memory_service`).
+
+    """
+    conn.execute("ALTER TABLE mensagens ADD COLUMN tokens INTEGER;")
+    cursor = conn.execute("SELECT id, content, codec FROM mensagens;")
+    while True:
+        linhas = cursor.fetchmany(1000)
+        if not linhas:
+            break
+        conn.executemany(
+            "UPDATE mensagens SET tokens = ? WHERE id = ?;",
+            [(contar_tokens(descomprimir(content, codec)), mensagem_id) for mensagem_id, content, codec in linhas],
+        )
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS resumos_conversa (
+            conversa_id INTEGER PRIMARY KEY,
+            ate_mensagem_id INTEGER NOT NULL,
+            resumo TEXT NOT NULL,
+            tokens INTEGER NOT NULL,
+            data_atualizacao DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (conversa_id) REFERENCES conversas(id) ON DELETE CASCADE
+        );
+    """)
+
+
+def _v009_cache_respostas(conn):
+    """Cache persistente de respostas dos modelos (veja `db.cache_respostas`)."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS cache_respostas (
+            chave TEXT PRIMARY KEY,
+            provedor TEXT NOT NULL,
+            modelo TEXT NOT NULL,
+            resposta BLOB NOT NULL,
+            codec INTEGER NOT NULL,
+            tamanho INTEGER NOT NULL,
+            criado_em REAL NOT NULL,
+            ultimo_acesso REAL NOT NULL,
+            acessos INTEGER NOT NULL DEFAULT 0
+        );
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_cache_respostas_ultimo_acesso
+        ON cache_respostas (ultimo_acesso);
+    """)
+
+
+def _v010_latencias(conn):
+    """Histograma do tempo até o primeiro token por provedor e modelo (veja `db.latencias`)."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS latencias_ttft (
+            provedor TEXT NOT NULL,
+            modelo TEXT NOT NULL,
+            limite_s REAL NOT NULL,
+            contagem INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (provedor, modelo, limite_s)
+        );
+    """)
+
+
+def _v011_metricas_turno(conn):
+    """Tempos de cada turno de chat por etapa, TTFT e tokens/s (veja `db.metricas`).
+
+    Sem chave estrangeira para `conversas`: as métricas continuam valendo para
+
+    o agregado mesmo depois que a conversa é excluída.
+
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS metricas_turno (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            conversa_id INTEGER,
+            provedor TEXT,
+            modelo TEXT,
+            criado_em REAL NOT NULL,
+            total_s REAL,
+            extracao_s REAL,
+            recuperacao_s REAL,
+            condensacao_s REAL,
+            geracao_s REAL,
+            persistencia_s REAL,
+            ttft_s REAL,
+            tokens_saida INTEGER,
+            tokens_por_s REAL,
+            cache INTEGER NOT NULL DEFAULT 0,
+            reserva INTEGER NOT NULL DEFAULT 0
+        );
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_metricas_turno_criado_em
+        ON metricas_turno (criado_em);
+    """)
+
+
+def _v012_extracoes_arquivo(conn):
+    """Cache das extrações de arquivos carregados e arquivos anexados às conversas.
+
+    O texto extraído fica em disco (veja `db.cache_extracoes`); a tabela guarda
+
+    o índice usado na busca e na poda. `arquivos_conversa` não referencia
+
+    `extracoes_arquivo`: uma extração podada só deixa de ser reaproveitada.
+
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS extracoes_arquivo (
+            chave TEXT PRIMARY KEY,
+            sha256 TEXT NOT NULL,
+            nome TEXT NOT NULL,
+            tamanho_arquivo INTEGER NOT NULL,
+            tamanho INTEGER NOT NULL,
+            criado_em REAL NOT NULL,
+            ultimo_acesso REAL NOT NULL,
+            acessos INTEGER NOT NULL DEFAULT 0
+        );
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_extracoes_arquivo_ultimo_acesso
+        ON extracoes_arquivo (ultimo_acesso);
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS arquivos_conversa (
+            conversa_id INTEGER NOT NULL,
+            chave TEXT NOT NULL,
+            nome TEXT NOT NULL,
+            anexado_em REAL NOT NULL,
+            PRIMARY KEY (conversa_id, chave),
+            FOREIGN KEY (conversa_id) REFERENCES conversas(id) ON DELETE CASCADE
+        );
+    """)
+
+
+def _v013_busca_sem_funcoes(conn):
+    """Triggers da busca FTS5 em SQL puro, sem a função `descomprimir`.
+
+    Os triggers da v5 chamavam `descomprimir`, então uma conexão que não a
+
+    registrou (o CLI do sqlite3, scripts de backup ou reparo) não conseguia
+
+    gravar em `mensagens`. Agora eles só copiam cada alteração para
+
+    `busca_pendente`, e `db_sqlite.sincronizar_busca` aplica a fila ao índice.
+
+    """
+    for trigger in ('mensagens_fts_ai', 'mensagens_fts_ad', 'mensagens_fts_au'):
+        conn.execute(f"DROP TRIGGER IF EXISTS {trigger};")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS busca_pendente (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            operacao TEXT NOT NULL CHECK (operacao IN ('indexar', 'remover')),
+            mensagem_id INTEGER NOT NULL,
+            content BLOB,
+            codec INTEGER NOT NULL
+        );
+    """)
+    conn.execute("""
+        CREATE TRIGGER mensagens_fts_ai AFTER INSERT ON mensagens BEGIN
+            INSERT INTO busca_pendente (operacao, mensagem_id, content, codec)
+            VALUES ('indexar', new.id, new.content, new.codec);
+        END;
+    """)
+    conn.execute("""
+        CREATE TRIGGER mensagens_fts_ad AFTER DELETE ON mensagens BEGIN
+            INSERT INTO busca_pendente (operacao, mensagem_id, content, codec)
+            VALUES ('remover', old.id, old.content, old.codec);
+        END;
+    """)
+    conn.execute("""
+        CREATE TRIGGER mensagens_fts_au AFTER UPDATE OF content, codec ON mensagens BEGIN
+            INSERT INTO busca_pendente (operacao, mensagem_id, content, codec)
+            VALUES ('remover', old.id, old.content, old.codec);
+            INSERT INTO busca_pendente (operacao, mensagem_id, content, codec)
+            VALUES ('indexar', new.id, new.content, new.codec);
+        END;
+    """)
+
+
+MIGRACOES = [
+    (1, "tabelas conversas e mensagens", _v001_tabelas_iniciais),
+    (2, "índices mensagens(conversa_id, id) e conversas(data_criacao)", _v002_indices),
+    (3, "busca textual FTS5 em mensagens e títulos", _v003_busca_textual),
+    (4, "coluna conversas.ordem_atividade", _v004_ordem_atividade),
+    (5, "compressão de mensagens grandes", _v005_compressao),
+    (6, "coluna conversas.arquivo para arquivamento", _v006_arquivo),
+    (7, "histórico de manutenção", _v007_manutencao),
+    (8, "coluna mensagens.tokens e tabela resumos_conversa", _v008_tokens_e_resumos),
+    (9, "tabela cache_respostas", _v009_cache_respostas),
+    (10, "histograma latencias_ttft", _v010_latencias),
+    (11, "tabela metricas_turno", _v011_metricas_turno),
+    (12, "tabelas extracoes_arquivo e arquivos_conversa", _v012_extracoes_arquivo),
+    (13, "triggers da busca FTS5 sem funções da aplicação", _v013_busca_sem_funcoes),
+]
+
+VERSAO_ESQUEMA = MIGRACOES[-1][0]
+
+
+def versao_atual(conn):
+    """Retorna a versão de esquema gravada no banco."""
+    return conn.execute("PRAGMA user_version;").fetchone()[0]
+
+
+def aplicar_migracoes(pool):
+    """Aplica, em ordem, as migrações ainda não executadas no banco.
+
+    Args:
+
+        pool (PoolConexoes): O pool de conexões do banco a ser migrado.
+
+    Returns:
+
+        int: A versão do esquema após as migrações.
+
+    """
+    with pool.leitura() as conn:
+        versao = versao_atual(conn)
+
+    for numero, descricao, migracao in MIGRACOES:
+        if numero <= versao:
+            continue
+        with pool.escrita() as conn:
+            # Outro processo pode ter migrado enquanto esperávamos o lock.
+            if versao_atual(conn) >= numero:
+                continue
+            migracao(conn)
+            conn.execute(f"PRAGMA user_version = {numero};")
+        logging.info(f"Migração {numero} aplicada: {descricao}")
+        versao = numero
+    return versao
@@ -0,0 +1,105 @@
+"""Camada de cache sobre o streaming das respostas dos modelos.
+
+Em um acerto, a resposta gravada em `db.cache_respostas` é reproduzida como um
+stream, então `st.write_stream` funciona igual nos dois casos. Em uma falha, o
+stream do modelo é repassado pedaço a pedaço e a resposta completa é gravada
+ao final.
+"""
+import re
+import threading
+
+from db.cache_respostas import chave_cache, buscar_resposta, gravar_resposta
+from services.roteamento_service import transmitir_com_reserva
+
+# Pedaços em que uma resposta em cache é reproduzida: palavra + espaços.
+_PEDACO = re.compile(r'\S+\s*|\s+')
+
+_contadores = {'acertos': 0, 'falhas': 0}
+_contadores_lock = threading.Lock()
+
+
+def _contar(tipo):
+    with _contadores_lock:
+        _contadores[tipo] += 1
+
+
+def contadores_cache():
+    """Retorna uma cópia dos contadores de acertos e falhas do processo."""
+    with _contadores_lock:
+        return dict(_contadores)
+
+
+def _texto(pedaco):
+    """Extrai o texto de um pedaço do stream (str ou AIMessageChunk)."""
+    return pedaco if isinstance(pedaco, str) else getattr(pedaco, 'content', '') or ''
+
+
+def reproduzir_resposta(resposta):
+    """Gera a resposta em pedaços, como o stream de um modelo."""
+    for pedaco in _PEDACO.finditer(resposta):
+        yield pedaco.group()
+
+
+def transmitir_resposta(chain, entrada, historico, provedor, modelo, prompt_sistema, ignorar_cache=False,
+                        prazo=None, relatorio=None):
+    """Transmite a resposta da chain, servindo do cache quando possível.
+
+    Args:
+
+        chain: A chain do LangChain (`carregar_modelo_cache`).
+
+        entrada (str): O texto para `{input}`.
+
+        historico (list[BaseMessage]): As mensagens para `{chat_history}`.
+
+        provedor (str): O provedor do modelo, parte da chave.
+
+        modelo (str): O modelo, parte da chave.
+
+        prompt_sistema (str): O prompt de sistema da chain, parte da chave.
+
+        ignorar_cache (bool): Consulta o modelo mesmo havendo resposta em cache;
+
+            a nova resposta substitui a anterior.
+
+        prazo (float | None): Segundos até o primeiro token antes de acionar o
+
+            provedor reserva (veja `roteamento_service`).
+
+        relatorio (dict | None): Preenchido com o provedor e o modelo que
+
+            responderam; 'cache' é True em um acerto.
+
+    Yields:
+
+        Os pedaços da resposta.
+
+    """
+    relatorio = {} if relatorio is None else relatorio
+    chave = chave_cache(
+        provedor, modelo, prompt_sistema,
+        [(mensagem.type, mensagem.content) for mensagem in historico],
+        entrada,
+    )
+    if not ignorar_cache:
+        resposta = buscar_resposta(chave)
+        if resposta is not None:
+            _contar('acertos')
+            relatorio.update(provedor=provedor, modelo=modelo, reserva=False, cache=True)
+            yield from reproduzir_resposta(resposta)
+            return
+
+    _contar('falhas')
+    partes = []
+    relatorio['cache'] = False
+    fluxo = transmitir_com_reserva(
+        chain, {'input': entrada, 'chat_history': historico}, provedor, modelo, prazo, relatorio
+    )
+    for pedaco in fluxo:
+        partes.append(_texto(pedaco))
+        yield pedaco
+    # Só chega aqui se o stream terminou sem erro. Respostas do provedor reserva
+    # não são gravadas sob a chave do modelo principal.
+    resposta = ''.join(partes)
+    if resposta.strip() and not relatorio.get('reserva'):
+        gravar_resposta(chave, provedor, modelo, resposta)
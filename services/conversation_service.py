@@ -1,47 +1,130 @@
+import logging
+
 import streamlit as st
 from db.db_sqlite import (
     criar_conversa,
-    carregar_mensagens,
+    carregar_mensagens_pagina,
     atualizar_titulo_conversa,
-    listar_conversas
+    listar_conversas,
+    buscar_conversas,
+    registrar_observador_conversas
 )
+from utils.constants import CHAT_MESSAGE_LIMIT, CONVERSAS_POR_PAGINA, ESPERA_ESCRITAS_LEITURA_S
 
 from db.db_sqlite import excluir_conversa
+from db.arquivo import restaurar_conversa
+from db.fila_escrita import aguardar_escritas
+from services.memory_service import descartar_memoria
+from services.indice_arquivos_service import descartar_indice
+
+def _aguardar_turnos():
+    """Espera, por pouco tempo, os turnos enfileirados chegarem ao banco antes de uma leitura.
+
+    Sem isso, reabrir ou paginar a conversa logo após um turno leria o banco
+
+    antes do COMMIT e o turno não apareceria.
+
+    """
+    if not aguardar_escritas(timeout=ESPERA_ESCRITAS_LEITURA_S):
+        logging.warning("Fila de escrita ainda ocupada; lendo o banco sem os últimos turnos")
 
 @st.cache_data
-def listar_conversas_cached():
-    return listar_conversas()
+def listar_conversas_cached(limite=CONVERSAS_POR_PAGINA):
+    """Retorna as `limite` conversas com atividade mais recente, em cache.
+
+    Apenas este cache é invalidado quando uma conversa é criada, renomeada,
+
+    excluída ou recebe mensagens; os demais `st.cache_data` são preservados.
+
+    Ao recarregar, espera os turnos enfileirados, para não guardar uma lista
+
+    anterior ao último turno.
+
+    """
+    _aguardar_turnos()
+    return listar_conversas(limite)
+
+def invalidar_lista_conversas(conversa_id=None):
+    """Descarta as listas de conversas em cache após uma alteração no banco."""
+    listar_conversas_cached.clear()
+
+registrar_observador_conversas(invalidar_lista_conversas)
+
+def buscar_conversas_service(texto, limite=20):
+    """Busca conversas pelo título ou pelo conteúdo das mensagens."""
+    if not texto or not texto.strip():
+        return []
+    _aguardar_turnos()
+    return buscar_conversas(texto.strip(), limite)
 
 def inicia_nova_conversa_service():
     """Cria uma nova conversa e atualiza o estado da sessão."""
-    st.session_state['historico'] = []
+    _reset_paginacao()
     provedor = st.session_state.get('provedor', 'Groq')
     modelo = st.session_state.get('modelo', 'llama-3.3-70b-versatile')
     conversa_id = criar_conversa('Nova conversa', provedor, modelo)
     st.session_state['conversa_atual'] = conversa_id
-    st.cache_data.clear()
     if 'titulo_atualizado' in st.session_state:
         del st.session_state['titulo_atualizado']
 
+def _reset_paginacao():
+    """Esvazia a janela de mensagens carregada na sessão."""
+    st.session_state['historico'] = []
+    st.session_state['historico_cursor'] = None
+    st.session_state['historico_tem_mais'] = False
+
+def _carregar_pagina(conversa_id, antes_de_id=None):
+    """Busca uma página de mensagens e atualiza o cursor da sessão.
+
+    Pede uma mensagem a mais que o tamanho da página apenas para saber se
+
+    ainda existem mensagens anteriores a carregar.
+
+    """
+    pagina = carregar_mensagens_pagina(conversa_id, antes_de_id, CHAT_MESSAGE_LIMIT + 1)
+    tem_mais = len(pagina) > CHAT_MESSAGE_LIMIT
+    if tem_mais:
+        pagina = pagina[1:]
+    if pagina:
+        st.session_state['historico_cursor'] = pagina[0]['id']
+    st.session_state['historico_tem_mais'] = tem_mais
+    return pagina
+
 def seleciona_conversa_service(conversa_id):
-    """Carrega uma conversa existente para o estado da sessão."""
-    mensagens = carregar_mensagens(conversa_id)
-    st.session_state['historico'] = mensagens
+    """Carrega a janela mais recente de uma conversa para o estado da sessão.
+
+    Conversas arquivadas são restauradas para o banco principal antes.
+
+    """
+    _aguardar_turnos()
+    restaurar_conversa(conversa_id)
+    _reset_paginacao()
+    st.session_state['historico'] = _carregar_pagina(conversa_id)
     st.session_state['conversa_atual'] = conversa_id
 
+def carregar_mensagens_anteriores_service():
+    """Adiciona ao início do histórico a página de mensagens anterior à janela atual."""
+    conversa_id = st.session_state.get('conversa_atual')
+    cursor = st.session_state.get('historico_cursor')
+    if not conversa_id or cursor is None:
+        return
+    _aguardar_turnos()
+    anteriores = _carregar_pagina(conversa_id, cursor)
+    st.session_state['historico'] = anteriores + st.session_state.get('historico', [])
+
 def renomear_conversa_service(conversa_id, novo_titulo):
     """Renomeia uma conversa e atualiza a interface."""
     if novo_titulo.strip():
         atualizar_titulo_conversa(conversa_id, novo_titulo.strip())
-        st.cache_data.clear()
         st.rerun()
 
 def excluir_conversa_service(conversa_id):
     """Exclui uma conversa do banco e reseta o estado da sessão."""
     excluir_conversa(conversa_id)
+    descartar_memoria(conversa_id)
+    descartar_indice(conversa_id)
     st.session_state.pop('conversa_atual', None)
-    st.session_state['historico'] = []
+    _reset_paginacao()
     st.session_state['confirmar_exclusao'] = False
     st.session_state['mostrar_input_renomear'] = False
-    st.cache_data.clear()
     st.rerun()
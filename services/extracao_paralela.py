@@ -0,0 +1,360 @@
+"""Extração de vários arquivos em paralelo, em processos separados.
+
+PyMuPDF, pandas e os analisadores do `file_processor` ocupam o GIL, então a
+extração roda em um pool de processos: cada arquivo é uma tarefa e cada PDF
+é dividido em faixas de páginas, no máximo uma por processo. Os resultados
+são remontados na ordem dos arquivos e das páginas, com o mesmo texto (e os
+mesmos limites) da extração serial.
+
+Cada tarefa avisa o processo principal quando começa, e o prazo de cada
+arquivo conta a partir do início das suas tarefas: com mais arquivos que
+processos, os da fila não perdem tempo de prazo esperando. As faixas de um PDF
+param de extrair ao passar do prazo, e o arquivo que não termina a tempo fica
+sem texto. Uma tarefa que nem começou quando o lote inteiro já teria rodado
+(um prazo por rodada de `processos` tarefas) é abandonada sem rodar. Uma tarefa
+abandonada em andamento (uma planilha ou um DOCX lentos não têm como parar
+no meio) ocuparia o processo e atrasaria os lotes seguintes: o pool é
+trocado por um novo, e o antigo é encerrado assim que nenhum lote o usa.
+
+Os erros e avisos que o `file_processor` mostraria com `st.error` e
+`st.warning` não chegam à interface a partir de outro processo: a tarefa os
+devolve junto com o texto, e `extrair` os repassa em `avisos`. Os processos
+são criados com 'spawn', que não herda as threads do Streamlit nem as
+conexões SQLite do processo principal.
+"""
+import concurrent.futures
+import io
+import itertools
+import logging
+import math
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+from utils.constants import (
+    EXTRACAO_PROCESSOS, EXTRACAO_PAGINAS_POR_TAREFA, EXTRACAO_TIMEOUT_ARQUIVO_S, EXTRACAO_MAX_PAGINAS,
+    EXTRACAO_MAX_TOKENS
+)
+
+
+class ArquivoEmMemoria(io.BytesIO):
+    """Arquivo carregado reconstruído no processo de extração."""
+
+    def __init__(self, conteudo, name, type):
+        super().__init__(conteudo)
+        self.name = name
+        self.type = type
+
+
+def e_pdf(nome, tipo):
+    """Indica se o arquivo é tratado como PDF pelo `file_processor`."""
+    return tipo == 'application/pdf' or nome.lower().endswith('.pdf')
+
+
+# Fila dos inícios de tarefa no processo de extração (veja `_iniciar_processo`).
+_inicios = None
+# Com que frequência quem espera um lote confere os inícios e os prazos.
+INTERVALO_VERIFICACAO_S = 0.05
+
+
+def _iniciar_processo(fila):
+    global _inicios
+    _inicios = fila
+
+
+def _marcar_inicio(tarefa):
+    """Avisa o processo principal que a tarefa começou e retorna o instante."""
+    agora = time.time()
+    if _inicios is not None:
+        _inicios.put((tarefa, agora))
+    return agora
+
+
+class _Avisos:
+    """Faz o papel do `st` do `file_processor` no processo de extração, guardando as mensagens."""
+
+    def __init__(self):
+        self.mensagens = []
+
+    def error(self, mensagem, *args, **kwargs):
+        self.mensagens.append(str(mensagem))
+
+    warning = error
+
+    def info(self, *args, **kwargs):
+        pass
+
+
+def _extrair_arquivo(conteudo, nome, tipo, tarefa, limite_inicio):
+    if _marcar_inicio(tarefa) > limite_inicio:
+        # Ficou na fila até depois do limite; o resultado já seria descartado.
+        return None, None
+    from services import file_processor
+    avisos = _Avisos()
+    anterior, file_processor.st = file_processor.st, avisos
+    try:
+        texto = file_processor.processar_automatico(ArquivoEmMemoria(conteudo, nome, tipo))
+    finally:
+        file_processor.st = anterior
+    return texto, '\n'.join(avisos.mensagens) or None
+
+
+def _extrair_paginas(conteudo, inicio, fim, tarefa, timeout, limite_inicio):
+    comeco = _marcar_inicio(tarefa)
+    if comeco > limite_inicio:
+        return []
+    from services import file_processor
+    return file_processor.extrair_paginas_pdf(conteudo, inicio, fim, comeco + timeout)
+
+
+def _contar_paginas(conteudo):
+    import fitz
+    with fitz.open(stream=conteudo, filetype="pdf") as doc:
+        return doc.page_count
+
+
+def _encerrar_processos(executor):
+    """Encerra um pool sem esperar as tarefas em andamento."""
+    terminar = getattr(executor, 'terminate_workers', None)
+    if terminar is not None:
+        terminar()
+        return
+    for processo in list((executor._processes or {}).values()):
+        processo.terminate()
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+class MotorExtracao:
+    """Pool de processos que extrai o texto de lotes de arquivos."""
+
+    def __init__(self, processos=None):
+        self.processos = processos or EXTRACAO_PROCESSOS or os.cpu_count() or 1
+        self._executor = None
+        self._lock = threading.Lock()
+        self._lotes = {}  # pool -> lotes em andamento nele
+        self._reciclar = set()
+        self._filas = {}  # pool -> fila dos inícios de tarefa dos seus processos
+        self._tarefas = itertools.count()
+        self._inicios = {}  # tarefa em andamento -> instante em que começou (None na fila)
+
+    def _obter_executor(self):
+        with self._lock:
+            if self._executor is None:
+                contexto = multiprocessing.get_context('spawn')
+                # Uma fila por pool: encerrar os processos de um pool não afeta a dos outros.
+                fila = contexto.SimpleQueue()
+                self._executor = concurrent.futures.ProcessPoolExecutor(
+                    self.processos, mp_context=contexto, initializer=_iniciar_processo, initargs=(fila,)
+                )
+                self._filas[self._executor] = fila
+            self._lotes[self._executor] = self._lotes.get(self._executor, 0) + 1
+            return self._executor
+
+    def _liberar_executor(self, executor, abandonou):
+        """Fim de um lote. Um pool com tarefa abandonada sai de uso e, sem lotes, é encerrado."""
+        with self._lock:
+            self._lotes[executor] -= 1
+            if abandonou:
+                self._reciclar.add(executor)
+                if self._executor is executor:
+                    self._executor = None
+            ocioso = not self._lotes[executor]
+            if ocioso:
+                del self._lotes[executor]
+            encerrar = ocioso and executor in self._reciclar
+            if encerrar:
+                self._reciclar.discard(executor)
+                self._filas.pop(executor, None)
+        if encerrar:
+            _encerrar_processos(executor)
+
+    def _descartar_executor(self, executor):
+        """Descarta um pool quebrado; o próximo lote cria outro."""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+            if executor not in self._lotes:
+                self._filas.pop(executor, None)
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _coletar_inicios(self, executor):
+        """Registra os inícios avisados pelos processos do pool desde a última coleta."""
+        with self._lock:
+            fila = self._filas.get(executor)
+            while fila is not None and not fila.empty():
+                tarefa, instante = fila.get()
+                # Tarefas de lotes já encerrados não interessam a ninguém.
+                if tarefa in self._inicios:
+                    self._inicios[tarefa] = instante
+
+    def _faixas(self, conteudo):
+        """Divide as páginas de um PDF em faixas [inicio, fim), uma por processo no máximo."""
+        paginas = min(_contar_paginas(conteudo), EXTRACAO_MAX_PAGINAS)
+        tamanho = max(EXTRACAO_PAGINAS_POR_TAREFA, math.ceil(paginas / self.processos))
+        return [(inicio, min(inicio + tamanho, paginas)) for inicio in range(0, paginas, tamanho)]
+
+    def _planejar(self, conteudo, nome, tipo):
+        """Retorna as faixas de um PDF, ou None se o arquivo é extraído por inteiro."""
+        if not e_pdf(nome, tipo):
+            return None
+        try:
+            return self._faixas(conteudo) or None
+        except Exception:
+            # PDF ilegível: a tarefa do arquivo inteiro relata o erro.
+            return None
+
+    def _enviar(self, executor, conteudo, nome, tipo, faixas, timeout, limite_inicio):
+        """Envia as tarefas de um arquivo e retorna os pares (tarefa, futuro)."""
+        if faixas is None:
+            especificacoes = [(_extrair_arquivo, (conteudo, nome, tipo))]
+        else:
+            especificacoes = [(_extrair_paginas, (conteudo, inicio, fim)) for inicio, fim in faixas]
+        enviadas = []
+        for funcao, argumentos in especificacoes:
+            tarefa = next(self._tarefas)
+            with self._lock:
+                self._inicios[tarefa] = None
+            if funcao is _extrair_paginas:
+                futuro = executor.submit(funcao, *argumentos, tarefa, timeout, limite_inicio)
+            else:
+                futuro = executor.submit(funcao, *argumentos, tarefa, limite_inicio)
+            enviadas.append((tarefa, futuro))
+        return enviadas
+
+    def _aguardar(self, executor, enviadas, timeout, limite_inicio):
+        """Espera as tarefas de um arquivo, cada uma até `timeout` depois de começar.
+
+        Returns:
+
+            bool: True se todas terminaram; False se alguma passou do prazo.
+
+        """
+        while True:
+            self._coletar_inicios(executor)
+            pendentes = [(tarefa, futuro) for tarefa, futuro in enviadas if not futuro.done()]
+            if not pendentes:
+                return True
+            with self._lock:
+                inicios = [self._inicios.get(tarefa) for tarefa, _ in pendentes]
+            prazo = min(limite_inicio if inicio is None else inicio + timeout for inicio in inicios)
+            restante = prazo - time.time()
+            if restante <= 0:
+                return False
+            concurrent.futures.wait(
+                [futuro for _, futuro in pendentes], timeout=min(restante, INTERVALO_VERIFICACAO_S),
+                return_when=concurrent.futures.FIRST_COMPLETED
+            )
+
+    def extrair(self, arquivos, timeout=EXTRACAO_TIMEOUT_ARQUIVO_S, avisos=None):
+        """Extrai o texto de vários arquivos em paralelo.
+
+        Args:
+
+            arquivos (list[tuple[bytes, str, str]]): O conteúdo, o nome e o tipo
+
+                MIME de cada arquivo.
+
+            timeout (float): Prazo de cada arquivo, em segundos, contado a partir
+
+                do início das suas tarefas.
+
+            avisos (list | None): Recebe, na ordem da entrada, a mensagem de erro
+
+                ou aviso de cada arquivo (None se não houve) para a interface.
+
+        Returns:
+
+            list[str | None]: O texto de cada arquivo, na ordem da entrada; None
+
+                para os que falharam ou passaram do prazo.
+
+        """
+        from services.file_processor import montar_texto_pdf, ate_orcamento
+
+        avisos = [] if avisos is None else avisos
+        executor = self._obter_executor()
+        abandonou = False
+        tarefas = []
+        try:
+            planos = [self._planejar(conteudo, nome, tipo) for conteudo, nome, tipo in arquivos]
+            total = sum(1 if faixas is None else len(faixas) for faixas in planos)
+            # Se cada rodada de `processos` tarefas usasse o prazo inteiro.
+            limite_inicio = time.time() + timeout * math.ceil(total / self.processos)
+            tarefas = [
+                self._enviar(executor, conteudo, nome, tipo, faixas, timeout, limite_inicio)
+                for (conteudo, nome, tipo), faixas in zip(arquivos, planos)
+            ]
+
+            textos = []
+            for (_, nome, _), faixas, enviadas in zip(arquivos, planos, tarefas):
+                futuros = [futuro for _, futuro in enviadas]
+                if not self._aguardar(executor, enviadas, timeout, limite_inicio):
+                    for futuro in futuros:
+                        # Só as tarefas ainda na fila podem ser canceladas.
+                        if not futuro.done() and not futuro.cancel():
+                            abandonou = True
+                    aviso = f"A extração de '{nome}' passou de {timeout:.0f}s e foi abandonada."
+                    logging.warning(aviso)
+                    textos.append(None)
+                    avisos.append(aviso)
+                    continue
+                try:
+                    resultados = [futuro.result() for futuro in futuros]
+                except BrokenProcessPool as e:
+                    logging.error(f"Pool de extração interrompido em '{nome}': {e}")
+                    self._descartar_executor(executor)
+                    textos.append(None)
+                    avisos.append(f"Erro ao extrair '{nome}': o processo de extração foi interrompido.")
+                    continue
+                except Exception as e:
+                    logging.error(f"Erro ao extrair '{nome}': {e}")
+                    textos.append(None)
+                    avisos.append(f"Erro ao extrair '{nome}': {e}")
+                    continue
+                if faixas is None:
+                    texto, aviso = resultados[0]
+                    if aviso:
+                        logging.warning(aviso)
+                    textos.append(texto)
+                    avisos.append(aviso)
+                    continue
+                segmentos = [segmento for resultado in resultados for segmento in resultado]
+                if sum(segmento['pagina'] is not None for segmento in segmentos) < faixas[-1][1]:
+                    # Alguma faixa parou no prazo: o texto estaria incompleto.
+                    aviso = f"A extração de '{nome}' passou de {timeout:.0f}s e foi abandonada."
+                    logging.warning(aviso)
+                    textos.append(None)
+                    avisos.append(aviso)
+                    continue
+                textos.append(montar_texto_pdf(ate_orcamento(segmentos, EXTRACAO_MAX_TOKENS)))
+                avisos.append(None)
+            return textos
+        finally:
+            with self._lock:
+                for enviadas in tarefas:
+                    for tarefa, _ in enviadas:
+                        self._inicios.pop(tarefa, None)
+            self._liberar_executor(executor, abandonou)
+
+    def fechar(self):
+        """Encerra os processos do pool."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+            self._filas.pop(executor, None)
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+_motor = None
+_motor_lock = threading.Lock()
+
+
+def obter_motor():
+    """Retorna o motor de extração compartilhado pelas sessões do processo."""
+    global _motor
+    with _motor_lock:
+        if _motor is None:
+            _motor = MotorExtracao()
+        return _motor
@@ -0,0 +1,156 @@
+"""Extração do texto dos arquivos carregados, com cache e anexos por conversa.
+
+`extrair_com_cache` calcula o sha256 do conteúdo e só extrai (em paralelo,
+com `services.extracao_paralela`) os arquivos que ainda não estão em
+`db.cache_extracoes`.
+`arquivos_do_turno` extrai os arquivos carregados, anexa-os à conversa e
+retorna também os anexados em turnos anteriores, para que as perguntas
+seguintes usem o texto sem um novo upload.
+"""
+import hashlib
+import logging
+import threading
+
+from db.cache_extracoes import (
+    chave_extracao, buscar_extracoes, gravar_extracao, anexar_arquivos, arquivos_da_conversa
+)
+from services.extracao_paralela import obter_motor
+
+_contadores = {'acertos': 0, 'falhas': 0}
+_contadores_lock = threading.Lock()
+
+
+def _contar(tipo):
+    with _contadores_lock:
+        _contadores[tipo] += 1
+
+
+def contadores_extracao():
+    """Retorna uma cópia dos contadores de acertos e falhas do processo."""
+    with _contadores_lock:
+        return dict(_contadores)
+
+
+def _conteudo(arquivo):
+    """Lê o conteúdo de um arquivo carregado sem mover o ponteiro dele."""
+    if hasattr(arquivo, 'getvalue'):
+        return arquivo.getvalue()
+    arquivo.seek(0)
+    dados = arquivo.read()
+    arquivo.seek(0)
+    return dados
+
+
+def extrair_com_cache(arquivos, avisos=None):
+    """Extrai o texto de arquivos carregados, reaproveitando extrações anteriores.
+
+    Os arquivos que não estão no cache são extraídos juntos, em paralelo
+
+    (veja `services.extracao_paralela`).
+
+    Args:
+
+        arquivos (list[UploadedFile]): Os arquivos carregados no Streamlit.
+
+        avisos (dict | None): Recebe, pelo nome do arquivo, os erros e avisos
+
+            da extração, para a interface mostrar.
+
+    Returns:
+
+        list[tuple[str, str | None]]: A chave da extração e o texto extraído de
+
+            cada arquivo, na ordem da entrada (None se a extração falhou; falhas
+
+            não são guardadas).
+
+    """
+    conteudos = []
+    for arquivo in arquivos:
+        dados = _conteudo(arquivo)
+        sha256 = hashlib.sha256(dados).hexdigest()
+        conteudos.append((chave_extracao(sha256, getattr(arquivo, 'type', None), arquivo.name), dados, sha256))
+    em_cache = buscar_extracoes([chave for chave, _, _ in conteudos])
+
+    resultados = []
+    faltantes = []
+    for arquivo, (chave, dados, sha256) in zip(arquivos, conteudos):
+        texto = em_cache.get(chave)
+        _contar('acertos' if texto is not None else 'falhas')
+        if texto is None:
+            faltantes.append((len(resultados), arquivo, dados, sha256))
+        resultados.append((chave, texto))
+
+    if faltantes:
+        mensagens = []
+        textos = obter_motor().extrair([
+            (dados, arquivo.name, getattr(arquivo, 'type', None)) for _, arquivo, dados, _ in faltantes
+        ], avisos=mensagens)
+        for (indice, arquivo, dados, sha256), texto, mensagem in zip(faltantes, textos, mensagens):
+            if mensagem and avisos is not None:
+                avisos[arquivo.name] = mensagem
+            chave = resultados[indice][0]
+            if texto:
+                gravar_extracao(chave, sha256, arquivo.name, len(dados), texto)
+            resultados[indice] = (chave, texto)
+    return resultados
+
+
+def arquivos_do_turno(conversa_id, arquivos, avisos=None):
+    """Extrai os arquivos carregados e reúne todos os arquivos da conversa.
+
+    Só os arquivos ainda não anexados são gravados, em uma única transação;
+
+    um turno que repete os uploads anteriores não escreve no banco.
+
+    Args:
+
+        conversa_id (int | None): A conversa atual; sem ela, nada é anexado.
+
+        arquivos (list[UploadedFile]): Os arquivos carregados neste turno.
+
+        avisos (dict | None): Recebe os erros e avisos da extração (veja
+
+            `extrair_com_cache`).
+
+    Returns:
+
+        tuple[list[tuple[str, str, str]], list[str]]: Os trios (chave, nome,
+
+            texto extraído), na ordem em que os arquivos foram anexados à
+
+            conversa, e os nomes dos arquivos anexados neste turno. Anexos
+
+            cuja extração não está mais no cache ficam de fora, com um aviso
+
+            no log.
+
+    """
+    novos = {}
+    for arquivo, (chave, texto) in zip(arquivos, extrair_com_cache(arquivos, avisos)):
+        if texto:
+            novos[chave] = (chave, arquivo.name, texto)
+
+    if not conversa_id:
+        return list(novos.values()), [nome for _, nome, _ in novos.values()]
+
+    anexados = arquivos_da_conversa(conversa_id)
+    ja_anexadas = {chave for chave, _ in anexados}
+    adicionados = [(chave, nome) for chave, nome, _ in novos.values() if chave not in ja_anexadas]
+    if adicionados:
+        anexar_arquivos(conversa_id, adicionados)
+        # Mesmo que a gravação falhe, os arquivos valem para este turno.
+        anexados += adicionados
+
+    anteriores = buscar_extracoes([chave for chave, _ in anexados if chave not in novos])
+    contexto = []
+    for chave, nome in anexados:
+        if chave in novos:
+            contexto.append(novos[chave])
+        elif chave in anteriores:
+            contexto.append((chave, nome, anteriores[chave]))
+        else:
+            logging.warning(
+                f"O texto de '{nome}', anexado à conversa {conversa_id}, não está mais no cache de extrações"
+            )
+    return contexto, [nome for _, nome in adicionados]
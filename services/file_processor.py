@@ -1,39 +1,214 @@
-
 """
 Módulo para processamento automático de arquivos.
 
 Este módulo contém a lógica para detectar o tipo de um arquivo carregado
 e aplicar a função de processamento mais adequada, como extração de texto,
 OCR, transcrição de áudio, análise de dados ou processamento de código.
+
+A extração de texto é feita em streaming por `extrair_segmentos`, que gera
+o texto em segmentos (página de PDF, seção de DOCX ou Markdown, bloco de
+texto) sem montar cópias intermediárias do documento inteiro. Os limites de
+páginas, de bytes lidos e de tokens extraídos (veja `EXTRACAO_MAX_*`) param
+a leitura cedo; um aviso no fim do texto indica o corte. As funções
+`processar_*` montam seus resumos sobre esses segmentos.
 """
 import streamlit as st
 import fitz  # PyMuPDF
-import pandas as pd
 import re
+import time
+import codecs
+from collections import Counter
 from docx import Document
 import json
 import xml.etree.ElementTree as ET
 
+from utils.constants import EXTRACAO_MAX_BYTES, EXTRACAO_MAX_PAGINAS, EXTRACAO_MAX_TOKENS, EXTRACAO_BLOCO_BYTES
+from utils.tokens import CARACTERES_POR_TOKEN
+from services.perfil_tabela import perfil_csv, perfis_excel
+
+def segmento(texto, pagina=None, secao=None, linha=None):
+    """Cria um segmento de texto com a sua posição no documento."""
+    return {'texto': texto, 'pagina': pagina, 'secao': secao, 'linha': linha}
+
+def aviso_limite(motivo):
+    """Segmento final que indica que a extração parou em um limite."""
+    return segmento(f"\n[... extração interrompida: {motivo}]\n")
+
+def segmentos_pdf(conteudo, inicio=0, fim=None, prazo=None, max_paginas=EXTRACAO_MAX_PAGINAS):
+    """Gera um segmento por página do PDF, das páginas [inicio, fim).
+
+    Com `prazo` (um instante de `time.time()`), para ao passar dele, sem aviso.
+    Páginas além de `max_paginas` não são lidas.
+    """
+    with fitz.open(stream=conteudo, filetype="pdf") as doc:
+        total = doc.page_count
+        limite = total if max_paginas is None else min(total, max_paginas)
+        fim = limite if fim is None else min(fim, limite)
+        for indice in range(inicio, fim):
+            if prazo is not None and time.time() > prazo:
+                return
+            yield segmento(doc[indice].get_text(), pagina=indice + 1)
+        if fim == limite < total:
+            yield aviso_limite(f"limite de {limite} de {total} páginas")
+
+def extrair_paginas_pdf(conteudo, inicio=0, fim=None, prazo=None):
+    """Retorna a lista dos segmentos das páginas [inicio, fim) de um PDF (veja `segmentos_pdf`)."""
+    return list(segmentos_pdf(conteudo, inicio, fim, prazo))
+
+def _titulo_markdown(linha):
+    texto = linha.strip()
+    if texto.startswith('#'):
+        return texto.lstrip('#').strip() or None
+    return None
+
+def segmentos_texto(arquivo, max_bytes=EXTRACAO_MAX_BYTES):
+    """Gera o texto de um arquivo em blocos de `EXTRACAO_BLOCO_BYTES`.
+
+    Decodifica como UTF-8 e, a partir do primeiro bloco inválido, como
+    latin-1. Em Markdown, os segmentos seguem as seções (títulos `#`).
+    """
+    markdown = arquivo.name.lower().endswith(('.md', '.markdown'))
+    decodificador = codecs.getincrementaldecoder('utf-8')()
+    arquivo.seek(0)
+    lidos = 0
+    linha = 1
+    secao = None
+    resto = ''
+    while True:
+        bloco = arquivo.read(EXTRACAO_BLOCO_BYTES)
+        cortado = max_bytes is not None and lidos + len(bloco) > max_bytes
+        if cortado:
+            bloco = bloco[:max_bytes - lidos]
+        lidos += len(bloco)
+        final = cortado or not bloco
+        pendente = decodificador.getstate()[0]
+        try:
+            texto = decodificador.decode(bloco, final)
+        except UnicodeDecodeError:
+            decodificador = codecs.getincrementaldecoder('latin-1')()
+            texto = decodificador.decode(pendente + bloco, final)
+
+        if not markdown:
+            if texto:
+                yield segmento(texto, linha=linha)
+                linha += texto.count('\n')
+        else:
+            # Só linhas completas; a última, incompleta, espera o próximo bloco.
+            linhas = (resto + texto).splitlines(keepends=True)
+            resto = '' if final or not linhas or linhas[-1].endswith('\n') else linhas.pop()
+            partes = []
+            for atual in linhas:
+                titulo = _titulo_markdown(atual)
+                if titulo is not None and partes:
+                    yield segmento(''.join(partes), secao=secao, linha=linha)
+                    linha += len(partes)
+                    partes = []
+                if titulo is not None:
+                    secao = titulo
+                partes.append(atual)
+            if partes:
+                yield segmento(''.join(partes), secao=secao, linha=linha)
+                linha += len(partes)
+
+        if cortado:
+            yield aviso_limite(f"limite de {max_bytes} bytes lidos")
+        if final:
+            return
+
+def segmentos_docx(arquivo):
+    """Gera um segmento por parágrafo não vazio do DOCX, com o título da seção."""
+    doc = Document(arquivo)
+    secao = None
+    for paragrafo in doc.paragraphs:
+        if not paragrafo.text.strip():
+            continue
+        estilo = paragrafo.style.name if paragrafo.style is not None else ''
+        if estilo.startswith(('Heading', 'Título', 'Title')):
+            secao = paragrafo.text.strip()
+        yield segmento(f"{paragrafo.text}\n", secao=secao)
+
+def ate_orcamento(segmentos, max_tokens):
+    """Repassa os segmentos até que o texto estimado chegue a `max_tokens`.
+
+    A estimativa é de um token a cada `CARACTERES_POR_TOKEN` caracteres, sem
+    tokenizar. Ao parar, fecha o gerador de origem (o que libera o documento).
+    """
+    if max_tokens is None:
+        yield from segmentos
+        return
+    caracteres = 0
+    limite = max_tokens * CARACTERES_POR_TOKEN
+    try:
+        for atual in segmentos:
+            yield atual
+            caracteres += len(atual['texto'])
+            if caracteres >= limite:
+                yield aviso_limite(f"limite de {max_tokens} tokens extraídos")
+                return
+    finally:
+        fechar = getattr(segmentos, 'close', None)
+        if fechar is not None:
+            fechar()
+
+def extrair_segmentos(arquivo, max_bytes=EXTRACAO_MAX_BYTES, max_paginas=EXTRACAO_MAX_PAGINAS,
+                      max_tokens=EXTRACAO_MAX_TOKENS):
+    """Gera o texto de um arquivo em segmentos, parando nos limites.
+
+    Args:
+
+        arquivo (UploadedFile): O arquivo carregado (PDF, DOCX ou texto).
+
+        max_bytes (int | None): Bytes lidos, no máximo, de arquivos de texto.
+
+        max_paginas (int | None): Páginas lidas, no máximo, de PDFs.
+
+        max_tokens (int | None): Tokens estimados a partir dos quais a extração
+
+            para, por exemplo o orçamento do prompt.
+
+    Returns:
+
+        Iterator[dict]: Segmentos com 'texto' e a posição dele: 'pagina' (PDF),
+
+            'secao' (título em DOCX e Markdown) e 'linha' (arquivos de texto).
+
+            Um último segmento sem posição avisa quando um limite foi atingido.
+
+    """
+    nome = arquivo.name.lower()
+    if arquivo.type == "application/pdf" or nome.endswith('.pdf'):
+        arquivo.seek(0)
+        # getvalue() de um upload não copia o conteúdo.
+        conteudo = arquivo.getvalue() if hasattr(arquivo, 'getvalue') else arquivo.read()
+        segmentos = segmentos_pdf(conteudo, max_paginas=max_paginas)
+    elif nome.endswith('.docx'):
+        segmentos = segmentos_docx(arquivo)
+    else:
+        segmentos = segmentos_texto(arquivo, max_bytes=max_bytes)
+    return ate_orcamento(segmentos, max_tokens)
+
+def _juntar(segmentos):
+    return "".join(atual['texto'] for atual in segmentos)
+
+def montar_texto_pdf(segmentos):
+    """Monta o texto de um PDF a partir dos segmentos das páginas, em ordem."""
+    partes = []
+    for atual in segmentos:
+        if atual['pagina'] is None:
+            partes.append(atual['texto'])  # Aviso de limite
+        elif atual['texto'].strip():  # Só adiciona se há texto
+            partes.append(f"--- Página {atual['pagina']} ---\n{atual['texto']}\n\n")
+    texto = "".join(partes)
+
+    if not texto.strip():
+        return "PDF processado, mas nenhum texto foi encontrado. Pode ser um PDF de imagens."
+
+    return texto
+
 def extrair_texto_pdf(arquivo):
     """Extrai texto de um arquivo PDF."""
     try:
-        # Lê o conteúdo do arquivo
-        conteudo = arquivo.read()
-        doc = fitz.open(stream=conteudo, filetype="pdf")
-        texto = ""
-        
-        for num_pagina, pagina in enumerate(doc, 1):
-            texto_pagina = pagina.get_text()
-            if texto_pagina.strip():  # Só adiciona se há texto
-                texto += f"--- Página {num_pagina} ---\n"
-                texto += texto_pagina + "\n\n"
-        
-        doc.close()
-        
-        if not texto.strip():
-            return "PDF processado, mas nenhum texto foi encontrado. Pode ser um PDF de imagens."
-        
-        return texto
+        return montar_texto_pdf(extrair_segmentos(arquivo))
     except Exception as e:
         st.error(f"Erro ao processar PDF '{arquivo.name}': {e}")
         return None
@@ -41,65 +216,55 @@ def extrair_texto_pdf(arquivo):
 def extrair_texto_txt(arquivo):
     """Extrai texto de um arquivo TXT."""
     try:
-        # Tenta diferentes encodings
-        encodings = ['utf-8', 'latin-1', 'cp1252', 'iso-8859-1']
-        conteudo = arquivo.read()
-        
-        for encoding in encodings:
-            try:
-                return conteudo.decode(encoding)
-            except UnicodeDecodeError:
-                continue
-        
-        # Se nenhum encoding funcionar, usa utf-8 com ignore
-        return conteudo.decode('utf-8', errors='ignore')
+        return _juntar(ate_orcamento(segmentos_texto(arquivo), EXTRACAO_MAX_TOKENS))
     except Exception as e:
         st.error(f"Erro ao ler arquivo de texto '{arquivo.name}': {e}")
         return None
 
+def _lista(titulo, itens, maximo=None, rotulo=''):
+    """Partes de uma seção "TÍTULO (n):" com um item por linha, até `maximo` itens."""
+    partes = [f"{titulo} ({len(itens)}):\n"]
+    partes.extend(f"  {item.strip()}\n" for item in itens[:maximo])
+    if maximo is not None and len(itens) > maximo:
+        partes.append(f"  ... e mais {len(itens) - maximo} {rotulo}\n")
+    partes.append("\n")
+    return partes
+
+def _conteudo_completo(conteudo, titulo="CÓDIGO COMPLETO"):
+    return [f"{titulo}:\n", "=" * 50 + "\n", conteudo]
+
+def _cabecalho(titulo, arquivo, conteudo):
+    return [
+        f"{titulo}: {arquivo.name}\n",
+        f"Tamanho: {len(conteudo)} caracteres\n",
+        f"Linhas: {len(conteudo.splitlines())}\n\n",
+    ]
+
 def processar_codigo_python(arquivo):
     """Processa arquivo Python e retorna informações estruturadas."""
     try:
         conteudo = extrair_texto_txt(arquivo)
         if conteudo is None:
             return None
-        
+
         # Análise básica do código Python
-        info = f"ANÁLISE DO CÓDIGO PYTHON: {arquivo.name}\n"
-        info += f"Tamanho: {len(conteudo)} caracteres\n"
-        info += f"Linhas: {len(conteudo.splitlines())}\n\n"
-        
+        partes = _cabecalho("ANÁLISE DO CÓDIGO PYTHON", arquivo, conteudo)
+
         # Conta imports, funções e classes
         linhas = conteudo.splitlines()
         imports = [linha for linha in linhas if linha.strip().startswith(('import ', 'from '))]
         funcoes = [linha for linha in linhas if linha.strip().startswith('def ')]
         classes = [linha for linha in linhas if linha.strip().startswith('class ')]
-        
+
         if imports:
-            info += f"IMPORTS ({len(imports)}):\n"
-            for imp in imports[:10]:  # Máximo 10 imports
-                info += f"  {imp.strip()}\n"
-            if len(imports) > 10:
-                info += f"  ... e mais {len(imports) - 10} imports\n"
-            info += "\n"
-        
+            partes += _lista("IMPORTS", imports, 10, "imports")  # Máximo 10 imports
         if classes:
-            info += f"CLASSES ({len(classes)}):\n"
-            for classe in classes:
-                info += f"  {classe.strip()}\n"
-            info += "\n"
-        
+            partes += _lista("CLASSES", classes)
         if funcoes:
-            info += f"FUNÇÕES ({len(funcoes)}):\n"
-            for funcao in funcoes:
-                info += f"  {funcao.strip()}\n"
-            info += "\n"
-        
-        info += "CÓDIGO COMPLETO:\n"
-        info += "=" * 50 + "\n"
-        info += conteudo
-        
-        return info
+            partes += _lista("FUNÇÕES", funcoes)
+
+        partes += _conteudo_completo(conteudo)
+        return "".join(partes)
     except Exception as e:
         st.error(f"Erro ao processar código Python '{arquivo.name}': {e}")
         return None
@@ -110,37 +275,21 @@ def processar_codigo_javascript(arquivo):
         conteudo = extrair_texto_txt(arquivo)
         if conteudo is None:
             return None
-        
-        info = f"ANÁLISE DO CÓDIGO JAVASCRIPT: {arquivo.name}\n"
-        info += f"Tamanho: {len(conteudo)} caracteres\n"
-        info += f"Linhas: {len(conteudo.splitlines())}\n\n"
-        
+
+        partes = _cabecalho("ANÁLISE DO CÓDIGO JAVASCRIPT", arquivo, conteudo)
+
         # Análise básica
         linhas = conteudo.splitlines()
         funcoes = [linha for linha in linhas if 'function' in linha or '=>' in linha]
         imports = [linha for linha in linhas if linha.strip().startswith(('import ', 'const ', 'require('))]
-        
+
         if imports:
-            info += f"IMPORTS/REQUIRES ({len(imports)}):\n"
-            for imp in imports[:10]:
-                info += f"  {imp.strip()}\n"
-            if len(imports) > 10:
-                info += f"  ... e mais {len(imports) - 10} imports\n"
-            info += "\n"
-        
+            partes += _lista("IMPORTS/REQUIRES", imports, 10, "imports")
         if funcoes:
-            info += f"FUNÇÕES ({len(funcoes)}):\n"
-            for funcao in funcoes[:10]:
-                info += f"  {funcao.strip()}\n"
-            if len(funcoes) > 10:
-                info += f"  ... e mais {len(funcoes) - 10} funções\n"
-            info += "\n"
-        
-        info += "CÓDIGO COMPLETO:\n"
-        info += "=" * 50 + "\n"
-        info += conteudo
-        
-        return info
+            partes += _lista("FUNÇÕES", funcoes, 10, "funções")
+
+        partes += _conteudo_completo(conteudo)
+        return "".join(partes)
     except Exception as e:
         st.error(f"Erro ao processar código JavaScript '{arquivo.name}': {e}")
         return None
@@ -151,43 +300,33 @@ def processar_html(arquivo):
         conteudo = extrair_texto_txt(arquivo)
         if conteudo is None:
             return None
-        
-        info = f"ANÁLISE DO HTML: {arquivo.name}\n"
-        info += f"Tamanho: {len(conteudo)} caracteres\n"
-        info += f"Linhas: {len(conteudo.splitlines())}\n\n"
-        
+
+        partes = _cabecalho("ANÁLISE DO HTML", arquivo, conteudo)
+
         # Análise básica de tags
-        tags = re.findall(r'<(\w+)', conteudo.lower())
-        tags_unicas = list(set(tags))
-        
-        if tags_unicas:
-            info += f"TAGS HTML ENCONTRADAS ({len(tags_unicas)}):\n"
-            for tag in sorted(tags_unicas):
-                count = tags.count(tag)
-                info += f"  <{tag}> ({count}x)\n"
-            info += "\n"
-        
+        tags = Counter(re.findall(r'<(\w+)', conteudo.lower()))
+
+        if tags:
+            partes.append(f"TAGS HTML ENCONTRADAS ({len(tags)}):\n")
+            partes.extend(f"  <{tag}> ({tags[tag]}x)\n" for tag in sorted(tags))
+            partes.append("\n")
+
         # Procura por scripts e estilos
         scripts = re.findall(r'<script[^>]*>(.*?)</script>', conteudo, re.DOTALL | re.IGNORECASE)
         styles = re.findall(r'<style[^>]*>(.*?)</style>', conteudo, re.DOTALL | re.IGNORECASE)
-        
+
         if scripts:
-            info += f"SCRIPTS ENCONTRADOS ({len(scripts)}):\n"
-            for i, script in enumerate(scripts[:3], 1):
-                info += f"  Script {i}: {len(script)} caracteres\n"
-            info += "\n"
-        
+            partes.append(f"SCRIPTS ENCONTRADOS ({len(scripts)}):\n")
+            partes.extend(f"  Script {i}: {len(script)} caracteres\n" for i, script in enumerate(scripts[:3], 1))
+            partes.append("\n")
+
         if styles:
-            info += f"ESTILOS ENCONTRADOS ({len(styles)}):\n"
-            for i, style in enumerate(styles[:3], 1):
-                info += f"  Style {i}: {len(style)} caracteres\n"
-            info += "\n"
-        
-        info += "CÓDIGO COMPLETO:\n"
-        info += "=" * 50 + "\n"
-        info += conteudo
-        
-        return info
+            partes.append(f"ESTILOS ENCONTRADOS ({len(styles)}):\n")
+            partes.extend(f"  Style {i}: {len(style)} caracteres\n" for i, style in enumerate(styles[:3], 1))
+            partes.append("\n")
+
+        partes += _conteudo_completo(conteudo)
+        return "".join(partes)
     except Exception as e:
         st.error(f"Erro ao processar HTML '{arquivo.name}': {e}")
         return None
@@ -198,36 +337,23 @@ def processar_css(arquivo):
         conteudo = extrair_texto_txt(arquivo)
         if conteudo is None:
             return None
-        
-        info = f"ANÁLISE DO CSS: {arquivo.name}\n"
-        info += f"Tamanho: {len(conteudo)} caracteres\n"
-        info += f"Linhas: {len(conteudo.splitlines())}\n\n"
-        
+
+        partes = _cabecalho("ANÁLISE DO CSS", arquivo, conteudo)
+
         # Análise básica de seletores
         seletores = re.findall(r'([^{]+){', conteudo)
         seletores_limpos = [s.strip() for s in seletores if s.strip()]
-        
+
         if seletores_limpos:
-            info += f"SELETORES CSS ({len(seletores_limpos)}):\n"
-            for seletor in seletores_limpos[:20]:  # Máximo 20 seletores
-                info += f"  {seletor}\n"
-            if len(seletores_limpos) > 20:
-                info += f"  ... e mais {len(seletores_limpos) - 20} seletores\n"
-            info += "\n"
-        
+            partes += _lista("SELETORES CSS", seletores_limpos, 20, "seletores")  # Máximo 20 seletores
+
         # Procura por media queries
         media_queries = re.findall(r'@media[^{]+', conteudo)
         if media_queries:
-            info += f"MEDIA QUERIES ({len(media_queries)}):\n"
-            for mq in media_queries:
-                info += f"  {mq.strip()}\n"
-            info += "\n"
-        
-        info += "CÓDIGO COMPLETO:\n"
-        info += "=" * 50 + "\n"
-        info += conteudo
-        
-        return info
+            partes += _lista("MEDIA QUERIES", media_queries)
+
+        partes += _conteudo_completo(conteudo)
+        return "".join(partes)
     except Exception as e:
         st.error(f"Erro ao processar CSS '{arquivo.name}': {e}")
         return None
@@ -238,33 +364,27 @@ def processar_json(arquivo):
         conteudo = extrair_texto_txt(arquivo)
         if conteudo is None:
             return None
-        
+
+        partes = [f"ANÁLISE DO JSON: {arquivo.name}\n", f"Tamanho: {len(conteudo)} caracteres\n"]
+
         # Tenta parsear o JSON
         try:
             dados = json.loads(conteudo)
-            info = f"ANÁLISE DO JSON: {arquivo.name}\n"
-            info += f"Tamanho: {len(conteudo)} caracteres\n"
-            info += f"Válido: SIM\n"
-            info += f"Tipo raiz: {type(dados).__name__}\n"
-            
-            if isinstance(dados, dict):
-                info += f"Chaves principais: {list(dados.keys())}\n"
-            elif isinstance(dados, list):
-                info += f"Elementos na lista: {len(dados)}\n"
-            
-            info += "\nCONTEÚDO JSON:\n"
-            info += "=" * 50 + "\n"
-            info += json.dumps(dados, indent=2, ensure_ascii=False)
-            
-            return info
         except json.JSONDecodeError as e:
-            info = f"ANÁLISE DO JSON: {arquivo.name}\n"
-            info += f"Tamanho: {len(conteudo)} caracteres\n"
-            info += f"Válido: NÃO - Erro: {e}\n\n"
-            info += "CONTEÚDO BRUTO:\n"
-            info += "=" * 50 + "\n"
-            info += conteudo
-            return info
+            partes.append(f"Válido: NÃO - Erro: {e}\n\n")
+            partes += _conteudo_completo(conteudo, "CONTEÚDO BRUTO")
+            return "".join(partes)
+
+        partes.append("Válido: SIM\n")
+        partes.append(f"Tipo raiz: {type(dados).__name__}\n")
+        if isinstance(dados, dict):
+            partes.append(f"Chaves principais: {list(dados.keys())}\n")
+        elif isinstance(dados, list):
+            partes.append(f"Elementos na lista: {len(dados)}\n")
+
+        partes.append("\n")
+        partes += _conteudo_completo(json.dumps(dados, indent=2, ensure_ascii=False), "CONTEÚDO JSON")
+        return "".join(partes)
     except Exception as e:
         st.error(f"Erro ao processar JSON '{arquivo.name}': {e}")
         return None
@@ -275,31 +395,27 @@ def processar_xml(arquivo):
         conteudo = extrair_texto_txt(arquivo)
         if conteudo is None:
             return None
-        
-        info = f"ANÁLISE DO XML: {arquivo.name}\n"
-        info += f"Tamanho: {len(conteudo)} caracteres\n"
-        
+
+        partes = [f"ANÁLISE DO XML: {arquivo.name}\n", f"Tamanho: {len(conteudo)} caracteres\n"]
+
         try:
             root = ET.fromstring(conteudo)
-            info += f"Válido: SIM\n"
-            info += f"Elemento raiz: {root.tag}\n"
-            
-            # Lista elementos filhos
-            children = list(root)
-            if children:
-                info += f"Elementos filhos: {[child.tag for child in children]}\n"
-            
-            info += "\nCONTEÚDO XML:\n"
-            info += "=" * 50 + "\n"
-            info += conteudo
-            
-            return info
         except ET.ParseError as e:
-            info += f"Válido: NÃO - Erro: {e}\n\n"
-            info += "CONTEÚDO BRUTO:\n"
-            info += "=" * 50 + "\n"
-            info += conteudo
-            return info
+            partes.append(f"Válido: NÃO - Erro: {e}\n\n")
+            partes += _conteudo_completo(conteudo, "CONTEÚDO BRUTO")
+            return "".join(partes)
+
+        partes.append("Válido: SIM\n")
+        partes.append(f"Elemento raiz: {root.tag}\n")
+
+        # Lista elementos filhos
+        children = list(root)
+        if children:
+            partes.append(f"Elementos filhos: {[child.tag for child in children]}\n")
+
+        partes.append("\n")
+        partes += _conteudo_completo(conteudo, "CONTEÚDO XML")
+        return "".join(partes)
     except Exception as e:
         st.error(f"Erro ao processar XML '{arquivo.name}': {e}")
         return None
@@ -310,26 +426,21 @@ def processar_codigo_generico(arquivo):
         conteudo = extrair_texto_txt(arquivo)
         if conteudo is None:
             return None
-        
+
         extensao = arquivo.name.split('.')[-1].upper()
-        
-        info = f"ANÁLISE DE CÓDIGO ({extensao}): {arquivo.name}\n"
-        info += f"Tamanho: {len(conteudo)} caracteres\n"
-        info += f"Linhas: {len(conteudo.splitlines())}\n\n"
-        
+
+        partes = _cabecalho(f"ANÁLISE DE CÓDIGO ({extensao})", arquivo, conteudo)
+
         # Análise básica
         linhas = conteudo.splitlines()
         linhas_codigo = [linha for linha in linhas if linha.strip() and not linha.strip().startswith('#')]
         comentarios = [linha for linha in linhas if linha.strip().startswith('#')]
-        
-        info += f"Linhas de código (não comentário): {len(linhas_codigo)}\n"
-        info += f"Linhas de comentário: {len(comentarios)}\n\n"
-        
-        info += "CÓDIGO COMPLETO:\n"
-        info += "=" * 50 + "\n"
-        info += conteudo
-        
-        return info
+
+        partes.append(f"Linhas de código (não comentário): {len(linhas_codigo)}\n")
+        partes.append(f"Linhas de comentário: {len(comentarios)}\n\n")
+
+        partes += _conteudo_completo(conteudo)
+        return "".join(partes)
     except Exception as e:
         st.error(f"Erro ao processar código '{arquivo.name}': {e}")
         return None
@@ -337,16 +448,11 @@ def processar_codigo_generico(arquivo):
 def extrair_texto_docx(arquivo):
     """Extrai texto de um arquivo DOCX."""
     try:
-        doc = Document(arquivo)
-        texto = ""
-        
-        for num_paragrafo, paragrafo in enumerate(doc.paragraphs, 1):
-            if paragrafo.text.strip():
-                texto += f"{paragrafo.text}\n"
-        
+        texto = _juntar(ate_orcamento(segmentos_docx(arquivo), EXTRACAO_MAX_TOKENS))
+
         if not texto.strip():
             return "Documento DOCX processado, mas nenhum texto foi encontrado."
-        
+
         return texto
     except Exception as e:
         st.error(f"Erro ao processar DOCX '{arquivo.name}': {e}")
@@ -355,59 +461,30 @@ def extrair_texto_docx(arquivo):
 def analisar_csv(arquivo):
     """Analisa um arquivo CSV e retorna informações estruturadas."""
     try:
-        # Lê o CSV
-        df = pd.read_csv(arquivo)
-        
-        # Informações básicas
-        info = f"ANÁLISE DO CSV: {arquivo.name}\n"
-        info += f"Dimensões: {df.shape[0]} linhas x {df.shape[1]} colunas\n\n"
-        
-        # Colunas
-        info += "COLUNAS:\n"
-        for col in df.columns:
-            info += f"- {col}\n"
-        
-        # Primeiras linhas
-        info += f"\nPRIMEIRAS 5 LINHAS:\n"
-        info += df.head().to_string()
-        
-        # Informações estatísticas básicas para colunas numéricas
-        numeric_cols = df.select_dtypes(include=['number']).columns
-        if len(numeric_cols) > 0:
-            info += f"\n\nESTATÍSTICAS (colunas numéricas):\n"
-            info += df[numeric_cols].describe().to_string()
-        
-        return info
+        # Lê o CSV em blocos, acumulando as estatísticas
+        perfil = perfil_csv(arquivo)
+
+        partes = [f"ANÁLISE DO CSV: {arquivo.name}\n"]
+        partes += perfil.resumo()
+        return "".join(partes)
     except Exception as e:
         st.error(f"Erro ao analisar CSV '{arquivo.name}': {e}")
         return None
 
 def analisar_excel(arquivo):
-    """Analisa um arquivo Excel e retorna informações estruturadas."""
+    """Analisa todas as planilhas de um arquivo Excel e retorna informações estruturadas."""
     try:
-        # Lê o Excel
-        df = pd.read_excel(arquivo)
-        
-        # Informações básicas
-        info = f"ANÁLISE DO EXCEL: {arquivo.name}\n"
-        info += f"Dimensões: {df.shape[0]} linhas x {df.shape[1]} colunas\n\n"
-        
-        # Colunas
-        info += "COLUNAS:\n"
-        for col in df.columns:
-            info += f"- {col}\n"
-        
-        # Primeiras linhas
-        info += f"\nPRIMEIRAS 5 LINHAS:\n"
-        info += df.head().to_string()
-        
-        # Informações estatísticas básicas para colunas numéricas
-        numeric_cols = df.select_dtypes(include=['number']).columns
-        if len(numeric_cols) > 0:
-            info += f"\n\nESTATÍSTICAS (colunas numéricas):\n"
-            info += df[numeric_cols].describe().to_string()
-        
-        return info
+        perfis = perfis_excel(arquivo)
+
+        partes = [f"ANÁLISE DO EXCEL: {arquivo.name}\n"]
+        for num_planilha, (planilha, perfil) in enumerate(perfis):
+            # Com uma planilha só, o resumo é o mesmo de antes
+            if len(perfis) > 1:
+                if num_planilha:
+                    partes.append("\n\n")
+                partes.append(f"=== PLANILHA: {planilha} ===\n")
+            partes += perfil.resumo()
+        return "".join(partes)
     except Exception as e:
         st.error(f"Erro ao analisar Excel '{arquivo.name}': {e}")
         return None
@@ -0,0 +1,185 @@
+"""Índice vetorial, em memória, dos arquivos anexados a cada conversa.
+
+Arquivos grandes não vão inteiros para o prompt: o texto extraído é dividido
+pelo mesmo splitter da ingestão RAG (`ingest_service.chunk_documents`), os
+trechos são convertidos em embeddings uma única vez por conversa, e cada
+pergunta recebe só os `INDICE_ARQUIVOS_TRECHOS` trechos mais parecidos com
+ela. Arquivos pequenos (até `INDICE_ARQUIVOS_MIN_TOKENS` no total) continuam
+indo inteiros.
+
+Os índices ficam em um cache LRU por conversa, como as memórias de
+`memory_service`, e são descartados quando a conversa fica ociosa. Se os
+embeddings falham (sem chave de API, por exemplo), o texto inteiro segue
+para `montar_prompt`, que escolhe os trechos por palavras-chave.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from services.prompt_service import MARCA_OMISSAO
+from utils.configs import criar_embeddings
+from utils.constants import (
+    INDICE_ARQUIVOS_MIN_TOKENS, INDICE_ARQUIVOS_TRECHOS, INDICE_ARQUIVOS_TAMANHO_TRECHO,
+    INDICE_ARQUIVOS_SOBREPOSICAO
+)
+from utils.tokens import CARACTERES_POR_TOKEN
+
+# Quantas conversas mantêm o índice pronto no processo.
+INDICES_MAXIMOS = 16
+# Índices sem uso há mais que isso são descartados (conversas ociosas).
+INDICE_OCIOSO_S = 30 * 60
+
+
+class IndiceConversa:
+    """Trechos dos arquivos de uma conversa e os seus embeddings normalizados."""
+
+    def __init__(self, modelo_embedding):
+        self.modelo_embedding = modelo_embedding
+        self.embeddings = criar_embeddings(modelo_embedding)
+        self.trechos = []  # (chave, posição no arquivo, texto)
+        self.vetores = np.empty((0, 0), dtype=np.float32)
+        self.chaves = set()
+        self.lock = threading.Lock()
+        self.ultimo_uso = time.monotonic()
+
+    def sincronizar(self, arquivos):
+        """Indexa os arquivos novos e retira os que não estão mais anexados.
+
+        Args:
+
+            arquivos (list[tuple[str, str, str]]): Trios (chave, nome, texto).
+
+        """
+        from langchain.docstore.document import Document
+        from services.ingest_service import chunk_documents
+
+        atuais = {chave for chave, _, _ in arquivos}
+        if self.chaves - atuais:
+            manter = [i for i, (chave, _, _) in enumerate(self.trechos) if chave in atuais]
+            self.trechos = [self.trechos[i] for i in manter]
+            self.vetores = self.vetores[manter]
+            self.chaves &= atuais
+
+        novos = [(chave, nome, texto) for chave, nome, texto in arquivos if chave not in self.chaves]
+        if not novos:
+            return
+        documentos = [Document(page_content=texto, metadata={'chave': chave}) for chave, _, texto in novos]
+        pedacos = chunk_documents(
+            documentos, chunk_size=INDICE_ARQUIVOS_TAMANHO_TRECHO, overlap=INDICE_ARQUIVOS_SOBREPOSICAO
+        )
+        textos = [pedaco.page_content for pedaco in pedacos]
+        self.chaves |= {chave for chave, _, _ in novos}
+        if not textos:
+            return
+        vetores = _normalizar(np.asarray(self.embeddings.embed_documents(textos), dtype=np.float32))
+
+        posicoes = {}
+        for pedaco in pedacos:
+            chave = pedaco.metadata['chave']
+            posicoes[chave] = posicoes.get(chave, -1) + 1
+            self.trechos.append((chave, posicoes[chave], pedaco.page_content))
+        self.vetores = vetores if not len(self.vetores) else np.vstack([self.vetores, vetores])
+
+    def buscar(self, pergunta, k=INDICE_ARQUIVOS_TRECHOS):
+        """Retorna os índices, em `self.trechos`, dos `k` trechos mais parecidos com a pergunta, do mais parecido ao menos."""
+        if not self.trechos:
+            return []
+        consulta = _normalizar(np.asarray([self.embeddings.embed_query(pergunta)], dtype=np.float32))[0]
+        similaridades = self.vetores @ consulta
+        k = min(k, len(similaridades))
+        melhores = np.argpartition(-similaridades, k - 1)[:k]
+        return melhores[np.argsort(-similaridades[melhores], kind='stable')].tolist()
+
+
+def _normalizar(vetores):
+    normas = np.linalg.norm(vetores, axis=1, keepdims=True)
+    normas[normas == 0] = 1.0
+    return vetores / normas
+
+
+_indices = OrderedDict()
+_indices_lock = threading.Lock()
+
+
+def _expirar_ociosos(agora):
+    while _indices:
+        conversa_id, indice = next(iter(_indices.items()))
+        if agora - indice.ultimo_uso < INDICE_OCIOSO_S:
+            break
+        del _indices[conversa_id]
+
+
+def _obter_indice(conversa_id, modelo_embedding):
+    agora = time.monotonic()
+    with _indices_lock:
+        _expirar_ociosos(agora)
+        indice = _indices.get(conversa_id)
+        if indice is None or indice.modelo_embedding != modelo_embedding:
+            indice = IndiceConversa(modelo_embedding)
+            _indices[conversa_id] = indice
+        indice.ultimo_uso = agora
+        _indices.move_to_end(conversa_id)
+        while len(_indices) > INDICES_MAXIMOS:
+            _indices.popitem(last=False)
+        return indice
+
+
+def descartar_indice(conversa_id=None):
+    """Remove o índice de uma conversa do cache, ou todos se `conversa_id` for None."""
+    with _indices_lock:
+        if conversa_id is None:
+            _indices.clear()
+        else:
+            _indices.pop(conversa_id, None)
+
+
+def trechos_relevantes(conversa_id, arquivos, pergunta, modelo_embedding):
+    """Reduz os arquivos da conversa aos trechos relevantes para a pergunta.
+
+    Args:
+
+        conversa_id (int): A conversa dona do índice.
+
+        arquivos (list[tuple[str, str, str]]): Trios (chave, nome, texto) dos
+
+            arquivos da conversa (veja `extracao_service.arquivos_do_turno`).
+
+        pergunta (str): A pergunta do usuário.
+
+        modelo_embedding (str): O modelo de embedding do índice.
+
+    Returns:
+
+        list[tuple[str, str]]: Pares (nome, conteúdo) para `montar_prompt`: os
+
+            arquivos inteiros, se forem pequenos ou se o índice falhar, ou os
+
+            trechos escolhidos de cada arquivo, na ordem do documento.
+
+    """
+    inteiros = [(nome, texto) for _, nome, texto in arquivos]
+    tamanho = sum(len(texto) for _, _, texto in arquivos) // CARACTERES_POR_TOKEN
+    if not conversa_id or tamanho <= INDICE_ARQUIVOS_MIN_TOKENS:
+        return inteiros
+
+    try:
+        indice = _obter_indice(conversa_id, modelo_embedding)
+        with indice.lock:
+            indice.sincronizar(arquivos)
+            escolhidos = [indice.trechos[i] for i in indice.buscar(pergunta)]
+    except Exception as e:
+        logging.warning(f"Índice dos arquivos indisponível, usando o texto inteiro: {e}")
+        descartar_indice(conversa_id)
+        return inteiros
+
+    resultado = []
+    for chave, nome, _ in arquivos:
+        trechos = sorted((posicao, texto) for chave_trecho, posicao, texto in escolhidos if chave_trecho == chave)
+        if trechos:
+            resultado.append((nome, f"\n\n{MARCA_OMISSAO}\n\n".join(texto for _, texto in trechos)))
+        else:
+            resultado.append((nome, f"{MARCA_OMISSAO} (nenhum trecho relevante para a pergunta)"))
+    return resultado
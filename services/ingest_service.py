@@ -3,9 +3,10 @@ import json
 from dotenv import load_dotenv
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import Chroma
-from langchain_openai import OpenAIEmbeddings
 from langchain.docstore.document import Document
 
+from utils.configs import criar_embeddings
+
 # Carrega variáveis do .env
 load_dotenv()
 
@@ -48,7 +49,7 @@ def ingest(data_dir, vector_store_dir, collection_name, chunk_size=400, overlap=
         return len(documents), 0
 
     print(f"🔗 Conectando ao ChromaDB em {vector_store_dir} para a coleção {collection_name}...")
-    embeddings = OpenAIEmbeddings(model=embedding_model)
+    embeddings = criar_embeddings(embedding_model)
     vectordb = Chroma.from_documents(
         documents=chunks,
         embedding=embeddings,
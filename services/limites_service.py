@@ -0,0 +1,196 @@
+"""Limites de taxa compartilhados por todas as sessões do processo.
+
+Cada par provedor/modelo com cota em `config_modelos` tem um `Limitador` com
+dois baldes de fichas: requisições por minuto e tokens por minuto. Antes de
+chamar o provedor, a chamada reserva uma requisição e os tokens estimados;
+se os baldes estão vazios, a reserva fica "devendo" e a chamada espera a
+reposição, o que forma uma fila por ordem de chegada. Ao final, a diferença
+entre os tokens estimados e os reais é acertada.
+
+Se o provedor ainda assim responder 429, o balde de requisições é esvaziado
+(as outras sessões também desaceleram) e a chamada tenta de novo após uma
+espera exponencial com jitter. Os contadores de `estatisticas_limites()`
+mostram o quanto cada cota está saturada.
+"""
+import asyncio
+import random
+import threading
+import time
+
+from utils.configs import cota_modelo
+from utils.constants import ESPERA_MAXIMA_COTA_S, BACKOFF_BASE_S, BACKOFF_MAXIMO_S
+
+
+class CotaEsgotada(RuntimeError):
+    """A espera pela cota do provedor passaria de `ESPERA_MAXIMA_COTA_S`."""
+
+
+class BaldeFichas:
+    """Balde de fichas que se enche a `por_minuto / 60` fichas por segundo."""
+
+    def __init__(self, por_minuto):
+        self.capacidade = float(por_minuto)
+        self.taxa = por_minuto / 60.0
+        self.nivel = self.capacidade
+        self.atualizado = time.monotonic()
+
+    def _repor(self, agora):
+        self.nivel = min(self.capacidade, self.nivel + (agora - self.atualizado) * self.taxa)
+        self.atualizado = agora
+
+    def reservar(self, quantidade, agora):
+        """Retira `quantidade` fichas e retorna quantos segundos faltam para cobri-las."""
+        self._repor(agora)
+        # Um pedido maior que o balde inteiro nunca caberia; conta como o balde cheio.
+        self.nivel -= min(quantidade, self.capacidade)
+        return max(0.0, -self.nivel / self.taxa)
+
+    def devolver(self, quantidade, agora):
+        self._repor(agora)
+        self.nivel = min(self.capacidade, self.nivel + quantidade)
+
+    def esvaziar(self, agora):
+        self._repor(agora)
+        self.nivel = min(self.nivel, 0.0)
+
+    def uso(self, agora):
+        """Fração do balde consumida (acima de 1 quando há reservas esperando)."""
+        self._repor(agora)
+        return 1.0 - self.nivel / self.capacidade
+
+
+class Limitador:
+    """Cotas de requisições e tokens por minuto de um provedor/modelo."""
+
+    def __init__(self, requisicoes_por_minuto, tokens_por_minuto):
+        self.requisicoes = BaldeFichas(requisicoes_por_minuto)
+        self.tokens = BaldeFichas(tokens_por_minuto)
+        self._lock = threading.Lock()
+        self._contadores = {
+            'chamadas': 0, 'esperas': 0, 'espera_total_s': 0.0, 'espera_maxima_s': 0.0,
+            'na_fila': 0, 'recusas_429': 0, 'desistencias': 0,
+        }
+
+    def reservar(self, tokens):
+        """Reserva uma requisição e `tokens` tokens.
+
+        Returns:
+
+            float: Os segundos que a chamada deve esperar antes de ir ao provedor.
+
+        Raises:
+
+            CotaEsgotada: Se a espera passaria de `ESPERA_MAXIMA_COTA_S`; nada
+
+                fica reservado nesse caso.
+
+        """
+        with self._lock:
+            agora = time.monotonic()
+            espera = max(self.requisicoes.reservar(1, agora), self.tokens.reservar(tokens, agora))
+            if espera > ESPERA_MAXIMA_COTA_S:
+                self.requisicoes.devolver(1, agora)
+                self.tokens.devolver(tokens, agora)
+                self._contadores['desistencias'] += 1
+                raise CotaEsgotada(f"A cota do provedor só teria espaço em {espera:.0f}s")
+            self._contadores['chamadas'] += 1
+            if espera > 0:
+                self._contadores['esperas'] += 1
+                self._contadores['espera_total_s'] += espera
+                self._contadores['espera_maxima_s'] = max(self._contadores['espera_maxima_s'], espera)
+        return espera
+
+    def _na_fila(self, delta):
+        with self._lock:
+            self._contadores['na_fila'] += delta
+
+    def aguardar(self, tokens):
+        """Reserva a cota (veja `reservar`) e espera até que ela esteja coberta."""
+        espera = self.reservar(tokens)
+        if espera:
+            self._na_fila(1)
+            try:
+                time.sleep(espera)
+            finally:
+                self._na_fila(-1)
+
+    async def aguardar_async(self, tokens):
+        """Como `aguardar`, sem bloquear o event loop."""
+        espera = self.reservar(tokens)
+        if espera:
+            self._na_fila(1)
+            try:
+                await asyncio.sleep(espera)
+            finally:
+                self._na_fila(-1)
+
+    def acertar(self, estimados, reais):
+        """Devolve (ou cobra) a diferença entre os tokens estimados e os reais."""
+        with self._lock:
+            agora = time.monotonic()
+            if reais < estimados:
+                self.tokens.devolver(estimados - reais, agora)
+            elif reais > estimados:
+                self.tokens.reservar(reais - estimados, agora)
+
+    def registrar_recusa(self):
+        """Conta um 429 e esvazia o balde de requisições, freando todas as sessões."""
+        with self._lock:
+            self._contadores['recusas_429'] += 1
+            self.requisicoes.esvaziar(time.monotonic())
+
+    def estatisticas(self):
+        with self._lock:
+            agora = time.monotonic()
+            return dict(
+                self._contadores,
+                uso_requisicoes=self.requisicoes.uso(agora),
+                uso_tokens=self.tokens.uso(agora),
+            )
+
+
+_limitadores = {}
+_limitadores_lock = threading.Lock()
+
+
+def obter_limitador(provedor, modelo):
+    """Retorna o limitador compartilhado do provedor/modelo, ou None se ele não tem cota."""
+    chave = (provedor, modelo)
+    if chave not in _limitadores:
+        cota = cota_modelo(provedor, modelo)
+        if cota is None:
+            return None
+        with _limitadores_lock:
+            _limitadores.setdefault(chave, Limitador(*cota))
+    return _limitadores[chave]
+
+
+def estatisticas_limites():
+    """Retorna as estatísticas de cada limitador já usado, por (provedor, modelo)."""
+    with _limitadores_lock:
+        limitadores = dict(_limitadores)
+    return {chave: limitador.estatisticas() for chave, limitador in limitadores.items()}
+
+
+def limite_excedido(erro):
+    """Indica se o erro de um provedor é um 429 (limite de taxa)."""
+    if getattr(erro, 'status_code', None) == 429:
+        return True
+    if getattr(getattr(erro, 'response', None), 'status_code', None) == 429:
+        return True
+    return 'RateLimit' in type(erro).__name__ or '429' in str(erro)
+
+
+def espera_backoff(tentativa, erro=None):
+    """Segundos até a próxima tentativa: exponencial com jitter completo.
+
+    Respeita o cabeçalho Retry-After da resposta, quando o erro o traz.
+
+    """
+    espera = random.uniform(0, min(BACKOFF_MAXIMO_S, BACKOFF_BASE_S * 2 ** tentativa))
+    cabecalhos = getattr(getattr(erro, 'response', None), 'headers', None) or {}
+    try:
+        return max(espera, float(cabecalhos.get('retry-after', 0)))
+    except (TypeError, ValueError):
+        return espera
+
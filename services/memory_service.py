@@ -1,5 +1,62 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+
 import streamlit as st
 from langchain.memory import ConversationBufferMemory
+from langchain_core.messages import SystemMessage
+
+from db.db_sqlite import carregar_resumo, salvar_resumo, carregar_mensagens_intervalo
+from utils.configs import janela_contexto
+from utils.constants import (
+    HISTORICO_FRACAO_CONTEXTO, HISTORICO_MAX_TOKENS, HISTORICO_FRACAO_APOS_RESUMO,
+    RESUMO_MAX_PALAVRAS, RESUMO_ENTRADA_MAX_TOKENS
+)
+from utils.tokens import contar_tokens, TOKENS_POR_MENSAGEM
+
+# Quantas conversas mantêm a memória pronta no processo.
+MEMORIAS_MAXIMAS = 32
+# Memórias sem uso há mais que isso são descartadas (sessões ociosas).
+MEMORIA_OCIOSA_S = 30 * 60
+
+
+class _EntradaMemoria:
+    """Memória de uma conversa e a janela do histórico que ela reflete.
+
+    A memória está sincronizada com um histórico quando ele tem o mesmo
+
+    tamanho e começa pela mesma mensagem (o mesmo objeto). Carregar outra
+
+    página ou reabrir a conversa cria objetos novos e força a reconstrução.
+
+    """
+
+    def __init__(self, memoria, historico):
+        self.memoria = memoria
+        self.primeira = historico[0] if historico else None
+        self.total = len(historico)
+        self.ultimo_uso = time.monotonic()
+
+    def sincronizada(self, historico):
+        if len(historico) != self.total:
+            return False
+        return not historico or historico[0] is self.primeira
+
+
+_memorias = OrderedDict()
+_memorias_lock = threading.Lock()
+
+
+def _expirar_ociosas(agora):
+    while _memorias:
+        conversa_id, entrada = next(iter(_memorias.items()))
+        if agora - entrada.ultimo_uso < MEMORIA_OCIOSA_S:
+            break
+        del _memorias[conversa_id]
+
 
 def reconstruir_memoria(historico: list) -> ConversationBufferMemory:
     """Recria o objeto de memória a partir de um histórico em lista."""
@@ -11,13 +68,213 @@ def reconstruir_memoria(historico: list) -> ConversationBufferMemory:
             memoria.chat_memory.add_ai_message(msg['content'])
     return memoria
 
+def obter_memoria(conversa_id, historico: list) -> ConversationBufferMemory:
+    """Retorna a memória da conversa, reconstruindo-a só quando necessário.
+
+    As memórias ficam em um cache LRU por conversa. Enquanto o histórico da
+
+    sessão só cresce por `adicionar_mensagem`, a memória acompanha cada
+
+    mensagem nova e o custo por turno não depende do tamanho da conversa.
+
+    """
+    agora = time.monotonic()
+    with _memorias_lock:
+        _expirar_ociosas(agora)
+        entrada = _memorias.get(conversa_id)
+        if entrada is None or not entrada.sincronizada(historico):
+            entrada = _EntradaMemoria(reconstruir_memoria(historico), historico)
+            _memorias[conversa_id] = entrada
+        entrada.ultimo_uso = agora
+        _memorias.move_to_end(conversa_id)
+        while len(_memorias) > MEMORIAS_MAXIMAS:
+            _memorias.popitem(last=False)
+        return entrada.memoria
+
+def descartar_memoria(conversa_id=None):
+    """Remove a memória de uma conversa do cache, ou todas se `conversa_id` for None."""
+    with _memorias_lock:
+        if conversa_id is None:
+            _memorias.clear()
+        else:
+            _memorias.pop(conversa_id, None)
+
 def get_historico():
     """Retorna o histórico da sessão, inicializando se necessário."""
     if 'historico' not in st.session_state:
         st.session_state['historico'] = []
     return st.session_state['historico']
 
-def adicionar_mensagem(historico: list, role: str, content: str) -> list:
-    """Adiciona uma nova mensagem ao histórico."""
-    historico.append({'role': role, 'content': content})
-    return historico
\ No newline at end of file
+def adicionar_mensagem(historico: list, role: str, content: str, conversa_id=None) -> list:
+    """Adiciona uma nova mensagem ao histórico.
+
+    Com `conversa_id`, a mensagem também é anexada à memória em cache da
+
+    conversa, se ela estiver sincronizada com este histórico.
+
+    """
+    mensagem = {'role': role, 'content': content, 'tokens': contar_tokens(content)}
+    with _memorias_lock:
+        entrada = _memorias.get(conversa_id) if conversa_id is not None else None
+        sincronizada = entrada is not None and entrada.sincronizada(historico)
+        historico.append(mensagem)
+        if sincronizada:
+            if role == 'user':
+                entrada.memoria.chat_memory.add_user_message(content)
+            else:
+                entrada.memoria.chat_memory.add_ai_message(content)
+            if entrada.total == 0:
+                entrada.primeira = mensagem
+            entrada.total += 1
+    return historico
+
+
+def tokens_mensagem(mensagem):
+    """Tokens que uma mensagem do histórico ocupa no prompt."""
+    if mensagem.get('tokens') is None:
+        mensagem['tokens'] = contar_tokens(mensagem['content'])
+    return mensagem['tokens'] + TOKENS_POR_MENSAGEM
+
+def orcamento_historico(provedor, modelo):
+    """Tokens reservados ao histórico (resumo incluído) para um modelo."""
+    return min(int(janela_contexto(provedor, modelo) * HISTORICO_FRACAO_CONTEXTO), HISTORICO_MAX_TOKENS)
+
+def _janela_recente(mensagens, orcamento):
+    """Índice da mensagem mais antiga do sufixo de `mensagens` que cabe no orçamento."""
+    total = 0
+    inicio = len(mensagens)
+    while inicio > 0:
+        custo = tokens_mensagem(mensagens[inicio - 1])
+        if total + custo > orcamento:
+            break
+        total += custo
+        inicio -= 1
+    return inicio
+
+@lru_cache(maxsize=1)
+def _prompt_resumo():
+    caminho = Path(__file__).parent.parent / 'prompts' / 'resumo_historico.txt'
+    with open(caminho, 'r', encoding='utf-8') as f:
+        return f.read()
+
+def _atualizar_resumo(conversa_id, resumo, ate_mensagem_id, chat):
+    """Incorpora ao resumo as mensagens até `ate_mensagem_id` e grava no banco.
+
+    Só as mensagens posteriores ao resumo atual são enviadas ao modelo, e no
+
+    máximo `RESUMO_ENTRADA_MAX_TOKENS` delas (as mais recentes). Em caso de
+
+    erro o resumo anterior é mantido.
+
+    """
+    novas = carregar_mensagens_intervalo(
+        conversa_id, resumo['ate_mensagem_id'], ate_mensagem_id, RESUMO_ENTRADA_MAX_TOKENS
+    )
+    if not novas:
+        return resumo
+    transcricao = '\n\n'.join(
+        f"{'Usuária' if m['role'] == 'user' else 'Assistente'}: {m['content']}" for m in novas
+    )
+    prompt = _prompt_resumo().format(
+        limite_palavras=RESUMO_MAX_PALAVRAS,
+        resumo_anterior=resumo['resumo'] or '(nenhum)',
+        transcricao=transcricao,
+    )
+    try:
+        texto = chat.invoke(prompt).content.strip()
+    except Exception as e:
+        logging.error(f"Erro ao resumir histórico da conversa {conversa_id}: {e}")
+        return resumo
+    novo = {'ate_mensagem_id': ate_mensagem_id, 'resumo': texto, 'tokens': contar_tokens(texto)}
+    salvar_resumo(conversa_id, **novo)
+    return novo
+
+def montar_historico(conversa_id, historico: list, memoria: ConversationBufferMemory, orcamento: int, chat=None, limite=None):
+    """Seleciona o histórico a enviar ao modelo dentro de um orçamento de tokens.
+
+    A última mensagem de `historico` é a entrada atual e não entra no
+
+    histórico. Das anteriores, vão as mais recentes que cabem no orçamento;
+
+    as mais antigas, inclusive as que não foram carregadas na sessão, são
+
+    representadas por um resumo mantido em `resumos_conversa`.
+
+    Ao estourar o orçamento, a janela recua para `HISTORICO_FRACAO_APOS_RESUMO`
+
+    dele e as mensagens que saíram são resumidas com `chat`. Sem `chat`, ou se
+
+    o resumo falhar, as mensagens excedentes são apenas omitidas.
+
+    Args:
+
+        conversa_id (int): O ID da conversa.
+
+        historico (list[dict]): O histórico da sessão, incluindo a entrada atual.
+
+        memoria (ConversationBufferMemory): A memória sincronizada com `historico`
+
+            (veja `obter_memoria`).
+
+        orcamento (int): Tokens disponíveis para resumo e mensagens.
+
+        chat: Modelo de chat do LangChain usado para resumir.
+
+        limite (int | None): Tokens de fato disponíveis neste turno, quando
+
+            outras fontes de contexto ocupam parte de `orcamento`. O que não
+
+            couber é omitido só neste turno, sem antecipar o resumo.
+
+    Returns:
+
+        list[BaseMessage]: As mensagens para o `chat_history` do prompt.
+
+    """
+    anteriores = historico[:-1]
+    mensagens = memoria.buffer_as_messages[:len(anteriores)]
+    resumo = carregar_resumo(conversa_id) or {'ate_mensagem_id': 0, 'resumo': '', 'tokens': 0}
+
+    def inicio_nao_resumido(ate_id):
+        # Mensagens ainda sem ID (na fila de escrita) nunca estão no resumo.
+        inicio = 0
+        while inicio < len(anteriores) and anteriores[inicio].get('id') and anteriores[inicio]['id'] <= ate_id:
+            inicio += 1
+        return inicio
+
+    inicio = inicio_nao_resumido(resumo['ate_mensagem_id'])
+    novo_ate = resumo['ate_mensagem_id']
+    # Mensagens anteriores à janela carregada na sessão precisam estar no resumo.
+    if anteriores and anteriores[0].get('id'):
+        novo_ate = max(novo_ate, anteriores[0]['id'] - 1)
+    # Se o que não foi resumido não cabe, a janela recua e o excedente é resumido.
+    if sum(tokens_mensagem(m) for m in anteriores[inicio:]) + resumo['tokens'] > orcamento:
+        alvo = int(orcamento * HISTORICO_FRACAO_APOS_RESUMO)
+        corte = inicio + _janela_recente(anteriores[inicio:], alvo)
+        ids_fora = [m['id'] for m in anteriores[inicio:corte] if m.get('id')]
+        if ids_fora:
+            novo_ate = max(novo_ate, max(ids_fora))
+
+    if chat is not None and novo_ate > resumo['ate_mensagem_id']:
+        resumo = _atualizar_resumo(conversa_id, resumo, novo_ate, chat)
+        inicio = inicio_nao_resumido(resumo['ate_mensagem_id'])
+
+    # Limite rígido: nunca envia mais que o orçamento, mesmo sem resumo.
+    limite = orcamento if limite is None else min(limite, orcamento)
+    incluir_resumo = bool(resumo['resumo']) and resumo['tokens'] <= limite
+    disponivel = max(limite - (resumo['tokens'] if incluir_resumo else 0), 0)
+    inicio += _janela_recente(anteriores[inicio:], disponivel)
+
+    selecionadas = mensagens[inicio:]
+    if incluir_resumo:
+        selecionadas = [SystemMessage(content=f"Resumo da conversa até aqui:\n{resumo['resumo']}")] + selecionadas
+    return selecionadas
+
+def demanda_historico(conversa_id, historico: list, orcamento: int) -> int:
+    """Tokens que `montar_historico` usaria com o orçamento inteiro (no máximo `orcamento`)."""
+    resumo = carregar_resumo(conversa_id) or {'ate_mensagem_id': 0, 'tokens': 0}
+    pendentes = [
+        m for m in historico[:-1]
+        if not (m.get('id') and m['id'] <= resumo['ate_mensagem_id'])
+    ]
+    return min(resumo['tokens'] + sum(tokens_mensagem(m) for m in pendentes), orcamento)
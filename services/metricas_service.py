@@ -0,0 +1,91 @@
+"""Instrumentação dos turnos de chat.
+
+Um `MedicaoTurno` acompanha um turno do início ao fim: cada etapa é medida
+com `etapa(nome)`, o stream da resposta passa por `medir_stream` para obter o
+tempo até o primeiro token e a duração da geração, e `registrar_turno`
+enfileira tudo para `db.metricas`. Os nomes das etapas são as chaves de `ROTULOS_ETAPAS`.
+"""
+import time
+from contextlib import contextmanager
+
+from db.metricas import registrar_metricas, medias_recentes
+from utils.constants import ROTULOS_ETAPAS, METRICAS_TURNOS_RECENTES
+from utils.tokens import contar_tokens
+
+
+class MedicaoTurno:
+    """Tempos, em segundos, das etapas de um turno de chat."""
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.etapas = {}
+        self.ttft = None
+        self.tokens_saida = None
+        self.tokens_por_s = None
+
+    @contextmanager
+    def etapa(self, nome):
+        """Mede o bloco como a etapa `nome`, somando com medições anteriores dela."""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.adicionar(nome, time.perf_counter() - inicio)
+
+    def adicionar(self, nome, segundos):
+        """Soma `segundos` ao tempo da etapa `nome`."""
+        self.etapas[nome] = self.etapas.get(nome, 0.0) + segundos
+
+    def medir_stream(self, fluxo):
+        """Repassa o stream da resposta, medindo o TTFT e a etapa de geração."""
+        inicio = time.perf_counter()
+        try:
+            for pedaco in fluxo:
+                if self.ttft is None:
+                    self.ttft = time.perf_counter() - inicio
+                yield pedaco
+        finally:
+            self.adicionar('geracao', time.perf_counter() - inicio)
+
+    def contar_resposta(self, resposta):
+        """Conta os tokens da resposta e calcula a vazão após o primeiro token."""
+        self.tokens_saida = contar_tokens(resposta)
+        decodificacao = self.etapas.get('geracao', 0.0) - (self.ttft or 0.0)
+        if self.tokens_saida and decodificacao > 0:
+            self.tokens_por_s = self.tokens_saida / decodificacao
+
+    def total(self):
+        """Tempo desde o início do turno, sem a gravação em segundo plano."""
+        return time.perf_counter() - self.inicio
+
+    def medidas(self, relatorio=None):
+        """Retorna as medidas no formato das colunas de `metricas_turno`.
+
+        Args:
+
+            relatorio (dict | None): O relatório de `transmitir_resposta`, de
+
+                onde vêm as marcas de cache e de provedor reserva.
+
+        """
+        relatorio = relatorio or {}
+        medidas = {f'{nome}_s': self.etapas[nome] for nome in ROTULOS_ETAPAS if nome in self.etapas}
+        medidas.update(
+            total_s=self.total(),
+            ttft_s=self.ttft,
+            tokens_saida=self.tokens_saida,
+            tokens_por_s=self.tokens_por_s,
+            cache=int(bool(relatorio.get('cache'))),
+            reserva=int(bool(relatorio.get('reserva'))),
+        )
+        return medidas
+
+
+def registrar_turno(conversa_id, provedor, modelo, medidas):
+    """Enfileira a gravação das medidas de um turno (veja `MedicaoTurno.medidas`)."""
+    return registrar_metricas(conversa_id, provedor, modelo, medidas)
+
+
+def medias_turnos(limite=METRICAS_TURNOS_RECENTES):
+    """Retorna as médias das métricas dos turnos recentes."""
+    return medias_recentes(limite)
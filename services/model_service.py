@@ -1,18 +1,69 @@
 import streamlit as st
 import os
 from pathlib import Path
-from langchain.prompts import ChatPromptTemplate
-from utils.configs import config_modelos
+from services.prompt_service import janela_utilizada
+from utils.configs import config_modelos, carregar_classe_chat, provedor_local, cota_modelo, parametro_janela
+
+
+@st.cache_resource
+def carregar_chat_cache(provedor, modelo):
+    """Carrega e cacheia o modelo de chat, sem prompt de sistema.
+
+    Usado diretamente para tarefas auxiliares, como resumir o histórico.
+
+    Modelos com cota em `config_modelos` passam pelo limitador de taxa do
+
+    processo (veja `services.limites_service`).
+
+    """
+    try:
+        if provedor not in config_modelos:
+            st.error(f"Provedor '{provedor}' não configurado.")
+            return None
+
+        chat_class = carregar_classe_chat(provedor)
+
+        # O servidor precisa da mesma janela que o orçamento do prompt supõe.
+        argumentos = {}
+        parametro = parametro_janela(provedor)
+        if parametro:
+            argumentos[parametro] = janela_utilizada(provedor, modelo)
+
+        if provedor_local(provedor):
+            chat = chat_class(model=modelo, **argumentos)
+        else:
+            api_key = os.getenv(f"{provedor.upper()}_API_KEY")
+            if not api_key:
+                st.error(f"API key para {provedor} não encontrada no ambiente.")
+                return None
+            chat = chat_class(model=modelo, api_key=api_key, temperature=1, **argumentos)
+
+        if cota_modelo(provedor, modelo) is None:
+            return chat
+        from services.modelos_limitados import ChatLimitado
+        return ChatLimitado(chat=chat, provedor=provedor, modelo=modelo)
+
+    except Exception as e:
+        st.error(f"Erro ao carregar modelo {provedor}/{modelo}: {str(e)}")
+        return None
+
+
+@st.cache_resource
+def ler_prompt_sistema():
+    """Lê (uma vez por processo) o prompt de sistema do arquivo externo."""
+    prompt_path = Path(__file__).parent.parent / 'prompts' / 'system_prompt.txt'
+    with open(prompt_path, 'r', encoding='utf-8') as f:
+        return f.read()
 
 
 @st.cache_resource
 def carregar_modelo_cache(provedor, modelo):
     """Carrega e cacheia o modelo de linguagem."""
     try:
+        from langchain.prompts import ChatPromptTemplate
+
         # Carrega o prompt do arquivo externo
-        prompt_path = Path(__file__).parent.parent / 'prompts' / 'system_prompt.txt'
-        with open(prompt_path, 'r', encoding='utf-8') as f:
-            system_prompt = f.read()
+        system_prompt = ler_prompt_sistema()
 
         template = ChatPromptTemplate.from_messages([
             ('system', system_prompt),
@@ -20,23 +71,12 @@ def carregar_modelo_cache(provedor, modelo):
             ('user', '{input}')
         ])
 
-        if provedor not in config_modelos:
-            st.error(f"Provedor '{provedor}' não configurado.")
+        chat = carregar_chat_cache(provedor, modelo)
+        if chat is None:
             return None
 
-        chat_class = config_modelos[provedor]['chat']
-        
-        if provedor == 'Ollama':
-            chat = chat_class(model=modelo)
-        else:
-            api_key = os.getenv(f"{provedor.upper()}_API_KEY")
-            if not api_key:
-                st.error(f"API key para {provedor} não encontrada no ambiente.")
-                return None
-            chat = chat_class(model=modelo, api_key=api_key, temperature=1)
-        
         return template | chat
 
     except Exception as e:
         st.error(f"Erro ao carregar modelo {provedor}/{modelo}: {str(e)}")
-        return None
\ No newline at end of file
+        return None
@@ -0,0 +1,202 @@
+"""Modelos de chat e embeddings que respeitam as cotas de `limites_service`.
+
+`ChatLimitado` envolve o modelo de chat de um provedor e continua sendo um
+modelo do LangChain, então compõe com o prompt (`template | chat`) como
+antes: o stream da resposta, o resumo do histórico e as chamadas
+assíncronas passam todos pelo limitador. `LLMLimitado` faz o mesmo para os
+modelos de completação do agente RAG (condensação da pergunta e resposta), e
+`EmbeddingsLimitados` para os embeddings da ingestão e das consultas RAG.
+
+Um 429 só é repetido antes do primeiro pedaço de um stream; depois disso a
+resposta já começou a ser mostrada e o erro é propagado.
+"""
+import asyncio
+import time
+from typing import Any
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.language_models.llms import LLM
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from services.limites_service import obter_limitador, limite_excedido, espera_backoff
+from services.prompt_service import tokens_mensagens
+from utils.constants import TOKENS_SAIDA_ESTIMADOS, TENTATIVAS_LIMITE_TAXA
+from utils.tokens import contar_tokens
+
+
+def _texto(mensagem):
+    return mensagem.content if isinstance(mensagem.content, str) else ''
+
+
+def _ultima(tentativa, erro):
+    """Indica se o erro deve ser propagado em vez de uma nova tentativa."""
+    return tentativa == TENTATIVAS_LIMITE_TAXA or not limite_excedido(erro)
+
+
+class ChatLimitado(BaseChatModel):
+    """Modelo de chat que passa pelo limitador do provedor/modelo."""
+
+    chat: Any
+    provedor: str
+    modelo: str
+
+    @property
+    def _llm_type(self):
+        return f'limitado-{self.chat._llm_type}'
+
+    def _cota(self, messages):
+        entrada = tokens_mensagens(messages)
+        return obter_limitador(self.provedor, self.modelo), entrada, entrada + TOKENS_SAIDA_ESTIMADOS
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        limitador, entrada, estimados = self._cota(messages)
+        for tentativa in range(TENTATIVAS_LIMITE_TAXA + 1):
+            limitador.aguardar(estimados)
+            partes = []
+            try:
+                for mensagem in self.chat.stream(messages, stop=stop, **kwargs):
+                    partes.append(_texto(mensagem))
+                    pedaco = ChatGenerationChunk(message=mensagem)
+                    if run_manager:
+                        run_manager.on_llm_new_token(partes[-1], chunk=pedaco)
+                    yield pedaco
+            except Exception as e:
+                if partes or _ultima(tentativa, e):
+                    raise
+                limitador.registrar_recusa()
+                time.sleep(espera_backoff(tentativa, e))
+                continue
+            finally:
+                limitador.acertar(estimados, entrada + contar_tokens(''.join(partes)))
+            return
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        limitador, entrada, estimados = self._cota(messages)
+        for tentativa in range(TENTATIVAS_LIMITE_TAXA + 1):
+            await limitador.aguardar_async(estimados)
+            partes = []
+            try:
+                async for mensagem in self.chat.astream(messages, stop=stop, **kwargs):
+                    partes.append(_texto(mensagem))
+                    pedaco = ChatGenerationChunk(message=mensagem)
+                    if run_manager:
+                        await run_manager.on_llm_new_token(partes[-1], chunk=pedaco)
+                    yield pedaco
+            except Exception as e:
+                if partes or _ultima(tentativa, e):
+                    raise
+                limitador.registrar_recusa()
+                await asyncio.sleep(espera_backoff(tentativa, e))
+                continue
+            finally:
+                limitador.acertar(estimados, entrada + contar_tokens(''.join(partes)))
+            return
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        limitador, entrada, estimados = self._cota(messages)
+        for tentativa in range(TENTATIVAS_LIMITE_TAXA + 1):
+            limitador.aguardar(estimados)
+            try:
+                resposta = self.chat.invoke(messages, stop=stop, **kwargs)
+            except Exception as e:
+                limitador.acertar(estimados, entrada)
+                if _ultima(tentativa, e):
+                    raise
+                limitador.registrar_recusa()
+                time.sleep(espera_backoff(tentativa, e))
+                continue
+            limitador.acertar(estimados, entrada + contar_tokens(_texto(resposta)))
+            return ChatResult(generations=[ChatGeneration(message=resposta)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        limitador, entrada, estimados = self._cota(messages)
+        for tentativa in range(TENTATIVAS_LIMITE_TAXA + 1):
+            await limitador.aguardar_async(estimados)
+            try:
+                resposta = await self.chat.ainvoke(messages, stop=stop, **kwargs)
+            except Exception as e:
+                limitador.acertar(estimados, entrada)
+                if _ultima(tentativa, e):
+                    raise
+                limitador.registrar_recusa()
+                await asyncio.sleep(espera_backoff(tentativa, e))
+                continue
+            limitador.acertar(estimados, entrada + contar_tokens(_texto(resposta)))
+            return ChatResult(generations=[ChatGeneration(message=resposta)])
+
+
+class LLMLimitado(LLM):
+    """Modelo de completação (texto para texto) que passa pelo limitador do provedor/modelo."""
+
+    llm: Any
+    provedor: str
+    modelo: str
+
+    @property
+    def _llm_type(self):
+        return f'limitado-{self.llm._llm_type}'
+
+    def _cota(self, prompt):
+        entrada = contar_tokens(prompt)
+        return obter_limitador(self.provedor, self.modelo), entrada, entrada + TOKENS_SAIDA_ESTIMADOS
+
+    def _call(self, prompt, stop=None, run_manager=None, **kwargs):
+        limitador, entrada, estimados = self._cota(prompt)
+        for tentativa in range(TENTATIVAS_LIMITE_TAXA + 1):
+            limitador.aguardar(estimados)
+            try:
+                resposta = self.llm.invoke(prompt, stop=stop, **kwargs)
+            except Exception as e:
+                limitador.acertar(estimados, entrada)
+                if _ultima(tentativa, e):
+                    raise
+                limitador.registrar_recusa()
+                time.sleep(espera_backoff(tentativa, e))
+                continue
+            limitador.acertar(estimados, entrada + contar_tokens(resposta))
+            return resposta
+
+    async def _acall(self, prompt, stop=None, run_manager=None, **kwargs):
+        limitador, entrada, estimados = self._cota(prompt)
+        for tentativa in range(TENTATIVAS_LIMITE_TAXA + 1):
+            await limitador.aguardar_async(estimados)
+            try:
+                resposta = await self.llm.ainvoke(prompt, stop=stop, **kwargs)
+            except Exception as e:
+                limitador.acertar(estimados, entrada)
+                if _ultima(tentativa, e):
+                    raise
+                limitador.registrar_recusa()
+                await asyncio.sleep(espera_backoff(tentativa, e))
+                continue
+            limitador.acertar(estimados, entrada + contar_tokens(resposta))
+            return resposta
+
+
+class EmbeddingsLimitados(Embeddings):
+    """Embeddings que passam pelo limitador do provedor/modelo."""
+
+    def __init__(self, embeddings, provedor, modelo):
+        self.embeddings = embeddings
+        self.provedor = provedor
+        self.modelo = modelo
+
+    def _chamar(self, funcao, textos):
+        limitador = obter_limitador(self.provedor, self.modelo)
+        tokens = sum(contar_tokens(texto) for texto in textos)
+        for tentativa in range(TENTATIVAS_LIMITE_TAXA + 1):
+            limitador.aguardar(tokens)
+            try:
+                return funcao()
+            except Exception as e:
+                if _ultima(tentativa, e):
+                    raise
+                limitador.registrar_recusa()
+                time.sleep(espera_backoff(tentativa, e))
+
+    def embed_documents(self, texts):
+        return self._chamar(lambda: self.embeddings.embed_documents(texts), texts)
+
+    def embed_query(self, text):
+        return self._chamar(lambda: self.embeddings.embed_query(text), [text])
@@ -0,0 +1,256 @@
+"""Perfil de planilhas grandes lidas em partes.
+
+`PerfilTabela` recebe uma tabela em blocos (DataFrames com as mesmas colunas)
+e acumula, sem guardar as linhas: a contagem, as primeiras linhas, e para as
+colunas numéricas contagem, média, desvio padrão (método de Chan), mínimo e
+máximo exatos. Os quartis vêm de uma amostra uniforme das linhas (amostragem
+por reservatório, com chaves aleatórias), exatos enquanto a tabela cabe na
+amostra. O resumo tem o mesmo formato de `head()` e `describe()` da leitura
+completa.
+
+`perfil_csv` lê o CSV com `read_csv` em blocos dimensionados pela memória de
+cada linha; `perfis_excel` lê todas as planilhas com o openpyxl em modo
+somente leitura. As duas param no prazo de `PERFIL_MAX_SEGUNDOS`, e o resumo
+indica que as estatísticas cobrem só as linhas lidas.
+"""
+import math
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.constants import (
+    PERFIL_MAX_SEGUNDOS, PERFIL_MEMORIA_BLOCO_BYTES, PERFIL_LINHAS_AMOSTRA, PERFIL_LINHAS_SONDA
+)
+
+QUANTIS = (0.25, 0.5, 0.75)
+LINHAS_INICIAIS = 5
+
+
+class PerfilTabela:
+    """Estatísticas de uma tabela acumuladas bloco a bloco."""
+
+    def __init__(self, tamanho_amostra=PERFIL_LINHAS_AMOSTRA, semente=0):
+        self.colunas = None
+        self.linhas = 0
+        self.inicio = None
+        self.numericas = {}  # coluna -> [contagem, média, M2, mínimo, máximo]
+        self.flutuantes = set()
+        self.tamanho_amostra = tamanho_amostra
+        self.amostra = None
+        self.chaves = np.empty(0)
+        self.rng = np.random.default_rng(semente)
+        self.interrompido_em = None
+
+    def adicionar(self, bloco):
+        """Acumula um bloco de linhas da tabela."""
+        if self.colunas is None:
+            self.colunas = list(bloco.columns)
+            self.numericas = {coluna: [0, 0.0, 0.0, math.inf, -math.inf]
+                              for coluna in bloco.select_dtypes(include=['number']).columns}
+        if self.inicio is None:
+            self.inicio = bloco.head(LINHAS_INICIAIS)
+        elif len(self.inicio) < LINHAS_INICIAIS:
+            self.inicio = pd.concat([self.inicio, bloco.head(LINHAS_INICIAIS - len(self.inicio))])
+        self.linhas += len(bloco)
+
+        # Como na leitura completa, a coluna só é numérica se for em todos os
+        # blocos; um bloco em que ela está toda vazia não conta, e valores
+        # vazios fazem uma coluna de inteiros virar float.
+        numericas = set(bloco.select_dtypes(include=['number']).columns)
+        for coluna in list(self.numericas):
+            valores = bloco[coluna]
+            if coluna not in numericas and valores.notna().any():
+                del self.numericas[coluna]
+            elif pd.api.types.is_float_dtype(valores.dtype) or valores.isna().any():
+                self.flutuantes.add(coluna)
+        if not self.numericas or not len(bloco):
+            return
+
+        dados = bloco[list(self.numericas)].apply(pd.to_numeric)
+        for coluna, estado in self.numericas.items():
+            valores = dados[coluna]
+            n = int(valores.count())
+            if not n:
+                continue
+            media = float(valores.mean())
+            m2 = float(valores.var(ddof=0)) * n
+            total = estado[0] + n
+            delta = media - estado[1]
+            estado[1] += delta * n / total
+            estado[2] += m2 + delta * delta * estado[0] * n / total
+            estado[0] = total
+            estado[3] = min(estado[3], float(valores.min()))
+            estado[4] = max(estado[4], float(valores.max()))
+        self._amostrar(dados)
+
+    def _amostrar(self, dados):
+        """Mantém as `tamanho_amostra` linhas de menor chave aleatória (amostra uniforme)."""
+        chaves = self.rng.random(len(dados))
+        if self.amostra is None:
+            amostra, todas = dados, chaves
+        else:
+            amostra = pd.concat([self.amostra[list(dados.columns)], dados], ignore_index=True)
+            todas = np.concatenate([self.chaves, chaves])
+        if len(todas) > self.tamanho_amostra:
+            manter = np.argpartition(todas, self.tamanho_amostra)[:self.tamanho_amostra]
+            amostra, todas = amostra.iloc[manter], todas[manter]
+        self.amostra = amostra.reset_index(drop=True)
+        self.chaves = todas
+
+    def primeiras_linhas(self):
+        """As primeiras linhas, com os tipos que a leitura completa daria."""
+        inicio = self.inicio if self.inicio is not None else pd.DataFrame(columns=self.colunas or [])
+        for coluna in self.flutuantes & set(self.numericas):
+            if pd.api.types.is_integer_dtype(inicio[coluna].dtype):
+                inicio = inicio.astype({coluna: 'float64'})
+        return inicio
+
+    def descricao(self):
+        """O equivalente de `describe()` das colunas numéricas, ou None se não houver."""
+        if not self.numericas:
+            return None
+        colunas = {}
+        for coluna, (n, media, m2, minimo, maximo) in self.numericas.items():
+            if n and self.amostra is not None:
+                quartis = self.amostra[coluna].dropna().quantile(list(QUANTIS)).tolist()
+            else:
+                quartis = [math.nan] * len(QUANTIS)
+            colunas[coluna] = [
+                float(n),
+                media if n else math.nan,
+                math.sqrt(m2 / (n - 1)) if n > 1 else math.nan,
+                minimo if n else math.nan,
+                *quartis,
+                maximo if n else math.nan,
+            ]
+        return pd.DataFrame(colunas, index=['count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max'])
+
+    def amostrado(self):
+        """Indica se os quartis vêm de uma amostra (a tabela não coube inteira nela)."""
+        return self.amostra is not None and self.linhas > self.tamanho_amostra
+
+    def resumo(self):
+        """As partes do resumo a partir de "Dimensões", no formato da análise completa."""
+        colunas = self.colunas or []
+        partes = [f"Dimensões: {self.linhas} linhas x {len(colunas)} colunas\n"]
+        if self.interrompido_em is not None:
+            partes.append(f"Leitura interrompida após {self.interrompido_em:.0f}s: "
+                          f"os dados abaixo cobrem só as linhas lidas.\n")
+        partes.append("\n")
+
+        partes.append("COLUNAS:\n")
+        partes.extend(f"- {coluna}\n" for coluna in colunas)
+
+        partes.append("\nPRIMEIRAS 5 LINHAS:\n")
+        partes.append(self.primeiras_linhas().to_string())
+
+        descricao = self.descricao()
+        if descricao is not None:
+            partes.append("\n\nESTATÍSTICAS (colunas numéricas):\n")
+            partes.append(descricao.to_string())
+            if self.amostrado():
+                partes.append(f"\n(quartis estimados em uma amostra de {self.tamanho_amostra} linhas)")
+        return partes
+
+
+def _linhas_por_bloco(bloco):
+    """Linhas que cabem em `PERFIL_MEMORIA_BLOCO_BYTES`, pela memória do bloco de sonda."""
+    if not len(bloco):
+        return PERFIL_LINHAS_SONDA
+    por_linha = max(1, int(bloco.memory_usage(deep=True).sum() / len(bloco)))
+    return max(PERFIL_LINHAS_SONDA, PERFIL_MEMORIA_BLOCO_BYTES // por_linha)
+
+
+def perfil_csv(arquivo, max_segundos=PERFIL_MAX_SEGUNDOS):
+    """Lê um CSV em blocos e retorna o seu `PerfilTabela`."""
+    perfil = PerfilTabela()
+    inicio = time.perf_counter()
+    with pd.read_csv(arquivo, chunksize=PERFIL_LINHAS_SONDA) as leitor:
+        tamanho = None
+        while True:
+            try:
+                bloco = leitor.get_chunk(tamanho)
+            except StopIteration:
+                break
+            perfil.adicionar(bloco)
+            if tamanho is None:
+                tamanho = _linhas_por_bloco(bloco)
+            decorrido = time.perf_counter() - inicio
+            if decorrido > max_segundos:
+                perfil.interrompido_em = decorrido
+                break
+    if perfil.colunas is None:
+        # CSV só com o cabeçalho: read_csv em blocos não gera nenhum.
+        arquivo.seek(0)
+        perfil.adicionar(pd.read_csv(arquivo, nrows=0))
+    return perfil
+
+
+def _nomes_colunas(cabecalho):
+    """Nomes das colunas como o `read_excel` os daria (células vazias viram 'Unnamed: n')."""
+    return [f"Unnamed: {n}" if valor is None else valor for n, valor in enumerate(cabecalho)]
+
+
+def perfis_excel(arquivo, max_segundos=PERFIL_MAX_SEGUNDOS):
+    """Lê todas as planilhas de um Excel em blocos.
+
+    Returns:
+
+        list[tuple[str, PerfilTabela]]: O nome e o perfil de cada planilha, na
+
+            ordem do arquivo.
+
+    """
+    nome = getattr(arquivo, 'name', '').lower()
+    if nome.endswith('.xls'):
+        # O formato antigo não tem leitura em streaming: lê cada planilha inteira.
+        perfis = []
+        for planilha, tabela in pd.read_excel(arquivo, sheet_name=None).items():
+            perfil = PerfilTabela()
+            perfil.adicionar(tabela)
+            perfis.append((planilha, perfil))
+        return perfis
+
+    from openpyxl import load_workbook
+
+    inicio = time.perf_counter()
+    livro = load_workbook(arquivo, read_only=True, data_only=True)
+    perfis = []
+    try:
+        for planilha in livro.worksheets:
+            perfil = PerfilTabela()
+            perfis.append((planilha.title, perfil))
+            linhas = planilha.iter_rows(values_only=True)
+            cabecalho = next(linhas, None)
+            if cabecalho is None:
+                perfil.adicionar(pd.DataFrame())
+                continue
+            colunas = _nomes_colunas(cabecalho)
+            tamanho = PERFIL_LINHAS_SONDA
+            bloco, vazias = [], []
+            for linha in linhas:
+                # Linhas vazias no fim da planilha não contam, como no read_excel.
+                if all(valor is None for valor in linha):
+                    vazias.append(linha)
+                    continue
+                bloco.extend(vazias)
+                vazias = []
+                bloco.append(linha)
+                if len(bloco) >= tamanho:
+                    tabela = pd.DataFrame(bloco, columns=colunas)
+                    perfil.adicionar(tabela)
+                    if tamanho == PERFIL_LINHAS_SONDA:
+                        tamanho = _linhas_por_bloco(tabela)
+                    bloco = []
+                    decorrido = time.perf_counter() - inicio
+                    if decorrido > max_segundos:
+                        perfil.interrompido_em = decorrido
+                        break
+            if bloco or perfil.colunas is None:
+                perfil.adicionar(pd.DataFrame(bloco, columns=colunas))
+            if perfil.interrompido_em is not None:
+                break
+    finally:
+        livro.close()
+    return perfis
@@ -0,0 +1,340 @@
+"""Montagem do prompt dentro do orçamento de tokens do modelo.
+
+O texto dos arquivos carregados, a resposta da base de conhecimento (RAG) e o
+histórico disputam a mesma janela de contexto. Cada fonte é medida em tokens,
+o orçamento do modelo (veja `utils.configs.janela_contexto`) é dividido entre
+elas segundo `PRIORIDADES_CONTEXTO` e, quando uma fonte não cabe na sua parte,
+só os trechos mais relevantes para a pergunta são mantidos. O prompt de sistema
+e a pergunta vão sempre inteiros, e o histórico tem uma parte mínima garantida.
+"""
+import logging
+import math
+import re
+import unicodedata
+from collections import Counter
+
+from utils.configs import janela_contexto
+from utils.constants import (
+    PROMPT_MAX_TOKENS, RESERVA_RESPOSTA_FRACAO, RESERVA_RESPOSTA_TOKENS,
+    HISTORICO_MIN_FRACAO_PROMPT, PRIORIDADES_CONTEXTO, TRECHO_CONTEXTO_TOKENS
+)
+from utils.tokens import contar_tokens, TOKENS_POR_MENSAGEM
+
+MARCA_OMISSAO = '[...]'
+# Tokens do cabeçalho "=== CONTEÚDO DO ARQUIVO: ... ===", fora o nome.
+TOKENS_CABECALHO = 12
+
+_PALAVRA = re.compile(r'\w{3,}')
+
+
+def reserva_resposta(janela):
+    """Tokens da janela reservados para a resposta, proporcionais à janela."""
+    return min(RESERVA_RESPOSTA_TOKENS, int(janela * RESERVA_RESPOSTA_FRACAO))
+
+
+def orcamento_prompt(provedor, modelo):
+    """Tokens de entrada permitidos para um modelo, já descontada a resposta."""
+    janela = janela_contexto(provedor, modelo)
+    return max(min(janela - reserva_resposta(janela), PROMPT_MAX_TOKENS), 0)
+
+
+def janela_utilizada(provedor, modelo):
+    """Tokens que o prompt e a resposta podem ocupar juntos na janela do modelo."""
+    janela = janela_contexto(provedor, modelo)
+    return min(janela, orcamento_prompt(provedor, modelo) + reserva_resposta(janela))
+
+
+def distribuir_orcamento(demandas, orcamento, prioridades=None, minimos=None):
+    """Divide o orçamento entre as fontes proporcionalmente às prioridades.
+
+    Nenhuma fonte recebe mais do que pede; o que sobra de uma é redistribuído
+
+    entre as que ainda não foram atendidas. Os mínimos são concedidos antes da
+
+    divisão, mesmo que ultrapassem o orçamento.
+
+    Args:
+
+        demandas (dict[str, int]): Tokens que cada fonte ocuparia por inteiro.
+
+        orcamento (int): Tokens disponíveis para todas as fontes.
+
+        prioridades (dict[str, int] | None): Peso de cada fonte. Usa
+
+            `PRIORIDADES_CONTEXTO` quando None; fontes ausentes têm peso 1.
+
+        minimos (dict[str, int] | None): Tokens garantidos a cada fonte, até
+
+            a sua demanda.
+
+    Returns:
+
+        dict[str, int]: Os tokens alocados para cada fonte.
+
+    """
+    prioridades = PRIORIDADES_CONTEXTO if prioridades is None else prioridades
+    minimos = minimos or {}
+    alocacao = {fonte: max(min(minimos.get(fonte, 0), demanda), 0) for fonte, demanda in demandas.items()}
+    pendentes = {fonte for fonte, demanda in demandas.items() if demanda > alocacao[fonte]}
+    restante = max(orcamento - sum(alocacao.values()), 0)
+    while pendentes and restante > 0:
+        peso_total = sum(prioridades.get(fonte, 1) for fonte in pendentes)
+        atendidas = set()
+        distribuido = 0
+        for fonte in pendentes:
+            parte = restante * prioridades.get(fonte, 1) // peso_total
+            falta = demandas[fonte] - alocacao[fonte]
+            if parte >= falta:
+                parte = falta
+                atendidas.add(fonte)
+            alocacao[fonte] += parte
+            distribuido += parte
+        restante -= distribuido
+        if not atendidas:
+            break
+        pendentes -= atendidas
+    return alocacao
+
+
+def _normalizar(texto):
+    texto = unicodedata.normalize('NFKD', texto.lower())
+    return ''.join(c for c in texto if not unicodedata.combining(c))
+
+
+def _termos(texto):
+    return _PALAVRA.findall(_normalizar(texto))
+
+
+def dividir_trechos(texto, tamanho=TRECHO_CONTEXTO_TOKENS):
+    """Divide um texto em trechos de até ~`tamanho` tokens, respeitando parágrafos."""
+    trechos = []
+    atual = []
+    tokens_atual = 0
+    for paragrafo in re.split(r'\n\s*\n', texto):
+        if not paragrafo.strip():
+            continue
+        # Parágrafos enormes (planilhas, PDFs sem quebras) são cortados por linhas.
+        partes = paragrafo.splitlines() if contar_tokens(paragrafo) > tamanho else [paragrafo]
+        for parte in partes:
+            tokens = contar_tokens(parte)
+            if atual and tokens_atual + tokens > tamanho:
+                trechos.append('\n\n'.join(atual))
+                atual, tokens_atual = [], 0
+            atual.append(parte)
+            tokens_atual += tokens
+    if atual:
+        trechos.append('\n\n'.join(atual))
+    return trechos
+
+
+def pontuar_trechos(trechos, consulta):
+    """Relevância léxica (TF-IDF) de cada trecho para a consulta."""
+    termos_consulta = set(_termos(consulta))
+    contagens = [Counter(_termos(trecho)) for trecho in trechos]
+    frequencia_documentos = Counter(termo for contagem in contagens for termo in contagem if termo in termos_consulta)
+    total = len(trechos)
+    pontuacoes = []
+    for contagem in contagens:
+        pontuacao = 0.0
+        for termo in termos_consulta:
+            if contagem[termo]:
+                idf = math.log(1 + total / frequencia_documentos[termo])
+                pontuacao += (1 + math.log(contagem[termo])) * idf
+        pontuacoes.append(pontuacao)
+    return pontuacoes
+
+
+def selecionar_trechos(trechos, consulta, limite):
+    """Escolhe os trechos mais relevantes que cabem em `limite` tokens.
+
+    Empates (inclusive quando nenhum trecho cita a consulta) favorecem os
+
+    trechos do início. A seleção volta na ordem original.
+
+    Returns:
+
+        list[int]: Os índices dos trechos escolhidos, em ordem crescente.
+
+    """
+    pontuacoes = pontuar_trechos(trechos, consulta)
+    ordem = sorted(range(len(trechos)), key=lambda i: (-pontuacoes[i], i))
+    escolhidos = []
+    usados = 0
+    for i in ordem:
+        custo = contar_tokens(trechos[i])
+        if usados + custo <= limite:
+            escolhidos.append(i)
+            usados += custo
+    return sorted(escolhidos)
+
+
+def _juntar(trechos, indices):
+    """Reúne os trechos escolhidos marcando os saltos com `MARCA_OMISSAO`."""
+    partes = []
+    anterior = -1
+    for i in indices:
+        if i != anterior + 1:
+            partes.append(MARCA_OMISSAO)
+        partes.append(trechos[i])
+        anterior = i
+    if anterior != len(trechos) - 1:
+        partes.append(MARCA_OMISSAO)
+    return '\n\n'.join(partes)
+
+
+def ajustar_texto(texto, consulta, limite):
+    """Retorna o texto inteiro se couber em `limite`, ou seus trechos mais relevantes."""
+    if contar_tokens(texto) <= limite:
+        return texto, False
+    trechos = dividir_trechos(texto)
+    return _juntar(trechos, selecionar_trechos(trechos, consulta, limite)), True
+
+
+def _cabecalho(nome):
+    return f"=== CONTEÚDO DO ARQUIVO: {nome} ==="
+
+
+def ajustar_arquivos(arquivos, consulta, limite):
+    """Ajusta o conteúdo de vários arquivos a um orçamento comum.
+
+    Os trechos de todos os arquivos concorrem entre si, então um arquivo
+
+    irrelevante para a pergunta cede espaço aos demais.
+
+    Args:
+
+        arquivos (list[tuple[str, str]]): Pares (nome, conteúdo).
+
+        consulta (str): A pergunta usada para medir relevância.
+
+        limite (int): Tokens disponíveis para todos os arquivos.
+
+    Returns:
+
+        tuple[str, bool]: O contexto formatado e se algo foi cortado.
+
+    """
+    cabecalhos = [_cabecalho(nome) for nome, _ in arquivos]
+    completo = '\n\n'.join(f"{cabecalho}\n{conteudo}" for cabecalho, (_, conteudo) in zip(cabecalhos, arquivos))
+    if contar_tokens(completo) <= limite:
+        return completo, False
+
+    limite_trechos = limite - sum(contar_tokens(cabecalho) + 2 for cabecalho in cabecalhos)
+    trechos = []
+    origem = []
+    for n, (_, conteudo) in enumerate(arquivos):
+        for trecho in dividir_trechos(conteudo):
+            trechos.append(trecho)
+            origem.append(n)
+    escolhidos = selecionar_trechos(trechos, consulta, limite_trechos)
+
+    blocos = []
+    for n, cabecalho in enumerate(cabecalhos):
+        do_arquivo = [i for i in range(len(trechos)) if origem[i] == n]
+        inicio = do_arquivo[0] if do_arquivo else 0
+        locais = [i - inicio for i in escolhidos if origem[i] == n]
+        if locais:
+            blocos.append(f"{cabecalho}\n{_juntar(trechos[inicio:inicio + len(do_arquivo)], locais)}")
+        else:
+            blocos.append(f"{cabecalho}\n{MARCA_OMISSAO} (omitido por limite de contexto)")
+    return '\n\n'.join(blocos), True
+
+
+def tokens_mensagens(mensagens):
+    """Tokens ocupados por uma lista de mensagens do LangChain."""
+    return sum(contar_tokens(mensagem.content) + TOKENS_POR_MENSAGEM for mensagem in mensagens)
+
+
+def montar_prompt(input_usuario, provedor, modelo, prompt_sistema='', arquivos=(), contexto_rag='', historico=None):
+    """Monta a entrada do modelo e o histórico dentro do orçamento de tokens.
+
+    Args:
+
+        input_usuario (str): A pergunta do usuário, sempre enviada inteira.
+
+        provedor (str): O provedor selecionado (chave de `config_modelos`).
+
+        modelo (str): O modelo selecionado.
+
+        prompt_sistema (str): O prompt de sistema, descontado do orçamento.
+
+        arquivos (list[tuple[str, str]]): Pares (nome, conteúdo) dos arquivos.
+
+        contexto_rag (str): O contexto retornado pela base de conhecimento.
+
+        historico (tuple | None): Par (demanda, montar), em que `demanda` são os
+
+            tokens que o histórico gostaria de usar e `montar(orcamento)` retorna
+
+            as mensagens do histórico que cabem no orçamento dado.
+
+    Returns:
+
+        dict: Com 'entrada' (o texto para `{input}`), 'historico' (as mensagens
+
+            para `{chat_history}`), 'tokens' (por fonte), 'total', 'orcamento',
+
+            'cortes' (as fontes que foram reduzidas) e 'aviso' (o motivo, quando
+
+            o prompt de sistema e a pergunta sozinhos estouram o orçamento, ou None).
+
+    """
+    orcamento = orcamento_prompt(provedor, modelo)
+    tokens = {
+        'sistema': contar_tokens(prompt_sistema),
+        'pergunta': contar_tokens(input_usuario) + TOKENS_POR_MENSAGEM,
+    }
+    demanda_historico, montar_historico = historico if historico else (0, None)
+    demandas = {
+        'historico': demanda_historico,
+        'rag': contar_tokens(contexto_rag),
+        'arquivos': sum(contar_tokens(f"{nome}\n{conteudo}") + TOKENS_CABECALHO for nome, conteudo in arquivos),
+    }
+    aviso = None
+    if tokens['sistema'] + tokens['pergunta'] > orcamento:
+        aviso = (
+            f"O prompt de sistema ({tokens['sistema']} tokens) e a pergunta ({tokens['pergunta']} tokens) "
+            f"excedem o orçamento de {orcamento} tokens de {provedor}/{modelo}."
+        )
+        logging.warning(aviso)
+    alocacao = distribuir_orcamento(
+        demandas,
+        orcamento - tokens['sistema'] - tokens['pergunta'],
+        minimos={'historico': int(orcamento * HISTORICO_MIN_FRACAO_PROMPT)}
+    )
+
+    cortes = []
+    contexto_arquivos = ''
+    if arquivos:
+        contexto_arquivos, cortado = ajustar_arquivos(list(arquivos), input_usuario, alocacao['arquivos'])
+        if cortado:
+            cortes.append('arquivos')
+    if contexto_rag:
+        contexto_rag, cortado = ajustar_texto(contexto_rag, input_usuario, alocacao['rag'])
+        if cortado:
+            cortes.append('rag')
+
+    entrada = input_usuario
+    if contexto_arquivos:
+        entrada = f"CONTEXTO DOS ARQUIVOS CARREGADOS:\n{contexto_arquivos}\n\n{entrada}"
+    if contexto_rag:
+        entrada = f"CONTEXTO DA BASE DE CONHECIMENTO:\n{contexto_rag}\n\n{entrada}"
+
+    mensagens = montar_historico(alocacao['historico']) if montar_historico else []
+    if alocacao['historico'] < demanda_historico:
+        cortes.append('historico')
+
+    tokens['arquivos'] = contar_tokens(contexto_arquivos)
+    tokens['rag'] = contar_tokens(contexto_rag)
+    tokens['historico'] = tokens_mensagens(mensagens)
+    # Os rótulos e separadores que envolvem os contextos também contam.
+    total = tokens['sistema'] + TOKENS_POR_MENSAGEM + contar_tokens(entrada) + TOKENS_POR_MENSAGEM + tokens['historico']
+    return {
+        'entrada': entrada,
+        'historico': mensagens,
+        'tokens': tokens,
+        'total': total,
+        'orcamento': orcamento,
+        'cortes': cortes,
+        'aviso': aviso,
+    }
@@ -0,0 +1,140 @@
+"""Provedor simulado de chat e de embeddings, para testes sem rede nem custo.
+
+`ChatSimulado` é um modelo de chat do LangChain que responde com um texto
+determinístico (derivado das mensagens recebidas), transmitido palavra a
+palavra no ritmo do perfil do modelo: latência até o primeiro token, tokens
+por segundo, tamanho da resposta e taxa de erros. `EmbeddingsSimulados` gera
+vetores determinísticos por hashing das palavras, então textos parecidos têm
+vetores parecidos e a recuperação do Chroma continua fazendo sentido.
+
+O provedor aparece em `config_modelos` como 'Simulado' quando a variável de
+ambiente `VERONIA_PROVEDOR_SIMULADO` está definida (veja
+`utils.configs.registrar_provedor_simulado`); o modelo de embedding
+'simulado' usa `EmbeddingsSimulados` (veja `utils.configs.criar_embeddings`).
+"""
+import asyncio
+import hashlib
+import math
+import random
+import re
+import time
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+# Perfis dos modelos simulados: (latência até o 1º token em s, tokens/s,
+# tokens por resposta, fração de chamadas que falham).
+PERFIS = {
+    'rapido': (0.2, 200.0, 120, 0.0),
+    'lento': (2.0, 25.0, 300, 0.0),
+    'instavel': (0.5, 80.0, 150, 0.1),
+}
+
+VOCABULARIO = (
+    'o a de que para com uma um os as no na em por mais como mas se ao '
+    'sistema usuário permissão portal formulário relatório campo status '
+    'configuração processo dados resposta exemplo etapa consulta registro'
+).split()
+
+_PALAVRA = re.compile(r'\w+')
+
+
+class ErroSimulado(RuntimeError):
+    """Falha sorteada pelo perfil do modelo simulado."""
+
+
+def _semente(*textos):
+    resumo = hashlib.sha256('\x00'.join(textos).encode('utf-8')).digest()
+    return int.from_bytes(resumo[:8], 'big')
+
+
+class ChatSimulado(BaseChatModel):
+    """Modelo de chat determinístico que imita o ritmo de um provedor real.
+
+    Os campos opcionais sobrepõem o perfil do modelo em `PERFIS`.
+
+    """
+
+    model: str = 'rapido'
+    latencia_s: float | None = None
+    tokens_por_s: float | None = None
+    tokens_resposta: int | None = None
+    taxa_erro: float | None = None
+
+    @property
+    def _llm_type(self):
+        return 'simulado'
+
+    def _perfil(self):
+        latencia, tokens_por_s, tokens_resposta, taxa_erro = PERFIS.get(self.model, PERFIS['rapido'])
+        return (
+            latencia if self.latencia_s is None else self.latencia_s,
+            tokens_por_s if self.tokens_por_s is None else self.tokens_por_s,
+            tokens_resposta if self.tokens_resposta is None else self.tokens_resposta,
+            taxa_erro if self.taxa_erro is None else self.taxa_erro,
+        )
+
+    def _roteiro(self, messages):
+        """Sorteia, de forma determinística, se a chamada falha e as palavras da resposta."""
+        _, _, tokens_resposta, taxa_erro = self._perfil()
+        rng = random.Random(_semente(self.model, *(str(m.content) for m in messages)))
+        if rng.random() < taxa_erro:
+            raise ErroSimulado(f"Falha simulada do modelo '{self.model}'")
+        return [rng.choice(VOCABULARIO) + ' ' for _ in range(tokens_resposta)]
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        latencia, tokens_por_s, _, _ = self._perfil()
+        time.sleep(latencia)
+        for palavra in self._roteiro(messages):
+            time.sleep(1 / tokens_por_s)
+            pedaco = ChatGenerationChunk(message=AIMessageChunk(content=palavra))
+            if run_manager:
+                run_manager.on_llm_new_token(palavra, chunk=pedaco)
+            yield pedaco
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        latencia, tokens_por_s, _, _ = self._perfil()
+        await asyncio.sleep(latencia)
+        for palavra in self._roteiro(messages):
+            await asyncio.sleep(1 / tokens_por_s)
+            pedaco = ChatGenerationChunk(message=AIMessageChunk(content=palavra))
+            if run_manager:
+                await run_manager.on_llm_new_token(palavra, chunk=pedaco)
+            yield pedaco
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        texto = ''.join(pedaco.message.content for pedaco in self._stream(messages, stop, run_manager))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=texto))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        partes = [pedaco.message.content async for pedaco in self._astream(messages, stop, run_manager)]
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=''.join(partes)))])
+
+
+class EmbeddingsSimulados(Embeddings):
+    """Embeddings determinísticos por hashing de palavras (feature hashing)."""
+
+    def __init__(self, model='simulado', dimensoes=256, latencia_s=0.0):
+        self.model = model
+        self.dimensoes = dimensoes
+        self.latencia_s = latencia_s
+
+    def _vetor(self, texto):
+        vetor = [0.0] * self.dimensoes
+        for palavra in _PALAVRA.findall(texto.lower()):
+            semente = _semente(palavra)
+            vetor[semente % self.dimensoes] += 1.0 if semente >> 63 else -1.0
+        norma = math.sqrt(sum(valor * valor for valor in vetor)) or 1.0
+        return [valor / norma for valor in vetor]
+
+    def embed_documents(self, texts):
+        if self.latencia_s:
+            time.sleep(self.latencia_s)
+        return [self._vetor(texto) for texto in texts]
+
+    def embed_query(self, text):
+        if self.latencia_s:
+            time.sleep(self.latencia_s)
+        return self._vetor(text)
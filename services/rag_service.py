@@ -1,14 +1,16 @@
 import streamlit as st
-from agents.rag_agent import RagQueryEngine
-from langchain_community.vectorstores import Chroma
-from langchain_openai import OpenAIEmbeddings
 import os
 
+# O agente RAG, o Chroma e os embeddings são importados na primeira consulta:
+# as funções de listagem usadas pela barra lateral não precisam deles.
+
 @st.cache_resource
 def get_rag_agent_cached(knowledge_base_name: str):
     """
     Cria e cacheia uma instância do RagQueryEngine para uma base específica ou para todas as bases.
     """
+    from agents.rag_agent import RagQueryEngine
+
     embedding_model = st.session_state.get('modelo_embedding', 'text-embedding-3-small')
     
     try:
@@ -42,7 +44,10 @@ def check_chroma_collection_count(knowledge_base_name: str) -> int:
     if not os.path.exists(vector_store_path):
         return 0
     try:
-        embeddings = OpenAIEmbeddings(model=st.session_state.get('modelo_embedding', 'text-embedding-3-small'))
+        from langchain_community.vectorstores import Chroma
+        from utils.configs import criar_embeddings
+
+        embeddings = criar_embeddings(st.session_state.get('modelo_embedding', 'text-embedding-3-small'))
         vectordb = Chroma(persist_directory=vector_store_path, embedding_function=embeddings, collection_name=knowledge_base_name)
         return vectordb._collection.count()
     except Exception as e:
@@ -0,0 +1,170 @@
+"""Roteamento das requisições de chat com prazo e provedor reserva.
+
+A chain do provedor principal começa a transmitir em uma thread. Se o primeiro
+token não chegar dentro do prazo (ou a chamada falhar antes disso), a mesma
+requisição é enviada ao provedor reserva configurado em `config_modelos`. O
+primeiro stream a produzir um token vence; o outro é cancelado assim que
+produz algo, pois o cliente síncrono não pode ser interrompido no meio de uma
+espera.
+
+Cada stream registra seu tempo até o primeiro token no histograma de
+`db.latencias`, que define o prazo padrão de cada modelo.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+
+from db.latencias import histograma, quantil, registrar_latencia
+from services.model_service import carregar_modelo_cache
+from utils.configs import config_modelos, provedor_local
+from utils.constants import (
+    PRAZO_TTFT_PADRAO_S, PRAZO_TTFT_MIN_S, PRAZO_TTFT_MAX_S,
+    PRAZO_TTFT_QUANTIL, PRAZO_TTFT_FATOR, PRAZO_TTFT_AMOSTRAS_MINIMAS
+)
+
+
+def prazo_ttft(provedor, modelo):
+    """Prazo padrão, em segundos, para o primeiro token de um modelo."""
+    estimativa, amostras = quantil(histograma(provedor, modelo), PRAZO_TTFT_QUANTIL)
+    if estimativa is None or amostras < PRAZO_TTFT_AMOSTRAS_MINIMAS:
+        return PRAZO_TTFT_PADRAO_S
+    return min(max(estimativa * PRAZO_TTFT_FATOR, PRAZO_TTFT_MIN_S), PRAZO_TTFT_MAX_S)
+
+
+def reserva_de(provedor):
+    """Retorna o (provedor, modelo) reserva configurado, se a chave de API existir."""
+    reserva = config_modelos.get(provedor, {}).get('reserva')
+    if not reserva or reserva[0] == provedor:
+        return None
+    if not provedor_local(reserva[0]) and not os.getenv(f"{reserva[0].upper()}_API_KEY"):
+        return None
+    return reserva
+
+
+def _correr(nome, chain, entrada, provedor, modelo, fila, cancelar):
+    """Consome o stream de uma chain, repassando cada pedaço para a fila."""
+    inicio = time.monotonic()
+    primeiro = True
+    fluxo = chain.stream(entrada)
+    try:
+        for pedaco in fluxo:
+            cancelado = cancelar.is_set()
+            if not cancelado:
+                fila.put((nome, 'pedaco', pedaco))
+            if primeiro:
+                # Só depois de entregar o pedaço, e pela fila de escrita: o
+                # primeiro token não espera o SQLite.
+                registrar_latencia(provedor, modelo, time.monotonic() - inicio)
+                primeiro = False
+            if cancelado:
+                return
+        fila.put((nome, 'fim', None))
+    except Exception as e:
+        fila.put((nome, 'erro', e))
+    finally:
+        fechar = getattr(fluxo, 'close', None)
+        if fechar:
+            fechar()
+
+
+def transmitir_com_reserva(chain, entrada, provedor, modelo, prazo=None, relatorio=None):
+    """Transmite a resposta da chain, acionando o provedor reserva se ela demorar.
+
+    Args:
+
+        chain: A chain do provedor principal (`carregar_modelo_cache`).
+
+        entrada (dict): As variáveis do prompt ('input' e 'chat_history').
+
+        provedor (str): O provedor principal.
+
+        modelo (str): O modelo principal.
+
+        prazo (float | None): Segundos até o primeiro token antes de acionar a
+
+            reserva. Usa `prazo_ttft` quando None.
+
+        relatorio (dict | None): Preenchido com 'provedor', 'modelo' e
+
+            'reserva' (True se a resposta veio do provedor reserva).
+
+    Yields:
+
+        Os pedaços da resposta do stream vencedor.
+
+    Raises:
+
+        Exception: O erro do último stream, se todos falharem.
+
+    """
+    relatorio = {} if relatorio is None else relatorio
+    prazo = prazo_ttft(provedor, modelo) if prazo is None else prazo
+    reserva = reserva_de(provedor)
+    fila = queue.Queue()
+    corredores = {}
+    ativos = set()
+
+    def iniciar(nome, chain, provedor, modelo):
+        cancelar = threading.Event()
+        corredores[nome] = (provedor, modelo, cancelar)
+        ativos.add(nome)
+        threading.Thread(
+            target=_correr,
+            args=(nome, chain, entrada, provedor, modelo, fila, cancelar),
+            name=f'veronia-stream-{nome}',
+            daemon=True,
+        ).start()
+
+    def acionar_reserva(motivo):
+        nonlocal reserva
+        provedor_reserva, modelo_reserva = reserva
+        reserva = None
+        chain_reserva = carregar_modelo_cache(provedor_reserva, modelo_reserva)
+        if chain_reserva is None:
+            return
+        logging.warning(f"{provedor}/{modelo} {motivo}; acionando {provedor_reserva}/{modelo_reserva}")
+        iniciar('reserva', chain_reserva, provedor_reserva, modelo_reserva)
+
+    def vencer(nome):
+        for outro, (_, _, cancelar) in corredores.items():
+            if outro != nome:
+                cancelar.set()
+        relatorio.update(provedor=corredores[nome][0], modelo=corredores[nome][1], reserva=nome == 'reserva')
+        return nome
+
+    iniciar('principal', chain, provedor, modelo)
+    limite = time.monotonic() + prazo
+    vencedor = None
+    try:
+        while True:
+            espera = max(limite - time.monotonic(), 0) if reserva and vencedor is None else None
+            try:
+                nome, tipo, valor = fila.get(timeout=espera)
+            except queue.Empty:
+                acionar_reserva(f"sem resposta em {prazo:.1f}s")
+                continue
+
+            if vencedor is not None and nome != vencedor:
+                continue
+            if tipo == 'pedaco':
+                if vencedor is None:
+                    vencedor = vencer(nome)
+                yield valor
+            elif tipo == 'fim':
+                if vencedor is None:
+                    vencer(nome)
+                return
+            else:
+                ativos.discard(nome)
+                if vencedor is not None:
+                    raise valor
+                logging.error(f"Erro no stream de {corredores[nome][0]}/{corredores[nome][1]}: {valor}")
+                if reserva:
+                    acionar_reserva("falhou")
+                if not ativos:
+                    raise valor
+    finally:
+        for _, _, cancelar in corredores.values():
+            cancelar.set()
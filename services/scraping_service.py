@@ -3,7 +3,6 @@ import streamlit as st
 from services.crawler.fetcher import HtmlFetcher
 from services.crawler.parser import WikiParser
 from services.crawler.storage import PageStorage
-from services.ingest_service import ingest
 import logging
 
 logger = logging.getLogger(__name__)
@@ -80,6 +79,9 @@ def indexar_base_de_conhecimento(base_name: str):
     os.makedirs(vector_store_dir, exist_ok=True) # Garante que o diretório do vector store exista
 
     try:
+        # Importado só aqui: traz o splitter, o Chroma e os embeddings.
+        from services.ingest_service import ingest
+
         with st.spinner("Realizando indexação dos documentos..."):
             chunk_size = st.session_state.get('chunk_size', 1000)
             overlap = st.session_state.get('chunk_overlap', 200)
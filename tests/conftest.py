@@ -0,0 +1,21 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import db_sqlite
+from db.fila_escrita import aguardar_escritas
+
+
+@pytest.fixture
+def banco(tmp_path):
+    """Um banco SQLite vazio, já migrado, usado pela camada de dados durante o teste."""
+    anterior = db_sqlite.DB_FILE
+    db_sqlite.configurar_banco(str(tmp_path / 'veronia.db'))
+    db_sqlite.init_database()
+    yield db_sqlite.get_pool()
+    # Escritas em segundo plano ainda apontam para o banco do teste.
+    aguardar_escritas(timeout=10)
+    db_sqlite.configurar_banco(anterior)
@@ -0,0 +1,59 @@
+import os
+
+from db import arquivo, db_sqlite
+
+LONGA = 'Parecer jurídico sobre a rescisão do contrato. ' * 60
+
+
+def _envelhecer(banco, conversa_id, data):
+    with banco.escrita() as conn:
+        conn.execute("UPDATE mensagens SET timestamp = ? WHERE conversa_id = ?;", (data, conversa_id))
+        conn.execute("UPDATE conversas SET data_criacao = ? WHERE id = ?;", (data, conversa_id))
+
+
+def _conversas_encontradas(texto):
+    return {r['conversa_id'] for r in db_sqlite.buscar_conversas(texto)}
+
+
+def _integridade_busca(banco):
+    with banco.escrita() as conn:
+        conn.execute("INSERT INTO busca_mensagens (busca_mensagens) VALUES ('integrity-check');")
+
+
+def test_arquivar_e_restaurar_preserva_as_mensagens(banco):
+    antiga = db_sqlite.criar_conversa('Contrato de locação', 'Groq', 'modelo')
+    recente = db_sqlite.criar_conversa('Recente', 'Groq', 'modelo')
+    db_sqlite.salvar_mensagens(antiga, [
+        {'role': 'user', 'content': 'Posso rescindir antes do prazo?'},
+        {'role': 'assistant', 'content': LONGA},
+    ])
+    db_sqlite.salvar_mensagens(recente, [{'role': 'user', 'content': 'rescisão recente'}])
+    _envelhecer(banco, antiga, '2020-01-15 10:00:00')
+    originais = db_sqlite.carregar_mensagens(antiga)
+
+    assert arquivo.arquivar_conversas_antigas(dias=180) == (1, 2)
+    assert os.path.exists(os.path.join(arquivo.diretorio_arquivo(), 'veronia-2020-01.db'))
+    assert db_sqlite.carregar_mensagens(antiga) == []
+    # As mensagens saem da busca; o título continua pesquisável.
+    assert _conversas_encontradas('rescindir') == set()
+    assert _conversas_encontradas('rescisao') == {recente}
+    assert _conversas_encontradas('locacao') == {antiga}
+    _integridade_busca(banco)
+
+    assert arquivo.restaurar_conversa(antiga) is True
+    assert db_sqlite.carregar_mensagens(antiga) == originais
+    assert _conversas_encontradas('rescisao') == {antiga, recente}
+    _integridade_busca(banco)
+    # Restaurar de novo não faz nada.
+    assert arquivo.restaurar_conversa(antiga) is False
+
+
+def test_conversa_excluida_sai_do_banco_de_arquivo(banco):
+    conversa_id = db_sqlite.criar_conversa('Descartável', 'Groq', 'modelo')
+    db_sqlite.salvar_mensagens(conversa_id, [{'role': 'user', 'content': 'mensagem antiga'}])
+    _envelhecer(banco, conversa_id, '2021-06-01 08:00:00')
+    assert arquivo.arquivar_conversas_antigas(dias=180) == (1, 1)
+
+    db_sqlite.excluir_conversa(conversa_id)
+    assert arquivo.limpar_arquivos_orfaos() == 1
+    assert arquivo.restaurar_conversa(conversa_id) is False
@@ -0,0 +1,112 @@
+import sqlite3
+import threading
+import time
+
+from db import db_sqlite
+from db.compressao import CODEC_TEXTO, CODEC_ZLIB, LIMIAR_BYTES, comprimir
+
+LONGA = ('A conciliação bancária do período fechou sem divergências. ' * 60).strip()
+
+
+def _integridade_busca(pool):
+    with pool.escrita() as conn:
+        conn.execute("INSERT INTO busca_mensagens (busca_mensagens) VALUES ('integrity-check');")
+
+
+def _conversas_encontradas(texto):
+    return {r['conversa_id'] for r in db_sqlite.buscar_conversas(texto)}
+
+
+def test_mensagem_grande_comprimida_e_lida_de_volta(banco):
+    conversa_id = db_sqlite.criar_conversa('Compressão', 'Groq', 'modelo')
+    db_sqlite.salvar_mensagens(conversa_id, [
+        {'role': 'user', 'content': 'curta'},
+        {'role': 'assistant', 'content': LONGA},
+    ])
+
+    with banco.leitura() as conn:
+        codecs = [row['codec'] for row in conn.execute(
+            "SELECT codec FROM mensagens WHERE conversa_id = ? ORDER BY id;", (conversa_id,)
+        )]
+    assert len(LONGA.encode('utf-8')) > LIMIAR_BYTES
+    assert codecs == [CODEC_TEXTO, CODEC_ZLIB]
+    assert [m['content'] for m in db_sqlite.carregar_mensagens(conversa_id)] == ['curta', LONGA]
+
+
+def test_busca_ignora_acentos_e_caixa(banco):
+    curta = db_sqlite.criar_conversa('Rotina do mês', 'Groq', 'modelo')
+    longa = db_sqlite.criar_conversa('Fechamento', 'Groq', 'modelo')
+    db_sqlite.salvar_mensagens(curta, [{'role': 'user', 'content': 'Como faço a reconciliação do cartão?'}])
+    db_sqlite.salvar_mensagens(longa, [{'role': 'assistant', 'content': LONGA}])
+
+    assert _conversas_encontradas('reconciliacao') == {curta}
+    assert _conversas_encontradas('RECONCILIAÇÃO') == {curta}
+    # O texto comprimido também é indexado.
+    assert _conversas_encontradas('conciliacao bancaria') == {longa}
+    assert _conversas_encontradas('mes') == {curta}
+
+    resultado = db_sqlite.buscar_conversas('divergencias')[0]
+    assert '**divergências**' in resultado['trecho']
+    _integridade_busca(banco)
+
+
+def test_exclusao_remove_da_busca(banco):
+    conversa_id = db_sqlite.criar_conversa('Temporária', 'Groq', 'modelo')
+    db_sqlite.salvar_mensagens(conversa_id, [{'role': 'assistant', 'content': LONGA}])
+    assert _conversas_encontradas('conciliacao') == {conversa_id}
+
+    db_sqlite.excluir_conversa(conversa_id)
+    assert _conversas_encontradas('conciliacao') == set()
+    _integridade_busca(banco)
+
+
+def test_outras_ferramentas_gravam_sem_as_funcoes_da_aplicacao(banco):
+    conversa_id = db_sqlite.criar_conversa('Externa', 'Groq', 'modelo')
+    db_sqlite.salvar_mensagens(conversa_id, [{'role': 'assistant', 'content': LONGA}])
+    comprimido, codec = comprimir('Relatório de exceções gerado pelo script de reparo. ' * 40)
+
+    # Uma conexão como a do CLI do sqlite3, sem `descomprimir` registrada.
+    externa = sqlite3.connect(banco.caminho)
+    try:
+        with externa:
+            externa.execute("PRAGMA foreign_keys = ON;")
+            externa.execute(
+                "INSERT INTO mensagens (conversa_id, role, content, codec) VALUES (?, 'user', ?, ?);",
+                (conversa_id, comprimido, codec),
+            )
+            externa.execute(
+                "INSERT INTO mensagens (conversa_id, role, content) VALUES (?, 'user', 'anotação manual');",
+                (conversa_id,),
+            )
+            externa.execute("DELETE FROM mensagens WHERE codec = ? AND content != ?;", (CODEC_ZLIB, comprimido))
+    finally:
+        externa.close()
+
+    with banco.escrita() as conn:
+        assert db_sqlite.sincronizar_busca(conn) == 3
+    assert _conversas_encontradas('excecoes') == {conversa_id}
+    assert _conversas_encontradas('anotacao') == {conversa_id}
+    assert _conversas_encontradas('conciliacao') == set()
+    _integridade_busca(banco)
+
+
+def test_init_database_repetido_nao_espera_o_escritor(banco):
+    liberar = threading.Event()
+    segurando = threading.Event()
+
+    def segurar_escritor():
+        # Como um VACUUM da manutenção ou um arquivamento em andamento.
+        with banco.manutencao():
+            segurando.set()
+            liberar.wait(10)
+
+    threading.Thread(target=segurar_escritor, daemon=True).start()
+    segurando.wait(5)
+    try:
+        # A cada rerun do Streamlit.
+        inicio = time.monotonic()
+        db_sqlite.init_database()
+        duracao = time.monotonic() - inicio
+    finally:
+        liberar.set()
+    assert duracao < 0.5
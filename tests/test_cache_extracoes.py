@@ -0,0 +1,110 @@
+import hashlib
+import logging
+import os
+import threading
+
+import pytest
+
+from db import cache_extracoes, db_sqlite
+from db.fila_escrita import aguardar_escritas
+from services.extracao_paralela import ArquivoEmMemoria
+from services.extracao_service import arquivos_do_turno
+
+
+def _upload(nome, texto):
+    return ArquivoEmMemoria(texto.encode('utf-8'), nome, 'text/plain')
+
+
+def _guardar(arquivo, texto):
+    """Coloca no cache a extração do arquivo, como se ele já tivesse sido processado."""
+    sha256 = hashlib.sha256(arquivo.getvalue()).hexdigest()
+    chave = cache_extracoes.chave_extracao(sha256, arquivo.type, arquivo.name)
+    cache_extracoes.gravar_extracao(chave, sha256, arquivo.name, len(arquivo.getvalue()), texto)
+    return chave
+
+
+@pytest.fixture
+def escritas_por_thread(banco, monkeypatch):
+    threads = []
+    escrita = banco.escrita
+
+    def registrar():
+        threads.append(threading.current_thread().name)
+        return escrita()
+
+    monkeypatch.setattr(banco, 'escrita', registrar)
+    return threads
+
+
+def test_chave_muda_com_conteudo_tipo_nome_e_versao(monkeypatch):
+    base = cache_extracoes.chave_extracao('a' * 64, 'text/plain', 'notas.txt')
+    assert base == cache_extracoes.chave_extracao('a' * 64, 'text/plain', 'notas.txt')
+    assert base != cache_extracoes.chave_extracao('b' * 64, 'text/plain', 'notas.txt')
+    assert base != cache_extracoes.chave_extracao('a' * 64, 'text/markdown', 'notas.txt')
+    assert base != cache_extracoes.chave_extracao('a' * 64, 'text/plain', 'outras.txt')
+    monkeypatch.setattr(cache_extracoes, 'VERSAO_EXTRACAO', cache_extracoes.VERSAO_EXTRACAO + 1)
+    assert base != cache_extracoes.chave_extracao('a' * 64, 'text/plain', 'notas.txt')
+
+
+def test_nova_versao_da_extracao_nao_reaproveita_o_texto_antigo(banco, monkeypatch):
+    arquivo = _upload('notas.txt', 'conteúdo')
+    chave = _guardar(arquivo, 'texto antigo')
+    assert cache_extracoes.buscar_extracao(chave) == 'texto antigo'
+
+    monkeypatch.setattr(cache_extracoes, 'VERSAO_EXTRACAO', cache_extracoes.VERSAO_EXTRACAO + 1)
+    sha256 = hashlib.sha256(arquivo.getvalue()).hexdigest()
+    nova = cache_extracoes.chave_extracao(sha256, arquivo.type, arquivo.name)
+    assert cache_extracoes.buscar_extracao(nova) is None
+
+
+def test_turno_repetido_nao_escreve_no_banco(banco, escritas_por_thread):
+    conversa_id = db_sqlite.criar_conversa('Anexos', 'Groq', 'modelo')
+    uploads = [_upload('a.txt', 'primeiro'), _upload('b.txt', 'segundo')]
+    for arquivo in uploads:
+        _guardar(arquivo, f'texto de {arquivo.name}')
+    assert aguardar_escritas(timeout=10)
+
+    escritas_por_thread.clear()
+    contexto, adicionados = arquivos_do_turno(conversa_id, uploads)
+    assert adicionados == ['a.txt', 'b.txt']
+    assert [nome for _, nome, _ in contexto] == ['a.txt', 'b.txt']
+    # Os dois anexos em uma única transação.
+    assert escritas_por_thread.count(threading.current_thread().name) == 1
+
+    escritas_por_thread.clear()
+    contexto, adicionados = arquivos_do_turno(conversa_id, uploads)
+    assert adicionados == []
+    assert [texto for _, _, texto in contexto] == ['texto de a.txt', 'texto de b.txt']
+    assert threading.current_thread().name not in escritas_por_thread
+
+    # Sem upload no turno, os anexos continuam no contexto.
+    contexto, adicionados = arquivos_do_turno(conversa_id, [])
+    assert (adicionados, len(contexto)) == ([], 2)
+
+
+def test_poda_preserva_extracoes_anexadas(banco):
+    conversa_id = db_sqlite.criar_conversa('Poda', 'Groq', 'modelo')
+    anexado, solto = _upload('anexado.txt', 'um'), _upload('solto.txt', 'dois')
+    chave_anexado = _guardar(anexado, 'texto anexado')
+    chave_solto = _guardar(solto, 'texto solto')
+    arquivos_do_turno(conversa_id, [anexado])
+
+    assert cache_extracoes.podar_extracoes(tamanho_maximo=0) == 1
+    assert cache_extracoes.buscar_extracao(chave_solto) is None
+    assert cache_extracoes.buscar_extracao(chave_anexado) == 'texto anexado'
+
+    db_sqlite.excluir_conversa(conversa_id)
+    assert cache_extracoes.podar_extracoes(tamanho_maximo=0) == 1
+
+
+def test_anexo_sem_extracao_sai_do_contexto_com_aviso(banco, caplog):
+    conversa_id = db_sqlite.criar_conversa('Perdido', 'Groq', 'modelo')
+    arquivo = _upload('perdido.txt', 'x')
+    chave = _guardar(arquivo, 'texto perdido')
+    arquivos_do_turno(conversa_id, [arquivo])
+    os.remove(cache_extracoes._caminho(chave))
+
+    with caplog.at_level(logging.WARNING):
+        contexto, _ = arquivos_do_turno(conversa_id, [])
+    assert contexto == []
+    assert 'perdido.txt' in caplog.text
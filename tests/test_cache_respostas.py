@@ -0,0 +1,94 @@
+import threading
+import time
+
+import pytest
+
+from db import cache_respostas
+from db.compressao import CODEC_ZLIB
+from db.fila_escrita import aguardar_escritas
+
+HISTORICO = [('human', 'Qual o prazo?'), ('ai', 'Trinta dias.')]
+BASE = ('Groq', 'llama', 'Você é um assistente.', HISTORICO, 'E para recorrer?')
+
+
+@pytest.mark.parametrize('posicao, valor', [
+    (0, 'OpenAI'),
+    (1, 'outro-modelo'),
+    (2, 'Você é um revisor.'),
+    (3, HISTORICO + [('human', 'mais uma')]),
+    (3, [('human', 'Qual o prazo?'), ('ai', 'Trinta dias!')]),
+    (4, 'E para recorrer? '),
+])
+def test_chave_muda_com_cada_parte_da_requisicao(posicao, valor):
+    partes = list(BASE)
+    partes[posicao] = valor
+    assert cache_respostas.chave_cache(*BASE) == cache_respostas.chave_cache(*BASE)
+    assert cache_respostas.chave_cache(*partes) != cache_respostas.chave_cache(*BASE)
+
+
+def test_resposta_gravada_e_reaproveitada_ate_expirar(banco):
+    chave = cache_respostas.chave_cache(*BASE)
+    resposta = 'Quinze dias úteis a partir da intimação. ' * 50
+    assert cache_respostas.buscar_resposta(chave) is None
+
+    cache_respostas.gravar_resposta(chave, 'Groq', 'llama', resposta).result(timeout=10)
+    assert cache_respostas.buscar_resposta(chave) == resposta
+    assert aguardar_escritas(timeout=10)
+    with banco.leitura() as conn:
+        row = conn.execute("SELECT codec, acessos FROM cache_respostas WHERE chave = ?;", (chave,)).fetchone()
+    assert row['codec'] == CODEC_ZLIB
+    assert row['acessos'] == 1
+
+    # Outro histórico não reaproveita a resposta.
+    outra = cache_respostas.chave_cache(*BASE[:3], HISTORICO[:1], BASE[4])
+    assert cache_respostas.buscar_resposta(outra) is None
+
+    assert cache_respostas.buscar_resposta(chave, ttl=-1) is None
+    assert cache_respostas.podar_cache(ttl=-1) == 1
+    assert cache_respostas.buscar_resposta(chave) is None
+
+
+def test_acerto_e_gravacao_nao_esperam_o_escritor(banco):
+    chave = cache_respostas.chave_cache(*BASE)
+    cache_respostas.gravar_resposta(chave, 'Groq', 'llama', 'Trinta dias corridos.').result(timeout=10)
+    liberar = threading.Event()
+    segurando = threading.Event()
+
+    def segurar_escritor():
+        # Como um VACUUM da manutenção.
+        with banco.manutencao():
+            segurando.set()
+            liberar.wait(10)
+
+    threading.Thread(target=segurar_escritor, daemon=True).start()
+    segurando.wait(5)
+    try:
+        inicio = time.monotonic()
+        assert cache_respostas.buscar_resposta(chave) == 'Trinta dias corridos.'
+        outra = cache_respostas.chave_cache(*BASE[:4], 'E o recurso?')
+        futuro = cache_respostas.gravar_resposta(outra, 'Groq', 'llama', 'Quinze dias.')
+        duracao = time.monotonic() - inicio
+        assert not futuro.done()
+    finally:
+        liberar.set()
+    assert duracao < 0.5
+    futuro.result(timeout=10)
+    assert cache_respostas.buscar_resposta(outra) == 'Quinze dias.'
+
+
+def test_poda_enfileirada_a_cada_tantas_gravacoes_entre_sessoes(banco, monkeypatch):
+    podas = []
+    monkeypatch.setattr(cache_respostas, '_gravacoes', 0)
+    monkeypatch.setattr(cache_respostas, '_podar', lambda conn, ttl, tamanho: podas.append(ttl))
+
+    def sessao(n):
+        for i in range(25):
+            cache_respostas.gravar_resposta(f'{n}-{i}', 'Groq', 'llama', 'resposta')
+
+    sessoes = [threading.Thread(target=sessao, args=(n,)) for n in range(8)]
+    for thread in sessoes:
+        thread.start()
+    for thread in sessoes:
+        thread.join()
+    assert aguardar_escritas(timeout=10)
+    assert len(podas) == 8 * 25 // cache_respostas.PODAR_A_CADA
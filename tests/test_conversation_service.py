@@ -0,0 +1,74 @@
+import threading
+
+import pytest
+import streamlit as st
+
+from db import db_sqlite
+from db.fila_escrita import enfileirar_mensagens
+from services import conversation_service
+from services.conversation_service import (
+    carregar_mensagens_anteriores_service, listar_conversas_cached, seleciona_conversa_service
+)
+from utils.constants import CHAT_MESSAGE_LIMIT
+
+
+@pytest.fixture
+def sessao(banco):
+    st.session_state.clear()
+    listar_conversas_cached.clear()
+    yield st.session_state
+    st.session_state.clear()
+    listar_conversas_cached.clear()
+
+
+def _turno(n):
+    return [{'role': 'user', 'content': f'pergunta {n}'}, {'role': 'assistant', 'content': f'resposta {n}'}]
+
+
+def _enfileirar_com_escritor_ocupado(banco, conversa_id, mensagens, titulo=None):
+    """Enfileira um turno enquanto outro escritor segura o banco por um instante."""
+    segurando = threading.Event()
+
+    def segurar_escritor():
+        with banco.manutencao():
+            segurando.set()
+            threading.Event().wait(0.3)
+
+    thread = threading.Thread(target=segurar_escritor, daemon=True)
+    thread.start()
+    segurando.wait(5)
+    futuro = enfileirar_mensagens(conversa_id, mensagens, titulo=titulo)
+    assert not futuro.done()
+    return thread
+
+
+def test_reabrir_conversa_logo_apos_o_turno_inclui_o_turno(banco, sessao):
+    conversa_id = db_sqlite.criar_conversa('Prazo', 'Groq', 'modelo')
+    _enfileirar_com_escritor_ocupado(banco, conversa_id, _turno(1))
+
+    seleciona_conversa_service(conversa_id)
+    assert [m['content'] for m in sessao['historico']] == ['pergunta 1', 'resposta 1']
+
+
+def test_pagina_anterior_espera_a_fila(banco, sessao, monkeypatch):
+    conversa_id = db_sqlite.criar_conversa('Longa', 'Groq', 'modelo')
+    db_sqlite.salvar_mensagens(conversa_id, [m for n in range(CHAT_MESSAGE_LIMIT) for m in _turno(n)])
+    seleciona_conversa_service(conversa_id)
+    assert sessao['historico_tem_mais']
+
+    esperas = []
+    monkeypatch.setattr(conversation_service, 'aguardar_escritas', lambda timeout: esperas.append(timeout) or True)
+    carregar_mensagens_anteriores_service()
+    assert esperas
+    assert len(sessao['historico']) == 2 * CHAT_MESSAGE_LIMIT
+
+
+def test_lista_de_conversas_nao_guarda_ordem_anterior_ao_turno(banco, sessao):
+    antiga = db_sqlite.criar_conversa('Antiga', 'Groq', 'modelo')
+    db_sqlite.criar_conversa('Recente', 'Groq', 'modelo')
+    _enfileirar_com_escritor_ocupado(banco, antiga, _turno(1), titulo='pergunta 1')
+
+    # Como o rerun que segue o turno, antes de a fila gravar.
+    conversas = listar_conversas_cached()
+    assert conversas[0] == (antiga, 'pergunta 1')
+    assert listar_conversas_cached() == conversas
@@ -0,0 +1,93 @@
+import io
+import time
+
+import fitz
+import pytest
+
+from services import extracao_paralela, file_processor
+from services.extracao_paralela import ArquivoEmMemoria, MotorExtracao
+
+
+def _pdf(paginas):
+    doc = fitz.open()
+    for n in range(paginas):
+        doc.new_page().insert_text((36, 36), f"Página {n + 1}: relatório de exceções", fontsize=9)
+    dados = doc.tobytes()
+    doc.close()
+    return dados
+
+
+def _docx():
+    import docx
+    documento = docx.Document()
+    documento.add_paragraph('Parágrafo do contrato de serviço.')
+    saida = io.BytesIO()
+    documento.save(saida)
+    return saida.getvalue()
+
+
+def _dormir(conteudo, nome, tipo, tarefa, limite_inicio):
+    extracao_paralela._marcar_inicio(tarefa)
+    time.sleep(float(conteudo))
+    return nome, None
+
+
+@pytest.fixture
+def motor():
+    motor = MotorExtracao(2)
+    yield motor
+    motor.fechar()
+
+
+def test_extracao_paralela_igual_a_serial(motor, monkeypatch):
+    # Faixas pequenas para que cada PDF seja dividido entre os processos.
+    monkeypatch.setattr(extracao_paralela, 'EXTRACAO_PAGINAS_POR_TAREFA', 3)
+    arquivos = [
+        (_pdf(20), 'longo.pdf', 'application/pdf'),
+        ('Linha com acentuação\nsegunda linha'.encode('utf-8'), 'notas.txt', 'text/plain'),
+        (_pdf(2), 'curto.pdf', 'application/pdf'),
+        (b'a,b\n1,2\n3,4\n', 'tabela.csv', 'text/csv'),
+        (_docx(), 'contrato.docx', 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'),
+        ('# Título\ncorpo'.encode('utf-8'), 'leia.md', 'text/markdown'),
+    ]
+    serial = [file_processor.processar_automatico(ArquivoEmMemoria(*arquivo)) for arquivo in arquivos]
+
+    assert motor.extrair(arquivos, timeout=120) == serial
+    assert 'Página 20' in serial[0]
+
+
+def test_tarefa_abandonada_nao_atrasa_os_lotes_seguintes(motor, monkeypatch):
+    monkeypatch.setattr(extracao_paralela, '_extrair_arquivo', _dormir)
+    motor.processos = 1
+    # Sobe o processo antes de medir.
+    assert motor.extrair([(b'0', 'aquecimento.xlsx', None)], timeout=120) == ['aquecimento.xlsx']
+
+    assert motor.extrair([(b'60', 'lenta.xlsx', None)], timeout=0.5) == [None]
+
+    inicio = time.monotonic()
+    assert motor.extrair([(b'0', 'rapida.xlsx', None)], timeout=120) == ['rapida.xlsx']
+    assert time.monotonic() - inicio < 30
+
+
+def test_prazo_conta_do_inicio_de_cada_arquivo(motor, monkeypatch):
+    monkeypatch.setattr(extracao_paralela, '_extrair_arquivo', _dormir)
+    motor.processos = 1
+    assert motor.extrair([(b'0', 'aquecimento.xlsx', None)], timeout=120) == ['aquecimento.xlsx']
+
+    # Mais arquivos que processos: o lote leva mais que o prazo de um arquivo.
+    arquivos = [(b'0.6', f'planilha{n}.xlsx', None) for n in range(3)]
+    avisos = []
+    assert motor.extrair(arquivos, timeout=1.5, avisos=avisos) == [nome for _, nome, _ in arquivos]
+    assert avisos == [None, None, None]
+
+
+def test_erro_do_processo_de_extracao_volta_nos_avisos(motor):
+    arquivos = [
+        (b'isto nao e um docx', 'quebrado.docx', 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'),
+        ('texto simples'.encode('utf-8'), 'ok.txt', 'text/plain'),
+    ]
+    avisos = []
+    textos = motor.extrair(arquivos, timeout=120, avisos=avisos)
+    assert textos[0] is None and 'texto simples' in textos[1]
+    assert "Erro ao processar DOCX 'quebrado.docx'" in avisos[0]
+    assert avisos[1] is None
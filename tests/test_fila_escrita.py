@@ -0,0 +1,58 @@
+import pytest
+
+from db import db_sqlite
+from db.fila_escrita import FilaEscrita
+
+
+@pytest.fixture
+def fila(banco):
+    fila = FilaEscrita()
+    yield fila
+    fila.encerrar(timeout=5)
+
+
+def test_pedido_invalido_nao_derruba_a_fila(banco, fila):
+    conversa_id = db_sqlite.criar_conversa('Fila', 'Groq', 'modelo')
+
+    ruim = fila.enfileirar(conversa_id, [{'content': 'sem role'}])
+    with pytest.raises(KeyError):
+        ruim.result(timeout=5)
+
+    bom = fila.enfileirar(conversa_id, [{'role': 'user', 'content': 'depois da falha'}])
+    assert len(bom.result(timeout=5)) == 1
+    assert fila.barreira().result(timeout=5) is None
+    assert [m['content'] for m in db_sqlite.carregar_mensagens(conversa_id)] == ['depois da falha']
+
+
+def test_falha_isolada_no_mesmo_lote(banco, fila):
+    conversa_id = db_sqlite.criar_conversa('Lote', 'Groq', 'modelo')
+
+    futuros = [
+        fila.enfileirar(conversa_id, [{'role': 'user', 'content': 'primeira'}]),
+        fila.enfileirar(conversa_id, [{'role': 'user', 'content': 'ok'}, {'content': 'sem role'}]),
+        fila.enfileirar(conversa_id, [{'role': 'assistant', 'content': 'terceira'}]),
+    ]
+
+    assert len(futuros[0].result(timeout=5)) == 1
+    with pytest.raises(KeyError):
+        futuros[1].result(timeout=5)
+    assert len(futuros[2].result(timeout=5)) == 1
+    # O pedido que falhou é desfeito inteiro, inclusive a mensagem válida.
+    assert [m['content'] for m in db_sqlite.carregar_mensagens(conversa_id)] == ['primeira', 'terceira']
+
+
+def test_erro_inesperado_fora_do_pedido_nao_para_a_thread(banco, fila, monkeypatch):
+    conversa_id = db_sqlite.criar_conversa('Erro', 'Groq', 'modelo')
+    gravar = fila._gravar
+    chamadas = []
+
+    def gravar_falhando(pedidos):
+        chamadas.append(pedidos)
+        if len(chamadas) == 1:
+            raise RuntimeError('falha inesperada')
+        return gravar(pedidos)
+
+    monkeypatch.setattr(fila, '_gravar', gravar_falhando)
+    with pytest.raises(RuntimeError):
+        fila.enfileirar(conversa_id, [{'role': 'user', 'content': 'perdida'}]).result(timeout=5)
+    assert len(fila.enfileirar(conversa_id, [{'role': 'user', 'content': 'gravada'}]).result(timeout=5)) == 1
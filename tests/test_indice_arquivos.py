@@ -0,0 +1,80 @@
+import pytest
+
+from services import indice_arquivos_service
+from services.indice_arquivos_service import descartar_indice, trechos_relevantes
+from services.provedor_simulado import EmbeddingsSimulados
+from services.prompt_service import MARCA_OMISSAO
+from utils.configs import EMBEDDING_SIMULADO
+
+# Palavras sem colisão entre si (nem com 'texto') no hashing de `EmbeddingsSimulados`.
+TEMAS = [
+    'vendas', 'estoque', 'contratos', 'folha', 'impostos', 'marketing', 'viagens', 'frota', 'energia', 'aluguel',
+    'seguros', 'juros', 'dividendos', 'fornecedores', 'auditoria', 'treinamento', 'salarios', 'bonus', 'logistica',
+    'patentes', 'licencas', 'servidores', 'telefonia', 'limpeza', 'seguranca', 'eventos', 'doacoes'
+]
+
+
+def _arquivo(chave, nome, temas):
+    """Um arquivo com uma seção (um trecho do índice) por tema."""
+    secoes = [f'{tema} texto ' * (800 // len(f'{tema} texto ') + 1) for tema in temas]
+    return chave, nome, '\n\n'.join(secoes)
+
+
+RELATORIO = _arquivo('k1', 'relatorio.txt', TEMAS[:20])
+PLANILHA = _arquivo('k2', 'planilha.txt', TEMAS[20:])
+
+
+@pytest.fixture
+def embeddings(monkeypatch):
+    """Conta os textos enviados a `EmbeddingsSimulados.embed_documents`."""
+    descartar_indice()
+    enviados = []
+    original = EmbeddingsSimulados.embed_documents
+
+    def contar(self, texts):
+        enviados.extend(texts)
+        return original(self, texts)
+
+    monkeypatch.setattr(EmbeddingsSimulados, 'embed_documents', contar)
+    yield enviados
+    descartar_indice()
+
+
+def test_mesma_chave_reusa_os_embeddings(embeddings):
+    primeira = trechos_relevantes(1, [RELATORIO], 'impostos', EMBEDDING_SIMULADO)
+    assert len(embeddings) == 20
+
+    assert trechos_relevantes(1, [RELATORIO], 'impostos', EMBEDDING_SIMULADO) == primeira
+    assert len(embeddings) == 20
+    # Outra conversa tem o seu próprio índice.
+    trechos_relevantes(2, [RELATORIO], 'impostos', EMBEDDING_SIMULADO)
+    assert len(embeddings) == 40
+
+
+def test_trechos_mais_parecidos_primeiro(embeddings):
+    pergunta = 'contratos contratos contratos vendas vendas energia'
+    [(nome, conteudo)] = trechos_relevantes(1, [RELATORIO], pergunta, EMBEDDING_SIMULADO)
+
+    indice = indice_arquivos_service._indices[1]
+    assert [indice.trechos[i][1] for i in indice.buscar(pergunta, k=3)] == [2, 0, 8]
+    # No prompt, os trechos escolhidos seguem a ordem do documento.
+    assert nome == 'relatorio.txt'
+    assert conteudo.index('vendas') < conteudo.index('contratos') < conteudo.index('energia')
+    assert conteudo.count(MARCA_OMISSAO) == indice_arquivos_service.INDICE_ARQUIVOS_TRECHOS - 1
+
+
+def test_arquivo_novo_entra_no_indice_e_removido_sai(embeddings, monkeypatch):
+    # Todo arquivo passa pelo índice, mesmo a planilha sozinha.
+    monkeypatch.setattr(indice_arquivos_service, 'INDICE_ARQUIVOS_MIN_TOKENS', 0)
+    trechos_relevantes(1, [RELATORIO], 'impostos', EMBEDDING_SIMULADO)
+
+    resultado = dict(trechos_relevantes(1, [RELATORIO, PLANILHA], 'telefonia', EMBEDDING_SIMULADO))
+    # Só os trechos do arquivo novo são convertidos.
+    assert len(embeddings) == 20 + len(TEMAS[20:])
+    assert all(texto.startswith(tuple(TEMAS[20:])) for texto in embeddings[20:])
+    assert 'telefonia' in resultado['planilha.txt']
+
+    resultado = trechos_relevantes(1, [PLANILHA], 'impostos', EMBEDDING_SIMULADO)
+    assert len(embeddings) == 20 + len(TEMAS[20:])
+    assert {chave for chave, _, _ in indice_arquivos_service._indices[1].trechos} == {'k2'}
+    assert [nome for nome, _ in resultado] == ['planilha.txt']
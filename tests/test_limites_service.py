@@ -0,0 +1,123 @@
+from typing import Any
+
+import pytest
+from langchain.chains import LLMChain
+from langchain.prompts import PromptTemplate
+from langchain_core.language_models.llms import LLM
+
+from services import limites_service, modelos_limitados
+from services.limites_service import BaldeFichas, CotaEsgotada, Limitador, obter_limitador
+from services.modelos_limitados import LLMLimitado
+from utils.configs import config_modelos
+
+
+class Relogio:
+    def __init__(self):
+        self.agora = 1000.0
+
+    def __call__(self):
+        return self.agora
+
+
+class ErroTaxa(Exception):
+    status_code = 429
+
+
+class LLMFixo(LLM):
+    """Responde sempre o mesmo texto; as primeiras `recusas` chamadas recebem 429."""
+
+    resposta: str = 'resposta'
+    recusas: int = 0
+    chamadas: Any = None
+
+    @property
+    def _llm_type(self):
+        return 'fixo'
+
+    def _call(self, prompt, stop=None, run_manager=None, **kwargs):
+        self.chamadas.append(prompt)
+        if len(self.chamadas) <= self.recusas:
+            raise ErroTaxa('429 Too Many Requests')
+        return self.resposta
+
+
+@pytest.fixture
+def relogio(monkeypatch):
+    relogio = Relogio()
+    monkeypatch.setattr(limites_service.time, 'monotonic', relogio)
+    return relogio
+
+
+@pytest.fixture
+def cota_teste(monkeypatch):
+    """Um modelo de completação com cota própria e limitador novo."""
+    monkeypatch.setitem(config_modelos['OpenAI']['cotas'], 'completacao-teste', (60, 600))
+    monkeypatch.delitem(limites_service._limitadores, ('OpenAI', 'completacao-teste'), raising=False)
+    yield 'completacao-teste'
+    limites_service._limitadores.pop(('OpenAI', 'completacao-teste'), None)
+
+
+def test_balde_repoe_fichas_com_o_tempo(relogio):
+    balde = BaldeFichas(60)
+    t = relogio.agora
+    assert balde.reservar(60, t) == 0.0
+    # Vazio, a próxima ficha leva um segundo.
+    assert balde.reservar(1, t) == pytest.approx(1.0)
+    assert balde.reservar(1, t + 10) == 0.0
+    # A reposição para na capacidade.
+    balde.reservar(0, t + 1000)
+    assert balde.nivel == 60
+
+
+def test_reserva_maior_que_o_balde_conta_como_balde_cheio(relogio):
+    balde = BaldeFichas(600)
+    t = relogio.agora
+    assert balde.reservar(10000, t) == 0.0
+    assert balde.reservar(10, t) == pytest.approx(1.0)
+
+
+def test_limitador_espera_a_reposicao(relogio):
+    limitador = Limitador(1000, 600)
+    assert limitador.reservar(600) == 0.0
+    assert limitador.reservar(30) == pytest.approx(3.0)
+    relogio.agora += 3.0
+    assert limitador.reservar(30) == pytest.approx(3.0)
+    assert limitador.estatisticas()['esperas'] == 2
+
+
+def test_cota_esgotada_apos_a_espera_maxima(relogio, monkeypatch):
+    monkeypatch.setattr(limites_service, 'ESPERA_MAXIMA_COTA_S', 5.0)
+    limitador = Limitador(1000, 600)
+    limitador.reservar(600)
+    assert limitador.reservar(30) == pytest.approx(3.0)
+    with pytest.raises(CotaEsgotada):
+        limitador.reservar(30)
+    # Quem desistiu não deixa nada reservado.
+    assert limitador.reservar(10) == pytest.approx(4.0)
+    assert limitador.estatisticas()['desistencias'] == 1
+
+
+def test_acerto_devolve_tokens_nao_usados(relogio):
+    limitador = Limitador(1000, 600)
+    limitador.reservar(600)
+    limitador.acertar(600, 100)
+    assert limitador.reservar(500) == 0.0
+
+
+def test_completacao_conta_na_cota(cota_teste):
+    llm = LLMLimitado(llm=LLMFixo(chamadas=[]), provedor='OpenAI', modelo=cota_teste)
+    cadeia = LLMChain(llm=llm, prompt=PromptTemplate.from_template('Pergunta: {question}'))
+    assert cadeia.invoke({'question': 'qual o prazo?'})['text'] == 'resposta'
+
+    limitador = obter_limitador('OpenAI', cota_teste)
+    assert limitador.estatisticas()['chamadas'] == 1
+    assert limitador.estatisticas()['uso_requisicoes'] == pytest.approx(1 / 60, abs=1e-3)
+
+
+def test_completacao_repete_apos_429(cota_teste, monkeypatch):
+    monkeypatch.setattr(modelos_limitados, 'espera_backoff', lambda tentativa, erro=None: 0)
+    fixo = LLMFixo(chamadas=[], recusas=2)
+    llm = LLMLimitado(llm=fixo, provedor='OpenAI', modelo=cota_teste)
+    assert llm.invoke('qual o prazo?') == 'resposta'
+    assert len(fixo.chamadas) == 3
+    assert obter_limitador('OpenAI', cota_teste).estatisticas()['recusas_429'] == 2
@@ -0,0 +1,60 @@
+import threading
+
+import pytest
+
+from db import manutencao
+
+
+@pytest.fixture
+def agendador(monkeypatch):
+    monkeypatch.setattr(manutencao, '_agendador', None)
+    yield
+    if manutencao._agendador is not None:
+        manutencao._agendador.set()
+    # A thread não pode sobreviver aos monkeypatches nem ao banco do teste.
+    for thread in threading.enumerate():
+        if thread.name == 'veronia-manutencao':
+            thread.join(5)
+
+
+def test_manutencao_volta_a_rodar_enquanto_o_processo_vive(banco, agendador, monkeypatch):
+    execucoes = []
+    tres = threading.Event()
+
+    def executar(converter_vacuum):
+        execucoes.append(converter_vacuum)
+        if len(execucoes) == 3:
+            tres.set()
+
+    pendencias = iter([True, False, True, True])
+    monkeypatch.setattr(manutencao, 'manutencao_pendente', lambda intervalo: next(pendencias, False))
+    monkeypatch.setattr(manutencao, 'executar_manutencao', executar)
+
+    parar = manutencao.agendar_manutencao(verificacao_s=0.02)
+    # Os reruns do Streamlit não iniciam outra thread.
+    assert manutencao.agendar_manutencao(verificacao_s=0.02) is parar
+    assert tres.wait(5)
+    assert execucoes == [False, False, False]
+
+
+def test_erro_na_manutencao_nao_para_o_agendamento(banco, agendador, monkeypatch):
+    execucoes = []
+    duas = threading.Event()
+
+    def executar(converter_vacuum):
+        execucoes.append(converter_vacuum)
+        if len(execucoes) == 2:
+            duas.set()
+        raise ValueError('falha simulada')
+
+    monkeypatch.setattr(manutencao, 'manutencao_pendente', lambda intervalo: True)
+    monkeypatch.setattr(manutencao, 'executar_manutencao', executar)
+    manutencao.agendar_manutencao(verificacao_s=0.02)
+    assert duas.wait(5)
+
+
+def test_manutencao_real_registra_execucao_e_deixa_de_ficar_pendente(banco):
+    assert manutencao.manutencao_pendente()
+    relatorio = manutencao.executar_manutencao(converter_vacuum=False)
+    assert relatorio['integridade'] == 'ok'
+    assert not manutencao.manutencao_pendente()
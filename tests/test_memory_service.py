@@ -0,0 +1,191 @@
+from types import SimpleNamespace
+
+import pytest
+import streamlit as st
+from langchain_core.messages import SystemMessage
+
+from db import db_sqlite
+from services import memory_service
+from services.conversation_service import carregar_mensagens_anteriores_service, seleciona_conversa_service
+from services.memory_service import (
+    adicionar_mensagem, demanda_historico, descartar_memoria, montar_historico, obter_memoria, tokens_mensagem
+)
+from utils.constants import CHAT_MESSAGE_LIMIT
+from utils.tokens import TOKENS_POR_MENSAGEM, contar_tokens
+
+
+class ChatFalso:
+    """Modelo de chat que devolve um resumo fixo e guarda os prompts recebidos."""
+
+    def __init__(self):
+        self.prompts = []
+
+    def invoke(self, prompt):
+        self.prompts.append(prompt)
+        return SimpleNamespace(content=f'resumo {len(self.prompts)}')
+
+
+@pytest.fixture(autouse=True)
+def memorias_limpas():
+    descartar_memoria()
+    yield
+    descartar_memoria()
+
+
+def _mensagens(n, inicio=0):
+    return [
+        {'role': 'user' if i % 2 == 0 else 'assistant', 'content': f'mensagem {i:02d} ' + 'texto ' * 40}
+        for i in range(inicio, inicio + n)
+    ]
+
+
+def _conversa_gravada(n):
+    """Conversa com `n` mensagens no banco e o histórico da sessão (com IDs) mais a entrada atual."""
+    conversa_id = db_sqlite.criar_conversa('Longa', 'Groq', 'modelo')
+    db_sqlite.salvar_mensagens(conversa_id, _mensagens(n))
+    historico = db_sqlite.carregar_mensagens_pagina(conversa_id, limite=n)
+    adicionar_mensagem(historico, 'user', 'E agora?', conversa_id)
+    return conversa_id, historico
+
+
+def _tokens_enviados(selecionadas, resumo):
+    mensagens = [m for m in selecionadas if not isinstance(m, SystemMessage)]
+    return (resumo['tokens'] if resumo else 0) + sum(contar_tokens(m.content) + TOKENS_POR_MENSAGEM for m in mensagens)
+
+
+def test_resumo_acionado_ao_estourar_o_orcamento(banco):
+    conversa_id, historico = _conversa_gravada(20)
+    anteriores = historico[:-1]
+    orcamento = 8 * tokens_mensagem(anteriores[0])
+    assert demanda_historico(conversa_id, historico, orcamento) == orcamento
+
+    chat = ChatFalso()
+    selecionadas = montar_historico(conversa_id, historico, obter_memoria(conversa_id, historico), orcamento, chat)
+
+    assert len(chat.prompts) == 1
+    assert anteriores[0]['content'] in chat.prompts[0]
+    resumo = db_sqlite.carregar_resumo(conversa_id)
+    assert resumo['resumo'] == 'resumo 1'
+    # A janela recua para metade do orçamento: 4 mensagens ficam, as outras vão para o resumo.
+    assert resumo['ate_mensagem_id'] == anteriores[-5]['id']
+    assert isinstance(selecionadas[0], SystemMessage) and 'resumo 1' in selecionadas[0].content
+    assert [m.content for m in selecionadas[1:]] == [m['content'] for m in anteriores[-4:]]
+    assert _tokens_enviados(selecionadas, resumo) <= orcamento
+
+    # Com o resumo em dia, o turno seguinte não resume de novo.
+    assert montar_historico(conversa_id, historico, obter_memoria(conversa_id, historico), orcamento, chat) == selecionadas
+    assert len(chat.prompts) == 1
+    assert demanda_historico(conversa_id, historico, orcamento) == resumo['tokens'] + sum(
+        tokens_mensagem(m) for m in anteriores[-4:]
+    )
+
+
+def test_limite_zero_nao_envia_nem_resume(banco):
+    conversa_id, historico = _conversa_gravada(4)
+    memoria = obter_memoria(conversa_id, historico)
+    chat = ChatFalso()
+
+    assert montar_historico(conversa_id, historico, memoria, 10000, chat, limite=0) == []
+    # O limite do turno não antecipa o resumo.
+    assert chat.prompts == []
+    assert db_sqlite.carregar_resumo(conversa_id) is None
+
+    # Nem o resumo já existente entra.
+    db_sqlite.salvar_resumo(conversa_id, historico[1]['id'], 'resumo antigo', contar_tokens('resumo antigo'))
+    assert montar_historico(conversa_id, historico, memoria, 10000, chat, limite=0) == []
+    assert chat.prompts == []
+
+
+def test_mensagens_sem_id_nunca_sao_resumidas(banco):
+    conversa_id = db_sqlite.criar_conversa('Nova', 'Groq', 'modelo')
+    # Nada gravado ainda: todas as mensagens estão na fila de escrita.
+    historico = []
+    for mensagem in _mensagens(12) + [{'role': 'user', 'content': 'E agora?'}]:
+        adicionar_mensagem(historico, mensagem['role'], mensagem['content'], conversa_id)
+    anteriores = historico[:-1]
+    orcamento = 6 * tokens_mensagem(anteriores[0])
+    chat = ChatFalso()
+
+    selecionadas = montar_historico(conversa_id, historico, obter_memoria(conversa_id, historico), orcamento, chat)
+    assert chat.prompts == []
+    assert db_sqlite.carregar_resumo(conversa_id) is None
+    # O excedente fica de fora só neste turno; a janela usa o orçamento inteiro.
+    assert [m.content for m in selecionadas] == [m['content'] for m in anteriores[-6:]]
+    assert demanda_historico(conversa_id, historico, 10 * orcamento) == sum(tokens_mensagem(m) for m in anteriores)
+
+
+def test_resumo_para_nas_mensagens_ja_gravadas(banco):
+    conversa_id, historico = _conversa_gravada(4)
+    gravadas = historico[:-1]
+    ultima = historico.pop()
+    for mensagem in _mensagens(10, inicio=4) + [ultima]:
+        adicionar_mensagem(historico, mensagem['role'], mensagem['content'], conversa_id)
+    anteriores = historico[:-1]
+    orcamento = 6 * tokens_mensagem(anteriores[0])
+    chat = ChatFalso()
+
+    selecionadas = montar_historico(conversa_id, historico, obter_memoria(conversa_id, historico), orcamento, chat)
+
+    assert len(chat.prompts) == 1
+    assert gravadas[-1]['content'] in chat.prompts[0]
+    assert anteriores[len(gravadas)]['content'] not in chat.prompts[0]
+    resumo = db_sqlite.carregar_resumo(conversa_id)
+    assert resumo['ate_mensagem_id'] == gravadas[-1]['id']
+    assert _tokens_enviados(selecionadas, resumo) <= orcamento
+    # As mensagens ainda sem ID continuam pendentes para o próximo resumo.
+    assert demanda_historico(conversa_id, historico, 10 * orcamento) == resumo['tokens'] + sum(
+        tokens_mensagem(m) for m in anteriores[len(gravadas):]
+    )
+
+
+def test_memoria_acompanha_o_historico_sem_reconstruir():
+    historico = []
+    adicionar_mensagem(historico, 'user', 'oi', 1)
+    memoria = obter_memoria(1, historico)
+    adicionar_mensagem(historico, 'assistant', 'olá', 1)
+    adicionar_mensagem(historico, 'user', 'tudo bem?', 1)
+
+    assert obter_memoria(1, historico) is memoria
+    assert [m.content for m in memoria.buffer_as_messages] == ['oi', 'olá', 'tudo bem?']
+
+
+def test_lru_descarta_a_conversa_menos_usada(monkeypatch):
+    monkeypatch.setattr(memory_service, 'MEMORIAS_MAXIMAS', 3)
+    historicos = {conversa_id: _mensagens(2) for conversa_id in range(1, 5)}
+    memorias = {conversa_id: obter_memoria(conversa_id, historicos[conversa_id]) for conversa_id in (1, 2, 3)}
+
+    # Usar a conversa 1 de novo a torna a mais recente; a 2 passa a ser a próxima a sair.
+    assert obter_memoria(1, historicos[1]) is memorias[1]
+    obter_memoria(4, historicos[4])
+
+    assert list(memory_service._memorias) == [3, 1, 4]
+    assert obter_memoria(1, historicos[1]) is memorias[1]
+    assert obter_memoria(3, historicos[3]) is memorias[3]
+    assert obter_memoria(2, historicos[2]) is not memorias[2]
+    assert list(memory_service._memorias) == [1, 3, 2]
+
+
+def test_memoria_reconstruida_ao_trocar_o_historico_da_sessao(banco):
+    st.session_state.clear()
+    conversa_id = db_sqlite.criar_conversa('Longa', 'Groq', 'modelo')
+    db_sqlite.salvar_mensagens(conversa_id, _mensagens(2 * CHAT_MESSAGE_LIMIT))
+    try:
+        seleciona_conversa_service(conversa_id)
+        memoria = obter_memoria(conversa_id, st.session_state['historico'])
+        assert len(memoria.buffer_as_messages) == CHAT_MESSAGE_LIMIT
+
+        # A página anterior entra na frente do histórico: a memória é refeita com ela.
+        carregar_mensagens_anteriores_service()
+        historico = st.session_state['historico']
+        recarregada = obter_memoria(conversa_id, historico)
+        assert recarregada is not memoria
+        assert [m.content for m in recarregada.buffer_as_messages] == [m['content'] for m in historico]
+
+        # Reabrir a conversa traz objetos novos do banco, ainda que do mesmo tamanho.
+        seleciona_conversa_service(conversa_id)
+        reaberta = obter_memoria(conversa_id, st.session_state['historico'])
+        assert reaberta is not recarregada
+        seleciona_conversa_service(conversa_id)
+        assert obter_memoria(conversa_id, st.session_state['historico']) is not reaberta
+    finally:
+        st.session_state.clear()
@@ -0,0 +1,53 @@
+import threading
+import time
+
+from db import db_sqlite
+from db.fila_escrita import aguardar_escritas, enfileirar_mensagens
+from services.metricas_service import MedicaoTurno, medias_turnos, registrar_turno
+
+
+def test_metricas_gravadas_pela_fila_apos_o_turno(banco):
+    conversa_id = db_sqlite.criar_conversa('Métricas', 'Groq', 'modelo')
+    medicao = MedicaoTurno()
+    with medicao.etapa('extracao'):
+        pass
+    medicao.ttft = 0.2
+    medidas = medicao.medidas({'cache': True})
+    gravadas = []
+
+    def gravar(_futuro):
+        # Como `registrar_metricas_turno`: roda na thread da fila de escrita.
+        medidas['persistencia_s'] = 0.01
+        gravadas.append(registrar_turno(conversa_id, 'Groq', 'modelo', medidas))
+
+    enfileirar_mensagens(conversa_id, [{'role': 'user', 'content': 'oi'}]).add_done_callback(gravar)
+    assert aguardar_escritas(timeout=10)
+    gravadas[0].result(timeout=10)
+
+    medias = medias_turnos()
+    assert medias['turnos'] == 1
+    assert medias['ttft_s'] == 0.2
+    assert medias['persistencia_s'] == 0.01
+    assert medias['cache'] == 1
+
+
+def test_registrar_turno_nao_espera_o_escritor(banco):
+    liberar = threading.Event()
+    segurando = threading.Event()
+
+    def segurar_escritor():
+        with banco.manutencao():
+            segurando.set()
+            liberar.wait(10)
+
+    threading.Thread(target=segurar_escritor, daemon=True).start()
+    segurando.wait(5)
+    try:
+        inicio = time.monotonic()
+        futuro = registrar_turno(None, 'Groq', 'modelo', {'total_s': 1.0})
+        duracao = time.monotonic() - inicio
+    finally:
+        liberar.set()
+    assert duracao < 0.5
+    futuro.result(timeout=10)
+    assert medias_turnos()['turnos'] == 1
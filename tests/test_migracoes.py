@@ -0,0 +1,90 @@
+import sqlite3
+
+import pytest
+
+from db import db_sqlite
+from db.compressao import CODEC_TEXTO, CODEC_ZLIB
+from db.fila_escrita import aguardar_escritas
+from db.migracoes import VERSAO_ESQUEMA, versao_atual
+
+LONGA = 'Análise de exceções no fechamento contábil. ' * 80
+
+TABELAS = {
+    'conversas', 'mensagens', 'busca_mensagens', 'busca_conversas', 'manutencao_execucoes',
+    'resumos_conversa', 'cache_respostas', 'latencias_ttft', 'metricas_turno',
+    'extracoes_arquivo', 'arquivos_conversa', 'busca_pendente',
+}
+
+
+def _criar_banco_original(caminho):
+    """Banco como o `init_database` anterior às migrações o deixava."""
+    conn = sqlite3.connect(caminho)
+    with conn:
+        conn.execute("""
+            CREATE TABLE conversas (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                titulo TEXT NOT NULL,
+                provedor TEXT,
+                modelo TEXT,
+                data_criacao DATETIME DEFAULT CURRENT_TIMESTAMP
+            );
+        """)
+        conn.execute("""
+            CREATE TABLE mensagens (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                conversa_id INTEGER,
+                role TEXT NOT NULL,
+                content TEXT NOT NULL,
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (conversa_id) REFERENCES conversas(id) ON DELETE CASCADE
+            );
+        """)
+        conn.execute("INSERT INTO conversas (titulo, provedor, modelo) VALUES ('Orçamento anual', 'Groq', 'm');")
+        conn.execute("INSERT INTO conversas (titulo, provedor, modelo) VALUES ('Outra', 'Groq', 'm');")
+        conn.executemany(
+            "INSERT INTO mensagens (conversa_id, role, content) VALUES (?, ?, ?);",
+            [(2, 'user', 'primeira pergunta'), (1, 'user', 'Qual é a previsão?'), (1, 'assistant', LONGA)],
+        )
+    conn.close()
+
+
+@pytest.fixture
+def banco_original(tmp_path):
+    caminho = str(tmp_path / 'veronia.db')
+    _criar_banco_original(caminho)
+    anterior = db_sqlite.DB_FILE
+    db_sqlite.configurar_banco(caminho)
+    yield caminho
+    aguardar_escritas(timeout=10)
+    db_sqlite.configurar_banco(anterior)
+
+
+def test_banco_original_migra_ate_a_versao_atual(banco_original):
+    db_sqlite.init_database()
+
+    with db_sqlite.get_pool().leitura() as conn:
+        assert versao_atual(conn) == VERSAO_ESQUEMA
+        tabelas = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table';")}
+        linhas = conn.execute("SELECT id, codec, tokens FROM mensagens ORDER BY id;").fetchall()
+    assert TABELAS <= tabelas
+    assert [row['codec'] for row in linhas] == [CODEC_TEXTO, CODEC_TEXTO, CODEC_ZLIB]
+    assert all(row['tokens'] > 0 for row in linhas)
+
+    assert [m['content'] for m in db_sqlite.carregar_mensagens(1)] == ['Qual é a previsão?', LONGA]
+    # A conversa com a mensagem mais recente vem primeiro.
+    assert [conversa_id for conversa_id, _ in db_sqlite.listar_conversas()] == [1, 2]
+    assert {r['conversa_id'] for r in db_sqlite.buscar_conversas('excecoes contabil')} == {1}
+    assert {r['conversa_id'] for r in db_sqlite.buscar_conversas('orcamento')} == {1}
+
+
+def test_banco_migrado_continua_gravando_e_a_migracao_nao_repete(banco_original):
+    db_sqlite.init_database()
+    db_sqlite.salvar_mensagens(2, [{'role': 'assistant', 'content': 'resposta após a migração'}])
+
+    db_sqlite.configurar_banco(banco_original)
+    db_sqlite.init_database()
+    with db_sqlite.get_pool().leitura() as conn:
+        assert versao_atual(conn) == VERSAO_ESQUEMA
+        assert conn.execute("SELECT COUNT(*) FROM mensagens;").fetchone()[0] == 4
+    assert {r['conversa_id'] for r in db_sqlite.buscar_conversas('migracao')} == {2}
+    assert [conversa_id for conversa_id, _ in db_sqlite.listar_conversas()] == [2, 1]
@@ -0,0 +1,69 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from services.perfil_tabela import PerfilTabela, perfil_csv
+
+EXATAS = ['count', 'mean', 'std', 'min', 'max']
+QUARTIS = ['25%', '50%', '75%']
+
+
+def _csv(tabela):
+    arquivo = io.BytesIO(tabela.to_csv(index=False).encode('utf-8'))
+    arquivo.name = 'dados.csv'
+    return arquivo
+
+
+def _tabela(linhas, semente=0):
+    rng = np.random.default_rng(semente)
+    return pd.DataFrame({
+        'valor': rng.normal(100.0, 15.0, linhas).round(3),
+        'quantidade': rng.integers(0, 1000, linhas),
+        'categoria': rng.choice(['a', 'b', 'c'], linhas),
+    })
+
+
+def test_tabela_pequena_igual_ao_describe():
+    tabela = _tabela(5000)
+    tabela.loc[4500:, 'quantidade'] = None  # vazios no último bloco viram float
+
+    perfil = perfil_csv(_csv(tabela))
+    esperado = pd.read_csv(_csv(tabela))
+
+    assert not perfil.amostrado()
+    pd.testing.assert_frame_equal(perfil.descricao(), esperado.describe(), check_exact=False, rtol=1e-9)
+    pd.testing.assert_frame_equal(perfil.primeiras_linhas(), esperado.head())
+    assert 'estimados' not in ''.join(perfil.resumo())
+
+
+def test_acima_da_amostra_estatisticas_exatas_e_quartis_estimados():
+    tabela = _tabela(150_000, semente=1)
+    perfil = perfil_csv(_csv(tabela))
+    descricao = perfil.descricao()
+    esperado = pd.read_csv(_csv(tabela)).describe()
+
+    assert perfil.amostrado()
+    assert perfil.linhas == 150_000
+    pd.testing.assert_frame_equal(descricao.loc[EXATAS], esperado.loc[EXATAS], check_exact=False, rtol=1e-9)
+    # Os quartis vêm de uma amostra uniforme de 100 mil linhas: diferem do
+    # describe completo, mas por uma fração pequena do intervalo dos dados.
+    amplitude = esperado.loc['max'] - esperado.loc['min']
+    erro = (descricao.loc[QUARTIS] - esperado.loc[QUARTIS]).abs() / amplitude
+    assert (erro < 0.01).all().all()
+    assert f'(quartis estimados em uma amostra de {perfil.tamanho_amostra} linhas)' in ''.join(perfil.resumo())
+
+
+def test_amostra_e_uniforme_entre_os_blocos():
+    perfil = PerfilTabela(tamanho_amostra=2000, semente=3)
+    # Blocos com distribuições diferentes: a amostra precisa cobrir todos.
+    for inicio in range(0, 20_000, 1000):
+        perfil.adicionar(pd.DataFrame({'x': np.arange(inicio, inicio + 1000, dtype=float)}))
+
+    assert len(perfil.amostra) == 2000
+    # Com 2000 linhas, o erro padrão da mediana é ~220; a tolerância é ~4 vezes isso.
+    quartis = perfil.descricao().loc[QUARTIS, 'x'].to_numpy()
+    assert quartis == pytest.approx([5000, 10000, 15000], abs=1000)
+    por_bloco = np.bincount((perfil.amostra['x'] // 1000).astype(int), minlength=20)
+    assert por_bloco.min() > 50
@@ -0,0 +1,18 @@
+import sqlite3
+
+import pytest
+
+from db import db_sqlite
+
+
+def test_commit_com_erro_desfaz_a_transacao(banco):
+    with pytest.raises(sqlite3.IntegrityError):
+        with banco.escrita() as conn:
+            # Com a checagem adiada, a violação só aparece no COMMIT.
+            conn.execute("PRAGMA defer_foreign_keys = ON;")
+            conn.execute("INSERT INTO mensagens (conversa_id, role, content) VALUES (9999, 'user', 'x');")
+
+    conversa_id = db_sqlite.criar_conversa('Depois da falha', 'Groq', 'modelo')
+    assert conversa_id
+    with banco.leitura() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM mensagens;").fetchone()[0] == 0
@@ -0,0 +1,112 @@
+from pathlib import Path
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+from services.prompt_service import (
+    MARCA_OMISSAO, distribuir_orcamento, montar_prompt, orcamento_prompt, reserva_resposta, tokens_mensagens
+)
+from utils.configs import config_modelos
+from utils.constants import HISTORICO_MIN_FRACAO_PROMPT, PROMPT_MAX_TOKENS, RESERVA_RESPOSTA_TOKENS
+
+PROMPT_SISTEMA = (Path(__file__).parent.parent / 'prompts' / 'system_prompt.txt').read_text(encoding='utf-8')
+
+
+@pytest.fixture
+def modelo_pequeno(monkeypatch):
+    """Um provedor de teste com janelas pequenas."""
+    monkeypatch.setitem(config_modelos, 'Teste', {'contexto': {'4k': 4096, '2k': 2048}})
+    return 'Teste'
+
+
+def _historico(mensagens):
+    """Par (demanda, montar) como o de `chat_interface`, sobre mensagens já prontas."""
+    def montar(limite):
+        selecionadas, usados = [], 0
+        for mensagem in reversed(mensagens):
+            custo = tokens_mensagens([mensagem])
+            if usados + custo > limite:
+                break
+            selecionadas.insert(0, mensagem)
+            usados += custo
+        return selecionadas
+    return tokens_mensagens(mensagens), montar
+
+
+def test_distribui_proporcional_sem_passar_da_demanda():
+    alocacao = distribuir_orcamento({'historico': 100, 'rag': 5000, 'arquivos': 5000}, 3000)
+    assert alocacao['historico'] == 100
+    # O que o histórico não usou vai para as outras fontes, com o mesmo peso.
+    assert alocacao['rag'] == alocacao['arquivos'] == 1450
+    assert sum(alocacao.values()) <= 3000
+
+
+def test_distribui_tudo_quando_cabe():
+    demandas = {'historico': 300, 'rag': 0, 'arquivos': 700}
+    assert distribuir_orcamento(demandas, 5000) == demandas
+
+
+def test_orcamento_negativo_nao_aloca_nada():
+    assert distribuir_orcamento({'historico': 500, 'arquivos': 500}, -200) == {'historico': 0, 'arquivos': 0}
+
+
+def test_minimos_valem_mesmo_sem_orcamento():
+    demandas = {'historico': 500, 'rag': 0, 'arquivos': 2000}
+    alocacao = distribuir_orcamento(demandas, -200, minimos={'historico': 300, 'rag': 100})
+    assert alocacao == {'historico': 300, 'rag': 0, 'arquivos': 0}
+    # O mínimo nunca passa da demanda e o resto do orçamento é dividido.
+    alocacao = distribuir_orcamento(demandas, 1000, minimos={'historico': 800})
+    assert alocacao['historico'] == 500
+    assert alocacao['arquivos'] == 500
+
+
+def test_reserva_acompanha_a_janela(modelo_pequeno):
+    assert reserva_resposta(128000) == RESERVA_RESPOSTA_TOKENS
+    assert reserva_resposta(4096) == 1024
+    assert orcamento_prompt(modelo_pequeno, '4k') == 3072
+    assert orcamento_prompt('Groq', 'gemma2-9b-it') == 8192 - RESERVA_RESPOSTA_TOKENS
+    assert orcamento_prompt('Ollama', 'llama3.1:8b') == PROMPT_MAX_TOKENS
+
+
+def test_ollama_envia_historico_e_arquivo_inteiros():
+    mensagens = [HumanMessage(content=f"mensagem anterior {i} " * 20) for i in range(10)]
+    arquivo = ('notas.txt', 'Reunião de planejamento do trimestre. ' * 100)
+    prompt = montar_prompt(
+        'Resuma as notas.', 'Ollama', 'llama3.1:8b',
+        prompt_sistema=PROMPT_SISTEMA, arquivos=[arquivo], historico=_historico(mensagens)
+    )
+    assert prompt['cortes'] == []
+    assert prompt['aviso'] is None
+    assert prompt['historico'] == mensagens
+    assert arquivo[1] in prompt['entrada']
+    assert prompt['total'] <= prompt['orcamento']
+
+
+def test_janela_pequena_reduz_arquivos_mas_mantem_historico(modelo_pequeno):
+    mensagens = [HumanMessage(content=f"mensagem anterior {i} " * 20) for i in range(10)]
+    arquivo = ('relatorio.txt', '\n\n'.join(f"Seção {i}: vendas do trimestre. " * 30 for i in range(20)))
+    prompt = montar_prompt(
+        'Quais foram as vendas?', modelo_pequeno, '4k',
+        prompt_sistema=PROMPT_SISTEMA, arquivos=[arquivo], historico=_historico(mensagens)
+    )
+    assert prompt['aviso'] is None
+    assert 'arquivos' in prompt['cortes']
+    assert prompt['historico']
+    assert prompt['tokens']['historico'] >= 0.5 * int(prompt['orcamento'] * HISTORICO_MIN_FRACAO_PROMPT)
+    assert prompt['total'] <= prompt['orcamento']
+
+
+def test_prompt_de_sistema_acima_do_orcamento_avisa(modelo_pequeno, caplog):
+    mensagens = [HumanMessage(content=f"mensagem anterior {i} " * 20) for i in range(10)]
+    prompt = montar_prompt(
+        'E agora?', modelo_pequeno, '2k',
+        prompt_sistema=PROMPT_SISTEMA * 2, arquivos=[('a.txt', 'conteúdo ' * 500)], historico=_historico(mensagens)
+    )
+    assert prompt['aviso'] and 'excedem o orçamento' in prompt['aviso']
+    assert prompt['aviso'] in caplog.text
+    # A pergunta vai inteira e o histórico fica com a parte mínima.
+    assert prompt['entrada'].endswith('E agora?')
+    assert prompt['historico']
+    assert 0 < prompt['tokens']['historico'] <= int(prompt['orcamento'] * HISTORICO_MIN_FRACAO_PROMPT)
+    assert f"{MARCA_OMISSAO} (omitido por limite de contexto)" in prompt['entrada']
+    assert set(prompt['cortes']) == {'arquivos', 'historico'}
@@ -0,0 +1,39 @@
+import threading
+import time
+
+from db.fila_escrita import aguardar_escritas
+from db.latencias import histograma
+from services.roteamento_service import transmitir_com_reserva
+
+
+class ChainFixa:
+    def __init__(self, pedacos):
+        self.pedacos = pedacos
+
+    def stream(self, entrada):
+        yield from self.pedacos
+
+
+def test_primeiro_token_nao_espera_o_lock_de_escrita(banco, monkeypatch):
+    monkeypatch.delenv('OPENAI_API_KEY', raising=False)
+    monkeypatch.delenv('GROQ_API_KEY', raising=False)
+    liberar = threading.Event()
+
+    def segurar_escritor():
+        # Como um VACUUM ou ANALYZE longo da manutenção.
+        with banco.manutencao():
+            liberar.wait(10)
+
+    threading.Thread(target=segurar_escritor, daemon=True).start()
+    time.sleep(0.05)
+    try:
+        inicio = time.monotonic()
+        pedacos = list(transmitir_com_reserva(ChainFixa(['olá', ' mundo']), {}, 'Groq', 'teste', prazo=5))
+        duracao = time.monotonic() - inicio
+    finally:
+        liberar.set()
+
+    assert pedacos == ['olá', ' mundo']
+    assert duracao < 1
+    assert aguardar_escritas(timeout=10)
+    assert histograma('Groq', 'teste') == [(0.25, 1)]
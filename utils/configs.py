@@ -11,27 +11,160 @@ Atributos:
         configuração é um dicionário contendo:
         - 'modelos' (list[str]): Uma lista de identificadores de modelos
           específicos oferecidos por aquele provedor.
-        - 'chat' (class): A referência à classe do LangChain (ex: ChatOpenAI)
-          responsável por interagir com a API daquele provedor.
+        - 'chat' (str): O caminho de importação ('modulo:Classe') da classe
+          do LangChain (ex: ChatOpenAI) responsável por interagir com a API
+          daquele provedor. A classe só é importada quando um modelo do
+          provedor é carregado (veja `carregar_classe_chat`), então iniciar
+          a aplicação não importa o SDK de todos os provedores.
+        - 'contexto' (dict[str, int]): A janela de contexto, em tokens, de
+          cada modelo. Modelos ausentes usam `CONTEXTO_PADRAO_TOKENS`.
+        - 'reserva' (tuple[str, str] | None): Provedor e modelo acionados
+          quando este provedor não começa a responder a tempo (veja
+          `services.roteamento_service`).
+        - 'parametro_janela' (str, opcional): O argumento da classe de chat
+          que define a janela usada pelo servidor (ex: `num_ctx` do Ollama).
+          Recebe a janela que o prompt pode ocupar (veja
+          `services.prompt_service.janela_utilizada`).
+        - 'local' (bool, opcional): O provedor roda na máquina e não precisa
+          de chave de API (ex: Ollama).
+        - 'cotas' (dict[str, tuple[int, int]], opcional): Requisições e tokens
+          por minuto permitidos a cada modelo, de chat, de completação ou de
+          embedding (veja `services.limites_service`). Modelos ausentes não
+          são limitados.
 """
 
-from langchain_openai import ChatOpenAI
-from langchain_groq import ChatGroq
-from langchain_community.chat_models import ChatOllama
+import importlib
+import os
+from functools import lru_cache
 
 
 
 config_modelos = {
     'Groq': {
         'modelos':['llama-3.3-70b-versatile', 'gemma2-9b-it', 'llama-3.1-8b-instant'],
-        'chat': ChatGroq
+        'chat': 'langchain_groq:ChatGroq',
+        'contexto': {
+            'llama-3.3-70b-versatile': 131072,
+            'gemma2-9b-it': 8192,
+            'llama-3.1-8b-instant': 131072,
+        },
+        'reserva': ('OpenAI', 'gpt-4o-mini'),
+        # Plano gratuito.
+        'cotas': {
+            'llama-3.3-70b-versatile': (30, 12000),
+            'gemma2-9b-it': (30, 15000),
+            'llama-3.1-8b-instant': (30, 6000),
+        },
     },
     'OpenAI': {
         'modelos': ['gpt-4o', 'o4-mini-2025-04-16', 'gpt-4o-mini', 'o1-mini'],
-        'chat': ChatOpenAI
+        'chat': 'langchain_openai:ChatOpenAI',
+        'contexto': {
+            'gpt-4o': 128000,
+            'o4-mini-2025-04-16': 200000,
+            'gpt-4o-mini': 128000,
+            'o1-mini': 128000,
+        },
+        'reserva': ('Groq', 'llama-3.3-70b-versatile'),
+        # Nível 1 de uso.
+        'cotas': {
+            'gpt-4o': (500, 30000),
+            'o4-mini-2025-04-16': (500, 200000),
+            'gpt-4o-mini': (500, 200000),
+            'o1-mini': (500, 200000),
+            'gpt-3.5-turbo-instruct': (3500, 90000),
+            'text-embedding-3-small': (3000, 1000000),
+            'text-embedding-3-large': (3000, 1000000),
+            'text-embedding-ada-002': (3000, 1000000),
+        },
     },
         'Ollama':{
         'modelos': ['llama3.1:8b', 'mistral:7b-instruct', 'qwen3:8b', 'hermes3:8b', 'codellama:7b-instruct', 'deepseek-coder:6.7b-instruct'],
-        'chat': ChatOllama
+        'chat': 'langchain_community.chat_models:ChatOllama',
+        # Janela de cada modelo. O servidor usa uma janela menor por padrão,
+        # então a janela usada pelo prompt é enviada como `num_ctx`.
+        'contexto': {
+            'llama3.1:8b': 131072,
+            'mistral:7b-instruct': 32768,
+            'qwen3:8b': 40960,
+            'hermes3:8b': 131072,
+            'codellama:7b-instruct': 16384,
+            'deepseek-coder:6.7b-instruct': 16384,
+        },
+        'parametro_janela': 'num_ctx',
+        'reserva': None,
+        'local': True,
     },
 }
+
+CONTEXTO_PADRAO_TOKENS = 4096
+
+# Modelo de embedding que usa `EmbeddingsSimulados` em vez da API da OpenAI.
+EMBEDDING_SIMULADO = 'simulado'
+# Modelo de completação da OpenAI usado pelo agente RAG.
+MODELO_COMPLETACAO_RAG = 'gpt-3.5-turbo-instruct'
+
+
+def registrar_provedor_simulado():
+    """Adiciona o provedor 'Simulado' (veja `services.provedor_simulado`) ao cardápio."""
+    config_modelos['Simulado'] = {
+        'modelos': ['rapido', 'lento', 'instavel'],
+        'chat': 'services.provedor_simulado:ChatSimulado',
+        'contexto': {},
+        'reserva': None,
+        'local': True,
+    }
+
+
+if os.getenv('VERONIA_PROVEDOR_SIMULADO'):
+    registrar_provedor_simulado()
+
+
+def janela_contexto(provedor, modelo):
+    """Retorna a janela de contexto, em tokens, de um modelo configurado."""
+    return config_modelos.get(provedor, {}).get('contexto', {}).get(modelo, CONTEXTO_PADRAO_TOKENS)
+
+
+@lru_cache(maxsize=None)
+def importar_classe(caminho):
+    """Importa uma classe a partir de um caminho 'pacote.modulo:Classe'."""
+    modulo, _, nome = caminho.partition(':')
+    return getattr(importlib.import_module(modulo), nome)
+
+
+def carregar_classe_chat(provedor):
+    """Retorna a classe de chat de um provedor, importando-a na primeira chamada."""
+    return importar_classe(config_modelos[provedor]['chat'])
+
+
+def cota_modelo(provedor, modelo):
+    """Retorna (requisições/min, tokens/min) do modelo, ou None se não há limite."""
+    return config_modelos.get(provedor, {}).get('cotas', {}).get(modelo)
+
+
+def parametro_janela(provedor):
+    """Retorna o argumento da classe de chat que define a janela, ou None."""
+    return config_modelos.get(provedor, {}).get('parametro_janela')
+
+
+def provedor_local(provedor):
+    """Indica se o provedor dispensa chave de API."""
+    return config_modelos.get(provedor, {}).get('local', False)
+
+
+def criar_embeddings(modelo):
+    """Cria o objeto de embeddings do LangChain para o modelo de embedding escolhido."""
+    if modelo == EMBEDDING_SIMULADO:
+        return importar_classe('services.provedor_simulado:EmbeddingsSimulados')(model=modelo)
+    embeddings = importar_classe('langchain_openai:OpenAIEmbeddings')(model=modelo)
+    if cota_modelo('OpenAI', modelo) is None:
+        return embeddings
+    return importar_classe('services.modelos_limitados:EmbeddingsLimitados')(embeddings, 'OpenAI', modelo)
+
+
+def criar_llm_completacao(modelo=MODELO_COMPLETACAO_RAG):
+    """Cria o modelo de completação da OpenAI, passando pelo limitador quando ele tem cota."""
+    llm = importar_classe('langchain_openai:OpenAI')(model=modelo, temperature=0.0)
+    if cota_modelo('OpenAI', modelo) is None:
+        return llm
+    return importar_classe('services.modelos_limitados:LLMLimitado')(llm=llm, provedor='OpenAI', modelo=modelo)
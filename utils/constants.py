@@ -5,8 +5,106 @@ DEFAULT_PROVIDER = 'Groq'
 DEFAULT_MODEL = 'llama-3.3-70b-versatile'
 
 # Configurações de chat
+# Tamanho da página de mensagens carregada do banco ao abrir uma conversa
+# e a cada clique em "Carregar mensagens anteriores".
 CHAT_MESSAGE_LIMIT = 10
 TITLE_TRUNCATE_LENGTH = 30
+# Conversas exibidas na barra lateral a cada "Mostrar mais conversas".
+CONVERSAS_POR_PAGINA = 30
+# Quanto a abertura de uma conversa, a paginação e a lista de conversas esperam
+# pelos turnos ainda na fila de escrita antes de ler o banco.
+ESPERA_ESCRITAS_LEITURA_S = 2.0
+
+# Orçamento do histórico enviado ao modelo: uma fração da janela de contexto
+# do modelo, limitada a um teto absoluto para conter latência e custo.
+HISTORICO_FRACAO_CONTEXTO = 0.25
+HISTORICO_MAX_TOKENS = 6000
+# Ao estourar o orçamento, a janela recua até esta fração dele e o que saiu
+# é resumido; assim o resumo não precisa ser refeito a cada turno.
+HISTORICO_FRACAO_APOS_RESUMO = 0.5
+# Tamanho máximo do resumo e das mensagens enviadas para resumir de uma vez.
+RESUMO_MAX_PALAVRAS = 300
+RESUMO_ENTRADA_MAX_TOKENS = 12000
+
+# Orçamento do prompt inteiro (sistema, histórico, arquivos, RAG e pergunta):
+# a janela do modelo, com teto, menos o espaço da resposta. A reserva da
+# resposta é uma fração da janela, limitada a um teto, para não consumir
+# metade da janela dos modelos pequenos.
+PROMPT_MAX_TOKENS = 32000
+RESERVA_RESPOSTA_FRACAO = 0.25
+RESERVA_RESPOSTA_TOKENS = 2048
+# Parte mínima do orçamento garantida ao histórico, mesmo quando o prompt de
+# sistema e os demais contextos ocupariam todo o resto.
+HISTORICO_MIN_FRACAO_PROMPT = 0.15
+# Peso de cada fonte de contexto na divisão do orçamento do prompt.
+PRIORIDADES_CONTEXTO = {'historico': 2, 'rag': 3, 'arquivos': 3}
+ROTULOS_CONTEXTO = {'historico': 'histórico', 'rag': 'RAG', 'arquivos': 'arquivos'}
+# Tamanho dos trechos em que arquivos e RAG são cortados para seleção.
+TRECHO_CONTEXTO_TOKENS = 300
+
+# Prazo para o primeiro token antes de acionar o provedor reserva. Sem prazo
+# fixo na sessão, usa o quantil do histograma de TTFT do modelo vezes o fator,
+# limitado ao intervalo; com poucas amostras, usa o padrão.
+PRAZO_TTFT_PADRAO_S = 8.0
+PRAZO_TTFT_MIN_S = 1.5
+PRAZO_TTFT_MAX_S = 30.0
+PRAZO_TTFT_QUANTIL = 0.95
+PRAZO_TTFT_FATOR = 1.5
+PRAZO_TTFT_AMOSTRAS_MINIMAS = 20
+
+# Etapas medidas em cada turno de chat, na ordem em que acontecem.
+ROTULOS_ETAPAS = {
+    'extracao': 'arquivos',
+    'recuperacao': 'RAG',
+    'condensacao': 'histórico',
+    'geracao': 'geração',
+    'persistencia': 'gravação',
+}
+# Quantos turnos recentes entram nas médias da barra lateral.
+METRICAS_TURNOS_RECENTES = 20
+
+# Versão do texto gerado por `services.file_processor`. Incremente ao mudar a
+# extração: as extrações em cache de versões anteriores deixam de valer.
+VERSAO_EXTRACAO = 3
+# Limites da extração em streaming (veja `services.file_processor.extrair_segmentos`):
+# páginas lidas de um PDF, bytes lidos de um arquivo de texto e tokens extraídos.
+# `ajustar_arquivos` escolhe os trechos relevantes do texto, mas muito além do
+# maior orçamento de prompt o texto extra não compensa a extração.
+EXTRACAO_MAX_PAGINAS = 2000
+EXTRACAO_MAX_BYTES = 32 * 1024 * 1024
+EXTRACAO_MAX_TOKENS = 8 * PROMPT_MAX_TOKENS
+EXTRACAO_BLOCO_BYTES = 256 * 1024
+# Perfil de CSV e Excel (veja `services.perfil_tabela`): prazo da leitura,
+# memória de cada bloco lido, linhas da amostra usada nos quartis e linhas do
+# primeiro bloco, que mede a memória por linha.
+PERFIL_MAX_SEGUNDOS = 20.0
+PERFIL_MEMORIA_BLOCO_BYTES = 32 * 1024 * 1024
+PERFIL_LINHAS_AMOSTRA = 100_000
+PERFIL_LINHAS_SONDA = 1000
+# Índice vetorial dos arquivos de cada conversa (veja
+# `services.indice_arquivos_service`): acima deste total estimado de tokens, a
+# pergunta recebe só os trechos mais relevantes, no tamanho em caracteres
+# do splitter da ingestão.
+INDICE_ARQUIVOS_MIN_TOKENS = 3000
+INDICE_ARQUIVOS_TRECHOS = 8
+INDICE_ARQUIVOS_TAMANHO_TRECHO = 1000
+INDICE_ARQUIVOS_SOBREPOSICAO = 100
+# Pool de processos da extração (veja `services.extracao_paralela`); None usa
+# um processo por núcleo. Um PDF é dividido em faixas de pelo menos
+# `EXTRACAO_PAGINAS_POR_TAREFA` páginas.
+EXTRACAO_PROCESSOS = None
+EXTRACAO_PAGINAS_POR_TAREFA = 8
+EXTRACAO_TIMEOUT_ARQUIVO_S = 60.0
+
+# Limites de taxa dos provedores (veja `services.limites_service`). Os tokens
+# de saída de uma chamada são estimados antes dela e acertados ao final.
+TOKENS_SAIDA_ESTIMADOS = 512
+# Quem esperaria mais que isto pela cota desiste com `CotaEsgotada`.
+ESPERA_MAXIMA_COTA_S = 120.0
+# Novas tentativas após um 429, com espera exponencial e jitter.
+TENTATIVAS_LIMITE_TAXA = 4
+BACKOFF_BASE_S = 1.0
+BACKOFF_MAXIMO_S = 30.0
 
 # Configurações de interface
 CHAT_INPUT_PLACEHOLDER = 'Fale com a Jibóia...'
@@ -6,6 +6,8 @@ def init_session_state():
     """Inicializa o estado da sessão com valores padrão."""
     defaults = {
         'historico': [],
+        'historico_cursor': None,
+        'historico_tem_mais': False,
         'conversa_atual': '',
         'api_key': os.getenv("OPENAI_API_KEY", ""),
         'chain': None,
@@ -0,0 +1,35 @@
+"""Contagem de tokens para orçamento de contexto.
+
+Usa o `tiktoken` (dependência do `langchain-openai`) com a codificação
+`cl100k_base` para todos os provedores: os tokenizadores de Llama, Gemma etc.
+diferem um pouco, mas a contagem serve para orçamento, não para cobrança.
+Sem o `tiktoken`, cai em uma estimativa de um token a cada 4 caracteres.
+"""
+import logging
+from functools import lru_cache
+
+CODIFICACAO = 'cl100k_base'
+CARACTERES_POR_TOKEN = 4
+# Tokens extras que cada mensagem ocupa no formato de chat (papel, separadores).
+TOKENS_POR_MENSAGEM = 4
+
+
+@lru_cache(maxsize=1)
+def _codificador():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(CODIFICACAO)
+    except Exception as e:
+        logging.warning(f"tiktoken indisponível, estimando tokens por caracteres: {e}")
+        return None
+
+
+def contar_tokens(texto):
+    """Retorna o número (aproximado) de tokens de um texto."""
+    if not texto:
+        return 0
+    codificador = _codificador()
+    if codificador is None:
+        return len(texto) // CARACTERES_POR_TOKEN + 1
+    return len(codificador.encode(texto, disallowed_special=()))
+